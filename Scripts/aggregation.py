@@ -0,0 +1,449 @@
+"""
+Registry of the operations the in-process dissolve combines fields with
+
+Every field map operation is a reducer: a function that takes one
+column of attribute values for many OUGs at once, with the OUG each
+value belongs to, and returns one value per OUG. The built-in
+reducers are NumPy reductions over those groups (bincount and ufunc.at
+rather than a Python loop per OUG), so a tile of OUGs is aggregated in
+a single pass per field (see dissolve.aggregate_groups()).
+
+Besides the statistics PairwiseDissolve knows, there are:
+
+- AREA_MEAN: the mean weighted by each parcel's area
+- MODE: the most common value, the first one seen on a tie
+- COUNT_DISTINCT: the number of different values
+- Common Attribute: the common parcel's value, which is always the
+  last feature dissolved
+
+More reducers can be registered with register(), from code or from a
+Python file named by the OUG_REDUCERS environment variable, which is
+run when this module is first imported (worker processes included):
+
+    import aggregation as ag
+
+    @ag.register("P90", numeric=True)
+    def p90(values, groups, n, weights=None, separator=""):
+        numbers = ag.numbers(values, "P90")
+        return [float(np.percentile(g, 90)) if len(g) else None
+                for g in ag.split(numbers, groups, n, skip_nulls=True)]
+
+Only operations with a PairwiseDissolve equivalent (see native())
+work with the pairwise engine.
+
+Nothing in here depends on arcpy.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import importlib.util
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# func: func(values, groups, n, weights, separator), returning a list
+#       of n values, None for a group with nothing to reduce. values
+#       is an object array (or a float array of text parsed as
+#       numbers, NaN for null), groups an integer array of the same length
+#       with every value's group in range(n), and weights each value's
+#       feature's area, as floats (None unless the reducer is weighted)
+# numeric: the reducer combines numbers. Text fields holding only
+#          numbers are parsed before being reduced with it
+# text: the reducer may be given a text field as is
+# weighted: the reducer needs each feature's area
+# native: the PairwiseDissolve statistic that does the same, or None
+Reducer = namedtuple("Reducer", ["func", "numeric", "text", "weighted",
+                                 "native"])
+
+REDUCERS = {}
+
+# A Python file registering more reducers
+PLUGINS = os.environ.get("OUG_REDUCERS")
+
+
+def register(name, numeric=False, text=False, weighted=False, native=None):
+    """
+    Decorator adding a reducer to the registry under name
+
+    A reducer already registered under the name is replaced.
+
+    Parameter name: the operation, as given in the field map
+    Condition: a string
+
+    Parameters numeric, text, weighted, native: see Reducer
+    """
+    def add(func):
+        REDUCERS[name] = Reducer(func, numeric, text, weighted, native)
+        return func
+    return add
+
+
+def get(op):
+    """
+    Returns the Reducer for an operation
+
+    Raises ValueError if there isn't one.
+
+    Parameter op: the operation
+    Condition: a string
+    """
+    if op not in REDUCERS:
+        raise ValueError(f"{op} is not a supported dissolve statistic")
+    return REDUCERS[op]
+
+
+def is_numeric(op):
+    """
+    Returns whether op combines numbers (False if op isn't registered)
+    """
+    return op in REDUCERS and REDUCERS[op].numeric
+
+
+def accepts_text(op):
+    """
+    Returns whether op can be given a text field as is
+    """
+    return op in REDUCERS and REDUCERS[op].text
+
+
+def native(op):
+    """
+    Returns the PairwiseDissolve statistic for op, or None
+    """
+    return REDUCERS[op].native if op in REDUCERS else None
+
+
+def numeric_ops():
+    """
+    Returns the names of the operations that combine numbers
+    """
+    return [name for name, r in REDUCERS.items() if r.numeric]
+
+
+def text_ops():
+    """
+    Returns the names of the operations text fields can take as is
+    """
+    return [name for name, r in REDUCERS.items() if r.text]
+
+
+def _floats(values):
+    """
+    Returns values as a float array with NaN for None, or None if they
+    aren't all numbers
+    """
+    try:
+        return np.asarray(values, dtype="f8")
+    except (TypeError, ValueError):
+        return None
+
+
+def numbers(values, op):
+    """
+    Returns a column as a float array, NaN standing for null
+
+    Raises TypeError if any value isn't a number.
+
+    Parameter values: the column
+    Condition: an array
+
+    Parameter op: the operation, for the error message
+    Condition: a string
+    """
+    floats = _floats(values)
+    if floats is None:
+        raise TypeError(f"Cannot perform operation {op} "
+                        "on non-numeric values")
+    return floats
+
+
+def present(values):
+    """
+    Returns which values of a column aren't null
+    """
+    if values.dtype.kind == "f":
+        return ~np.isnan(values)
+    return np.fromiter((v is not None for v in values), dtype=bool,
+                       count=len(values))
+
+
+def split(values, groups, n, skip_nulls=False):
+    """
+    Returns the values of each group, in their original order
+
+    For reducers that can't be written as a NumPy reduction.
+
+    Parameters values, groups, n: as passed to a reducer
+
+    Parameter skip_nulls: whether to leave out nulls
+    Condition: a boolean
+    """
+    if skip_nulls:
+        keep = present(values)
+        values, groups = values[keep], groups[keep]
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(n + 1))
+    ordered = values[order]
+    return [ordered[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+
+def codes(values):
+    """
+    Returns the values of a column as integers, equal where the values
+    are, numbered in order of first appearance (nulls get one too)
+    """
+    seen = {}
+    return np.fromiter((seen.setdefault(v, len(seen)) for v in values),
+                       dtype=np.int64, count=len(values)), list(seen)
+
+
+def _result(out, counts):
+    """
+    Returns out as a list, None where a group had nothing to reduce
+    """
+    return [float(v) if c else None for v, c in zip(out.tolist(),
+                                                    counts.tolist())]
+
+
+def _sums(values, groups, n, op):
+    floats = numbers(values, op)
+    keep = ~np.isnan(floats)
+    counts = np.bincount(groups[keep], minlength=n)
+    sums = np.bincount(groups[keep], floats[keep], minlength=n)
+    return floats, keep, counts, sums
+
+
+def reduce_groups(values, groups, n, op, weights=None, separator=""):
+    """
+    Reduces a column of values for many groups at once with an operation
+
+    Returns a list of n values, None for a group with nothing to reduce.
+
+    Parameter values: the column
+    Condition: a list of attribute values, possibly with None, or an
+               array (e.g. floats with NaN for null)
+
+    Parameter groups: the group each value belongs to
+    Condition: an integer array the same length as values, in range(n)
+
+    Parameter n: the number of groups
+    Condition: a non-negative integer
+
+    Parameter op: the operation
+    Condition: a registered operation (see REDUCERS)
+
+    Parameter weights: each value's feature's area
+    Condition: a float array the same length as values, NaN for
+               features with no shape. Required by weighted reducers
+
+    Parameter separator: the separator used by CONCATENATE
+    Condition: a string
+    """
+    reducer = get(op)
+    if reducer.weighted and weights is None:
+        raise ValueError(f"{op} needs the features' areas")
+    if not isinstance(values, np.ndarray):
+        values = np.fromiter(values, dtype=object, count=len(values))
+    return reducer.func(values, np.asarray(groups, dtype=np.int64), n,
+                        weights, separator)
+
+
+@register("SUM", numeric=True, native="SUM")
+def _sum(values, groups, n, weights=None, separator=""):
+    _, _, counts, sums = _sums(values, groups, n, "SUM")
+    return _result(sums, counts)
+
+
+@register("MEAN", numeric=True, native="MEAN")
+def _mean(values, groups, n, weights=None, separator=""):
+    _, _, counts, sums = _sums(values, groups, n, "MEAN")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _result(sums / counts, counts)
+
+
+def _extreme(values, groups, n, ufunc, start, fallback):
+    floats = _floats(values)
+    if floats is None:
+        # Dates and text can still be ordered
+        return [fallback(g) if len(g) else None
+                for g in split(values, groups, n, skip_nulls=True)]
+    keep = ~np.isnan(floats)
+    out = np.full(n, start)
+    ufunc.at(out, groups[keep], floats[keep])
+    return _result(out, np.bincount(groups[keep], minlength=n))
+
+
+@register("MIN", numeric=True, native="MIN")
+def _min(values, groups, n, weights=None, separator=""):
+    return _extreme(values, groups, n, np.minimum, np.inf, min)
+
+
+@register("MAX", numeric=True, native="MAX")
+def _max(values, groups, n, weights=None, separator=""):
+    return _extreme(values, groups, n, np.maximum, -np.inf, max)
+
+
+@register("RANGE", numeric=True, native="RANGE")
+def _range(values, groups, n, weights=None, separator=""):
+    floats = numbers(values, "RANGE")
+    keep = ~np.isnan(floats)
+    low = np.full(n, np.inf)
+    high = np.full(n, -np.inf)
+    np.minimum.at(low, groups[keep], floats[keep])
+    np.maximum.at(high, groups[keep], floats[keep])
+    return _result(high - low, np.bincount(groups[keep], minlength=n))
+
+
+def _variance(values, groups, n, op):
+    floats, keep, counts, sums = _sums(values, groups, n, op)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts
+        deviations = (floats[keep] - means[groups[keep]]) ** 2
+        return np.bincount(groups[keep], deviations, minlength=n) / counts, \
+            counts
+
+
+@register("VARIANCE", numeric=True, native="VARIANCE")
+def _var(values, groups, n, weights=None, separator=""):
+    return _result(*_variance(values, groups, n, "VARIANCE"))
+
+
+@register("STD", numeric=True, native="STD")
+def _std(values, groups, n, weights=None, separator=""):
+    variance, counts = _variance(values, groups, n, "STD")
+    return _result(np.sqrt(variance), counts)
+
+
+@register("MEDIAN", numeric=True, native="MEDIAN")
+def _median(values, groups, n, weights=None, separator=""):
+    floats = numbers(values, "MEDIAN")
+    keep = ~np.isnan(floats)
+    floats, kept_groups = floats[keep], groups[keep]
+    ordered = floats[np.lexsort((floats, kept_groups))]
+    if not len(ordered):
+        return [None] * n
+    counts = np.bincount(kept_groups, minlength=n)
+    starts = np.cumsum(counts) - counts
+    # Empty groups point anywhere valid, and come out None
+    low = np.clip(starts + (counts - 1) // 2, 0, len(ordered) - 1)
+    high = np.clip(starts + counts // 2, 0, len(ordered) - 1)
+    return _result((ordered[low] + ordered[high]) / 2, counts)
+
+
+@register("COUNT", native="COUNT")
+def _count(values, groups, n, weights=None, separator=""):
+    return np.bincount(groups[present(values)], minlength=n).tolist()
+
+
+def _ends(values, groups, n, last):
+    """
+    Returns the first (or last) value of each group, null or not
+    """
+    if last:
+        values, groups = values[::-1], groups[::-1]
+    out = [None] * n
+    if len(groups) == 0:
+        return out
+    if last or groups[0] > groups[-1]:
+        ordered = np.all(groups[1:] <= groups[:-1])
+    else:
+        ordered = np.all(groups[1:] >= groups[:-1])
+    if ordered:
+        # Features come grouped (see dissolve.dissolve_groups()), so
+        # each group starts where the group number changes
+        first = np.flatnonzero(np.concatenate(
+            [[True], groups[1:] != groups[:-1]]))
+        found = groups[first]
+    else:
+        found, first = np.unique(groups, return_index=True)
+    for group, value in zip(found.tolist(), values[first].tolist()):
+        out[group] = value
+    return out
+
+
+@register("FIRST", text=True, native="FIRST")
+def _first(values, groups, n, weights=None, separator=""):
+    return _ends(values, groups, n, last=False)
+
+
+@register("LAST", native="LAST")
+def _last(values, groups, n, weights=None, separator=""):
+    return _ends(values, groups, n, last=True)
+
+
+# The common parcel is always dissolved last
+@register("Common Attribute", text=True, native="LAST")
+def _common(values, groups, n, weights=None, separator=""):
+    return _ends(values, groups, n, last=True)
+
+
+def _distinct(values, groups, n):
+    keep = present(values)
+    value_codes, _ = codes(values[keep])
+    width = max(len(value_codes), 1)
+    pairs = np.unique(groups[keep] * width + value_codes)
+    return np.bincount(pairs // width, minlength=n).tolist()
+
+
+@register("UNIQUE", native="UNIQUE")
+def _unique(values, groups, n, weights=None, separator=""):
+    return [c or None for c in _distinct(values, groups, n)]
+
+
+@register("COUNT_DISTINCT", text=True, native="UNIQUE")
+def _count_distinct(values, groups, n, weights=None, separator=""):
+    return _distinct(values, groups, n)
+
+
+@register("MODE", text=True)
+def _mode(values, groups, n, weights=None, separator=""):
+    keep = present(values)
+    value_codes, distinct = codes(values[keep])
+    width = max(len(distinct), 1)
+    pairs, seen, tally = np.unique(groups[keep] * width + value_codes,
+                                   return_index=True, return_counts=True)
+    pair_groups, pair_codes = pairs // width, pairs % width
+    # Most often first, then first seen in the group
+    order = np.lexsort((seen, -tally, pair_groups))
+    found, first = np.unique(pair_groups[order], return_index=True)
+    out = [None] * n
+    for group, code in zip(found.tolist(),
+                           pair_codes[order][first].tolist()):
+        out[group] = distinct[code]
+    return out
+
+
+@register("CONCATENATE", native="CONCATENATE")
+def _concatenate(values, groups, n, weights=None, separator=""):
+    return [separator.join(str(v) for v in g) if len(g) else None
+            for g in split(values, groups, n, skip_nulls=True)]
+
+
+@register("AREA_MEAN", numeric=True, weighted=True)
+def _area_mean(values, groups, n, weights=None, separator=""):
+    floats = numbers(values, "AREA_MEAN")
+    keep = ~np.isnan(floats) & ~np.isnan(weights)
+    total = np.bincount(groups[keep], weights[keep], minlength=n)
+    weighted = np.bincount(groups[keep], weights[keep] * floats[keep],
+                           minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _result(weighted / total, total > 0)
+
+
+def load_plugins(path=PLUGINS):
+    """
+    Runs a Python file that registers more reducers
+
+    Parameter path: the file
+    Condition: a path to a Python file, or None or "" for none
+    """
+    if not path:
+        return
+    spec = importlib.util.spec_from_file_location("oug_reducers", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+
+load_plugins()
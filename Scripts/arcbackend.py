@@ -0,0 +1,84 @@
+"""
+The one place the OUG scripts get arcpy from
+
+Importing arcpy takes seconds, and worker processes, the offline
+GeoParquet merge and anything run on plain Python don't need it at
+all. Modules that talk to ArcGIS import it from here instead:
+
+    from arcbackend import arcpy, arcmg
+
+Both names are stand-ins that import the real module the first time
+one of its attributes is used, so importing a module that uses arcpy
+costs nothing until it actually calls arcpy.
+
+The merge logic itself (dissolve, containment, spatialindex,
+eliminate, parallel, qa, checkpoint, ouglog, geoparquet) doesn't use
+arcpy at all.
+
+Tools also used to reload their modules on every run, so edits showed
+up without restarting ArcGIS Pro. That now only happens with the
+OUG_DEV_RELOAD environment variable set (see dev_reload()).
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import importlib
+import os
+
+DEV_RELOAD = "OUG_DEV_RELOAD"
+
+
+class LazyModule:
+    """
+    A module that isn't imported until one of its attributes is used
+
+    Parameter name: the module's full name
+    Condition: an importable module name, e.g. "arcpy.management"
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """
+        Imports the module if it hasn't been yet, and returns it
+        """
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name} ({state})>"
+
+
+arcpy = LazyModule("arcpy")
+arcmg = LazyModule("arcpy.management")
+
+
+def dev_reload(*modules):
+    """
+    Reloads modules, in order, if OUG_DEV_RELOAD is set
+
+    ArcGIS Pro keeps imported modules between tool runs, so changes to
+    them don't show up until it restarts. Set OUG_DEV_RELOAD=1 while
+    working on the scripts to reload them every run instead. Leave it
+    unset otherwise: reloading costs time on every run.
+
+    Parameter modules: the modules to reload
+    Condition: imported modules, dependencies before the modules that
+               use them
+    """
+    if os.environ.get(DEV_RELOAD, "") in ("", "0"):
+        return
+    for module in modules:
+        importlib.reload(module)
@@ -6,9 +6,11 @@ Organization: Wasatch Front Regional Council
 Version: August 23, 2023
 """
 
-import arcpy
-import arcpy.management as arcmg
-import time
+from arcbackend import arcpy, arcmg
+import eliminate as el
+import schemacache as sc
+import scratch as sw
+import ouglog as ol
 from pprint import pformat as pf
 INSOLUBLES = ["OBJECTID", "Shape", "Shape_Length", "Shape_Area"]
 
@@ -30,8 +32,8 @@ def loginfo(msw, loglevel=1):
     Converts a message to a string, then add it 
     to the geoprocessing output.
 
-    If loglevel == 1, msw will also be appended to logfile
-    along with the time
+    If loglevel == 1, msw will also be written to the log file
+    (see ouglog.py) along with the time
 
     Parameter msw: The message you want sent.
     Condition: none
@@ -40,16 +42,9 @@ def loginfo(msw, loglevel=1):
     """
     msg = str(msw)
     if loglevel == 1:
+        ol.log.info(msg)
 
-        log = open("logfile",'a')
-        log.write('\n' + time.asctime() + ' - ')
-        log.write(msg)
-        log.close()
-        arcpy.AddMessage(msg)
-
-    else:
-        arcpy.AddMessage(msg)
-
+    arcpy.AddMessage(msg)
     return
 
 
@@ -69,6 +64,21 @@ def validate_selection(layer_to_check, count):
         raise arcpy.ExecuteError()
 
 
+def require_selection(layer_to_check):
+    """
+    Ensures *layer_to_check* has a selection, so a tool can't run
+    over a whole layer by accident
+
+    Adds an error and raises an ExecuteError if not
+
+    Parameter layer_to_check: The layer to check
+    Condition: a string describing a valid layer in the ArcPy environment
+    """
+    if not arcpy.Describe(layer_to_check).FIDSet:
+        arcpy.AddError(f"{layer_to_check} must have a selection!")
+        raise arcpy.ExecuteError()
+
+
 def bulk_validate(layer, text):
     """
     Marks a selected group of parcels as complete with a processing method
@@ -79,16 +89,48 @@ def bulk_validate(layer, text):
     Parameter text: the text identifying the processor
     Condition: a string no longer than 255 Characters
     """
-    arcmg.CalculateField(
-        in_table=layer,
+    sc.schema.calculate_field(
+        layer=layer,
         field="COMPLETE",
         expression=1,
         expression_type="PYTHON3",
     )
 
-    arcmg.CalculateField(
-        in_table=layer,
+    sc.schema.calculate_field(
+        layer=layer,
         field="PROCESSOR",
         expression="'" + text + "'",
         expression_type="PYTHON3",
-    )
\ No newline at end of file
+    )
+
+
+def eliminate_polygon_part(in_features, out_feature_class,
+                           part_area_percent=90):
+    """
+    Copies in_features, filling in holes and removing contained parts
+
+    Stands in for EliminatePolygonPart with condition="PERCENT" and
+    part_option="CONTAINED_ONLY", without needing an Advanced license.
+    Every feature is cleaned in one batch, see eliminate.py for details.
+
+    Parameter in_features: the polygons to clean
+    Condition: a string describing a valid layer in the ArcPy environment
+               If the layer has a selection, only selected features
+               are copied
+
+    Parameter out_feature_class: the output feature class
+    Condition: a string describing a feature class to be created
+               in the ArcPy environment, or a scratch.pool path
+
+    Parameter part_area_percent: see eliminate.eliminate_polygon_parts()
+    """
+    sw.pool.fill(out_feature_class, in_features)
+
+    with arcpy.da.SearchCursor(out_feature_class, ["SHAPE@"]) as cursor:
+        shapes = [row[0] for row in cursor]
+    cleaned = el.eliminate_polygon_parts(shapes, part_area_percent)
+
+    with arcpy.da.UpdateCursor(out_feature_class, ["SHAPE@"]) as cursor:
+        for row, shape in zip(cursor, cleaned):
+            row[0] = shape
+            cursor.updateRow(row)
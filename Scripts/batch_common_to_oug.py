@@ -0,0 +1,601 @@
+"""
+Script to merge every common parcel in a layer
+    into Owned Unit Groupings (OUGs) in a single run
+
+Unlike Common Parcel to OUG, which handles one selected common parcel
+per run, this tool takes a whole layer of common parcels (or whatever
+is currently selected in it). The units inside every common parcel
+are found up front in one containment join (see containment.py)
+rather than a SelectLayerByLocation against the full unit parcel
+layer per common parcel. A unit inside more than one common parcel
+goes to the smallest of them. With a saved spatial index of the unit
+parcel layer (see parcelindex.py), only the units around the common
+parcels are read.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+import numpy as np
+from arcbackend import arcpy, arcmg
+import arcscripttools as st
+import checkpoint as ck
+import cleanup as cu
+import common_to_oug as co
+import containment as cn
+import editbatch as eb
+import eliminate as el
+import geomcache as gm
+import ouglog as ol
+import parallel as pl
+import parcelindex as pi
+import qa
+import schemacache as sc
+import scratch as sw
+import spatialindex as si
+import unionmerge as um
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+
+def _where_clauses(layer, oids):
+    """
+    Returns the where clauses to read some features of a layer with
+    """
+    if oids is None:
+        return [None]
+    return pi.where_clauses(layer, oids)
+
+
+def read_units(review_parcel_layer, oids=None):
+    """
+    Reads the OID and shape of every unit parcel once
+
+    Returns a tuple of (oids, geometries). Units without a shape are
+    left out.
+
+    Parameter review_parcel_layer: the unit parcel layer
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter oids: the units to read
+    Condition: a list of integers (see parcelindex.candidates()), or
+               None for all of them
+    """
+    oids_out = []
+    geoms = []
+    for where in _where_clauses(review_parcel_layer, oids):
+        with arcpy.da.SearchCursor(review_parcel_layer, ["OID@", "SHAPE@"],
+                                   where_clause=where) as cursor:
+            for oid, geom in cursor:
+                if geom is None:
+                    continue
+                oids_out.append(oid)
+                geoms.append(geom)
+    return oids_out, geoms
+
+
+def oid_where_clause(layer, oids):
+    """
+    Returns a where clause selecting the given OIDs from layer
+
+    Parameter layer: the layer to build the clause for
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter oids: the OIDs to select
+    Condition: a non-empty list of integers
+    """
+    oid_field = arcpy.AddFieldDelimiters(layer,
+                                         arcpy.Describe(layer).OIDFieldName)
+    return f"{oid_field} IN ({','.join(str(o) for o in oids)})"
+
+
+def common_hashes(common_parcel_layer):
+    """
+    Returns (OID, geometry hash) for every (selected) common parcel
+
+    Parameter common_parcel_layer: the common parcels
+    Condition: a string describing a valid layer in the ArcPy environment
+    """
+    with arcpy.da.SearchCursor(common_parcel_layer,
+                               ["OID@", "SHAPE@WKB"]) as cursor:
+        return [(oid, ck.geometry_hash(wkb)) for oid, wkb in cursor
+                if wkb is not None]
+
+
+def copy_commons(common_parcel_layer, name, part_area_percent=90):
+    """
+    Copies the (selected) common parcels with holes filled in
+
+    Does what arcscripttools.eliminate_polygon_part() does, but reads
+    each common parcel's OID, shape and attributes in one cursor pass
+    and keeps the OID insertRow() gives its copy, so every copy can be
+    traced back to the common parcel it came from.
+
+    Returns the copy's path and a list of (copy OID, source OID,
+    cleaned shape). Common parcels without a shape are left out.
+
+    Parameter common_parcel_layer: see script_tool()
+
+    Parameter name: the copy's name
+    Condition: a valid feature class name for scratch.pool
+
+    Parameter part_area_percent: see eliminate.eliminate_polygon_parts()
+    """
+    fields = [f.name for f in sc.schema.fields(common_parcel_layer)
+              if f.type not in eb.READ_ONLY_TYPES
+              and f.name not in st.INSOLUBLES]
+    with arcpy.da.SearchCursor(common_parcel_layer,
+                               ["OID@", "SHAPE@"] + fields) as cursor:
+        rows = [row for row in cursor if row[1] is not None]
+    cleaned = el.eliminate_polygon_parts([row[1] for row in rows],
+                                         part_area_percent)
+
+    out_path = sw.pool.empty_like(sw.pool.path(name, len(rows)),
+                                  sc.schema.path(common_parcel_layer))
+    copies = []
+    with arcpy.da.InsertCursor(out_path, ["SHAPE@"] + fields) as cursor:
+        for row, shape in zip(rows, cleaned):
+            copies.append((cursor.insertRow([shape] + list(row[2:])),
+                           row[0], shape))
+    return out_path, copies
+
+
+def common_contents(common_parcel_layer, review_parcel_layer, oids,
+                    tolerance=0.0, index=None):
+    """
+    Returns {common OID: OIDs of the unit parcels inside it now}
+
+    Common parcels are filled in and matched to units the same way as
+    for merging, OUGs counting as units, so a merged common parcel
+    holds its OUGs and anything added since.
+
+    Parameters common_parcel_layer, review_parcel_layer, tolerance:
+        see script_tool()
+
+    Parameter oids: the common parcels to look in
+    Condition: a list of integers
+
+    Parameter index: see merge_serial()
+    """
+    if not oids:
+        return {}
+    commons = []
+    for where in pi.where_clauses(common_parcel_layer, oids):
+        with arcpy.da.SearchCursor(common_parcel_layer, ["OID@", "SHAPE@"],
+                                   where_clause=where) as cursor:
+            commons.extend(row for row in cursor if row[1] is not None)
+    shapes = el.eliminate_polygon_parts([g for _, g in commons], 90)
+    wanted = None
+    if index is not None:
+        wanted = pi.candidates(index, [si.geometry_bounds(g)
+                                       for g in shapes], tolerance)
+    st.clear_selection(review_parcel_layer)
+    unit_oids, geoms = read_units(review_parcel_layer, wanted)
+    join = cn.containment_join(shapes, geoms,
+                               common_ids=[oid for oid, _ in commons],
+                               unit_ids=unit_oids, tolerance=tolerance)
+    contents = {oid: [] for oid in oids}
+    contents.update((int(oid), units.tolist()) for oid, units in join)
+    return contents
+
+
+def settle_in_flight(journal, contents):
+    """
+    Settles journal entries left in flight by an interrupted run
+
+    The edit session that writes an OUG also deletes its units, so an
+    entry none of whose units is still inside its common parcel was
+    saved, and is marked committed with what it holds now. Entries with
+    any unit left weren't, and stay pending so they are merged again
+    rather than merged twice.
+
+    Returns the number of entries marked committed
+
+    Parameter journal: the run's checkpoint.Journal
+
+    Parameter contents: what the common parcels hold now
+    Condition: a dictionary from common_contents() covering every
+               in-flight common parcel whose shape hasn't changed
+    """
+    saved = {oid: contents[oid]
+             for oid, units in journal.in_flight().items()
+             if units and oid in contents
+             and set(contents[oid]).isdisjoint(units)}
+    journal.settle(saved)
+    return len(saved)
+
+
+def merge_serial(common_parcel_layer, review_parcel_layer, modified_fields,
+                 edits, hashes=None, tolerance=0.0, cleanup=None,
+                 index=None):
+    """
+    Merges each common parcel in turn in this process
+
+    Returns the number of OUGs made and the number of units merged
+
+    Parameters: see script_tool(). edits is the EditBatch to write to,
+    hashes, if given, a {OID: geometry hash} dictionary of the common
+    parcels to record on edits for the checkpoint journal, and index,
+    if given, the parcelindex.ParcelIndex of review_parcel_layer.
+    """
+    cmn_lyr = "batch_common_parcel"
+
+    # One batch for the whole layer rather than one per common parcel
+    with ol.log.span("eliminate"):
+        cmn_prcls, copies = copy_commons(common_parcel_layer,
+                                         "common_parcels",
+                                         part_area_percent=90)
+    st.clear_selection(common_parcel_layer)
+    st.clear_selection(review_parcel_layer)
+
+    commons = [(copy_oid, geom) for copy_oid, _, geom in copies]
+    wanted = None
+    if index is not None:
+        wanted = pi.candidates(index, [si.geometry_bounds(g)
+                                       for _, g in commons], tolerance)
+    with ol.log.span("read units"):
+        oids, geoms = read_units(review_parcel_layer, wanted)
+    st.loginfo(f"Processing {len(commons)} common parcels against "
+               f"{len(oids)} unit parcels")
+
+    with ol.log.span("containment", commons=len(commons), units=len(oids)):
+        join = cn.containment_join([g for _, g in commons], geoms,
+                                   unit_ids=oids, tolerance=tolerance)
+
+    arcmg.MakeFeatureLayer(cmn_prcls, cmn_lyr)
+    oug_count = 0
+    unit_count = 0
+    for (cmn_oid, src_oid, _), units in zip(copies, join.unit_lists()):
+        if not units:
+            arcpy.AddWarning(f"Common parcel {cmn_oid} contains no "
+                             "unit parcels, skipping")
+            continue
+
+        arcmg.SelectLayerByAttribute(cmn_lyr, "NEW_SELECTION",
+                                     oid_where_clause(cmn_lyr, [cmn_oid]))
+        unit_selection = arcmg.SelectLayerByAttribute(
+            review_parcel_layer, "NEW_SELECTION",
+            oid_where_clause(review_parcel_layer, units)
+        )
+        st.loginfo(f"Common parcel {cmn_oid}: merging {len(units)} units")
+
+        record = None
+        if hashes is not None:
+            record = (src_oid, hashes[src_oid], units)
+        with ol.log.span("oug", oug=cmn_oid):
+            co.merge_common_parcel(cmn_lyr, unit_selection, edits,
+                                   modified_fields, unit_oids=units,
+                                   oug=cmn_oid, record=record,
+                                   cleanup=cleanup)
+        oug_count += 1
+        unit_count += len(units)
+
+    arcmg.Delete(cmn_lyr)
+    return oug_count, unit_count
+
+
+def read_features(layer, fields, oids=None):
+    """
+    Returns a list of (OID, WKB, attributes) for every feature in layer
+
+    Features without a shape are left out.
+
+    Parameter layer: the layer to read
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter fields: the attribute fields to read
+    Condition: a list of field names found in layer
+
+    Parameter oids: see read_units()
+    """
+    features = []
+    for where in _where_clauses(layer, oids):
+        with arcpy.da.SearchCursor(layer, ["OID@", "SHAPE@WKB"] + fields,
+                                   where_clause=where) as cursor:
+            for row in cursor:
+                if row[1] is None:
+                    continue
+                features.append((row[0], bytes(row[1]),
+                                 dict(zip(fields, row[2:]))))
+    return features
+
+
+def merge_parallel(common_parcel_layer, review_parcel_layer, modified_fields,
+                   edits, workers, hashes=None, tolerance=0.0, cleanup=None,
+                   index=None):
+    """
+    Merges the common parcels in tiles across worker processes
+
+    Both layers are read once, dissolved by parallel.dissolve_parallel()
+    and the OUGs queued on edits in common parcel order. Common parcels
+    that can't be dissolved are skipped with a warning rather than
+    stopping the run, since the other workers' results are still good.
+
+    Returns the number of OUGs made and the number of units merged
+
+    Parameters: see script_tool() and merge_serial()
+    """
+    field_info = {f.name: f for f in sc.schema.fields(review_parcel_layer)}
+    fields = [f.name for f in field_info.values()
+              if f.type not in eb.READ_ONLY_TYPES
+              and f.name not in st.INSOLUBLES]
+    common_names = set(sc.schema.names(common_parcel_layer))
+
+    with ol.log.span("read"):
+        commons = read_features(common_parcel_layer,
+                                [f for f in fields if f in common_names])
+        st.clear_selection(common_parcel_layer)
+        st.clear_selection(review_parcel_layer)
+        wanted = None
+        if index is not None and commons:
+            boxes = shapely.bounds(shapely.from_wkb(
+                [wkb for _, wkb, _ in commons]))
+            wanted = pi.candidates(index, boxes.tolist(), tolerance)
+        units = read_features(review_parcel_layer, fields, wanted)
+    st.loginfo(f"Processing {len(commons)} common parcels against "
+               f"{len(units)} unit parcels with {workers} workers")
+
+    with ol.log.span("dissolve", workers=workers):
+        ougs, skipped = pl.dissolve_parallel(
+            commons, units, um.vt_to_dict(modified_fields),
+            um.dict_of_fields(review_parcel_layer), st.INSOLUBLES,
+            part_area_percent=90, workers=workers, tolerance=tolerance,
+            cleanup=cleanup
+        )
+    for cmn_oid, reason in skipped:
+        arcpy.AddWarning(f"Common parcel {cmn_oid} skipped: {reason}")
+
+    sr = arcpy.Describe(review_parcel_layer).spatialReference
+    unit_count = 0
+    with ol.log.span("queue edits", ougs=len(ougs)):
+        for cmn_oid, wkb, attrs, unit_oids in ougs:
+            attrs = um.fit_to_fields(attrs, field_info)
+            attrs.update({"IS_OUG": 1,
+                          "PROCESSOR": um.PROCESSOR_VERSION,
+                          "SUBPROCESSOR": "Common Parcel Merge"})
+            record = None
+            if hashes is not None:
+                record = (cmn_oid, hashes[cmn_oid], unit_oids)
+            edits.add(arcpy.FromWKB(bytearray(wkb), sr), attrs, unit_oids,
+                      record)
+            unit_count += len(unit_oids)
+    return len(ougs), unit_count
+
+
+def read_numbers(dataset, fields, oids=None):
+    """
+    Reads fields as numbers (see qa.numbers())
+
+    Returns (oids, values): an array of OIDs and an (OIDs, fields)
+    float array, NaN for null
+
+    Parameter dataset: the dataset to read
+    Condition: a string describing a valid dataset in the ArcPy
+               environment. Use a path rather than a layer, so a
+               selection doesn't hide rows
+
+    Parameter fields: the fields to read
+    Condition: a list of field names found in dataset
+
+    Parameter oids: the features to read
+    Condition: a list of integers, or None to read every feature
+    """
+    if oids is None:
+        clauses = [None]
+    else:
+        clauses = [oid_where_clause(dataset, oids[i:i + eb.OIDS_PER_CLAUSE])
+                   for i in range(0, len(oids), eb.OIDS_PER_CLAUSE)]
+    rows = []
+    for where in clauses:
+        with arcpy.da.SearchCursor(dataset, ["OID@"] + fields,
+                                   where_clause=where) as cursor:
+            rows.extend(cursor)
+    values = np.empty((len(rows), len(fields)))
+    for j in range(len(fields)):
+        values[:, j] = qa.numbers([row[j + 1] for row in rows])
+    return np.array([row[0] for row in rows], dtype=np.int64), values
+
+
+def qa_snapshot(common_parcel_layer, review_parcel_layer, modified_fields):
+    """
+    Reads what the QA report compares the OUGs with, before merging
+
+    Warns about common parcel fields that won't carry over into OUGs.
+    Returns (summed fields, unit OIDs, unit values).
+
+    Parameters: see script_tool()
+    """
+    for fld, reason in qa.dropped_fields(
+            um.dict_of_fields(common_parcel_layer),
+            um.dict_of_fields(review_parcel_layer),
+            ignore=st.INSOLUBLES + ["PROCESSOR", "SUBPROCESSOR", "IS_OUG"]):
+        arcpy.AddWarning(f"QA: common parcel field {fld} is dropped "
+                         f"from OUGs ({reason})")
+    fields = [fld for fld, op in um.vt_to_dict(modified_fields).items()
+              if op == "SUM"]
+    oids, values = read_numbers(sc.schema.path(review_parcel_layer), fields)
+    return fields, oids, values
+
+
+def qa_report(qa_path, review_parcel_layer, snapshot, edits):
+    """
+    Checks every OUG written by edits against the units it replaced
+
+    Writes a per-OUG CSV (see qa.write_report()) and logs how many
+    OUGs need a look.
+
+    Parameter qa_path: where to write the report
+    Condition: a path to a CSV file
+
+    Parameter review_parcel_layer: see script_tool()
+
+    Parameter snapshot: what qa_snapshot() returned before merging
+
+    Parameter edits: the EditBatch the OUGs were written with
+    Condition: flushed
+    """
+    fields, unit_oids, unit_values = snapshot
+    oug_oids = [oid for oid, _ in edits.written]
+    groups = [units for _, units in edits.written]
+    oids, values = read_numbers(sc.schema.path(review_parcel_layer), fields,
+                                oug_oids)
+    # The cursor doesn't have to return rows in the order asked for
+    position = {oid: i for i, oid in enumerate(oids.tolist())}
+    oug_values = np.full((len(oug_oids), len(fields)), np.nan)
+    for i, oid in enumerate(oug_oids):
+        if oid in position:
+            oug_values[i] = values[position[oid]]
+
+    result = qa.check_conservation(unit_oids, unit_values, groups,
+                                   oug_values)
+    flagged = qa.write_report(qa_path, oug_oids, groups, fields, result)
+    message = f"QA: {flagged} of {len(oug_oids)} OUGs need checking " \
+              f"(see {qa_path})"
+    if flagged:
+        arcpy.AddWarning(message)
+    else:
+        st.loginfo(message)
+
+
+def script_tool(common_parcel_layer, review_parcel_layer, modified_fields,
+                batch_size=eb.BATCH_SIZE, workers=1,
+                journal_path=ck.JOURNAL, tolerance=0.0, qa_path=None,
+                cleanup=None):
+    """
+    Merges every (selected) common parcel and its units into OUGs
+
+    OUGs are written back, and their units deleted, batch_size OUGs
+    at a time (see editbatch.py).
+
+    Parameter common_parcel_layer: the common parcels to process
+    Condition: a string describing a valid layer in the ArcPy environment
+               If the layer has a selection, only selected features
+               are processed
+
+    Parameter review_parcel_layer: the unit parcel layer
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter modified_fields: the field map
+    Condition: see unionmerge.create_dissolve_stats()
+
+    Parameter batch_size: the number of OUGs per edit session
+    Condition: a positive integer
+
+    Parameter workers: the number of processes to dissolve with
+    Condition: a positive integer. With more than one, the common
+               parcels are split into tiles (see parallel.py)
+
+    Parameter journal_path: the checkpoint journal (see checkpoint.py)
+    Condition: a path to a SQLite file, or None to merge every common
+               parcel without keeping track
+
+    Parameter tolerance: how far a unit may reach outside a common
+                         parcel and still be merged into it
+    Condition: a non-negative distance in the unit layer's units
+
+    Parameter qa_path: where to write the QA report (see qa.py)
+    Condition: a path to a CSV file, or None to skip the checks
+
+    Parameter cleanup: how to clean the unit parcels' geometries
+                       before they are dissolved (see cleanup.py)
+    Condition: a cleanup.Cleanup, or None to dissolve them as they are
+    """
+    st.loginfo(f"Running Batch Common Parcel to OUG "
+               f"with {um.PROCESSOR_VERSION}")
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
+    ol.log.reset_timings()
+    gm.cache.open(gm.CACHE, um.PROCESSOR_VERSION)
+
+    um.checkfields(review_parcel_layer)
+
+    index = pi.open_index(review_parcel_layer)
+    journal = None
+    hashes = None
+    if journal_path:
+        journal = ck.Journal(sc.schema.path(common_parcel_layer),
+                             um.PROCESSOR_VERSION, journal_path)
+        with ol.log.span("checkpoint"):
+            todo = common_hashes(common_parcel_layer)
+            # Only common parcels the journal knows can be skipped, so
+            # only their contents are read
+            contents = common_contents(common_parcel_layer,
+                                       review_parcel_layer,
+                                       journal.known(todo), tolerance,
+                                       index)
+            settled = settle_in_flight(journal, contents)
+            pending = journal.pending(todo, contents)
+        if settled:
+            st.loginfo(f"Found {settled} common parcels merged by an "
+                       "interrupted run")
+        hashes = dict(todo)
+        if len(pending) < len(todo):
+            st.loginfo(f"Skipping {len(todo) - len(pending)} common parcels "
+                       f"already merged (see {journal_path})")
+            if not pending:
+                journal.close()
+                st.loginfo("Nothing left to merge")
+                return
+            arcmg.SelectLayerByAttribute(
+                common_parcel_layer, "NEW_SELECTION",
+                oid_where_clause(common_parcel_layer, pending)
+            )
+
+    snapshot = None
+    if qa_path:
+        with ol.log.span("qa snapshot"):
+            snapshot = qa_snapshot(common_parcel_layer, review_parcel_layer,
+                                   modified_fields)
+
+    # Each batch goes in the journal as in flight before its edit
+    # session and as committed after it, so an interrupted run resumes
+    # with the first batch that wasn't saved (see settle_in_flight())
+    edits = eb.EditBatch(review_parcel_layer, batch_size,
+                         on_commit=journal.record if journal else None,
+                         index=index,
+                         on_begin=journal.begin if journal else None)
+    try:
+        if workers > 1:
+            oug_count, unit_count = merge_parallel(
+                common_parcel_layer, review_parcel_layer, modified_fields,
+                edits, workers, hashes, tolerance, cleanup, index)
+        else:
+            oug_count, unit_count = merge_serial(
+                common_parcel_layer, review_parcel_layer, modified_fields,
+                edits, hashes, tolerance, cleanup, index)
+        edits.flush()
+    finally:
+        if journal:
+            journal.close()
+        sw.pool.release_all()
+
+    st.clear_selection(review_parcel_layer)
+    if snapshot is not None:
+        with ol.log.span("qa report", ougs=len(edits.written)):
+            qa_report(qa_path, review_parcel_layer, snapshot, edits)
+    st.loginfo(f"Created {oug_count} OUGs from {unit_count} unit parcels")
+    st.loginfo(gm.cache.summary())
+    st.loginfo(ol.log.log_summary(), 0)
+    return
+
+
+if __name__ == "__main__":
+
+    param0 = arcpy.GetParameterAsText(0)
+    param1 = arcpy.GetParameterAsText(1)
+    param2 = arcpy.GetParameter(2)
+    # Optional
+    param3 = arcpy.GetParameter(3) or eb.BATCH_SIZE
+    param4 = arcpy.GetParameter(4) or 1
+    param5 = arcpy.GetParameterAsText(5) or ck.JOURNAL
+    param6 = arcpy.GetParameter(6) or 0.0
+    param7 = arcpy.GetParameterAsText(7) or None
+    # Precision grid, sliver area and sliver width; all unset for none
+    cleanup = cu.Cleanup(arcpy.GetParameter(8) or 0.0,
+                         arcpy.GetParameter(9) or 0.0,
+                         arcpy.GetParameter(10) or 0.0)
+
+    script_tool(param0, param1, param2, param3, param4, param5, param6,
+                param7, cleanup if any(cleanup) else None)
@@ -0,0 +1,254 @@
+"""
+Checkpoint journal for resumable batch runs
+
+Every common parcel Batch Common Parcel to OUG merges is recorded in a
+small SQLite database: which layer and OID it came from, a hash of its
+geometry, the unit OIDs merged into it, the processor version and when
+its OUG was committed. Rows are written as in flight just before the
+edit session holding the OUG starts and marked committed once it has
+been saved (see editbatch.EditBatch). The edit session deletes the
+units, so a row still in flight after a crash is settled by looking
+for them: all gone means the OUG was saved, otherwise it wasn't and
+the common parcel is merged again.
+
+Once committed, a row also holds a digest of the common parcel's
+contents as the merge left them: its geometry and the OIDs of the
+OUGs written for it, which are all a merged common parcel contains. A
+later run over the same layer skips every common parcel whose
+geometry, contents and processor version match the journal, so
+restarting an interrupted run picks up where it stopped, and
+re-running a finished one does nothing. Change a common parcel's
+shape, add or replace a unit inside it, or bump
+dissolve.PROCESSOR_VERSION, and it is merged again.
+
+Nothing in here depends on arcpy.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+
+JOURNAL = os.environ.get("OUG_JOURNAL", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "checkpoint.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commons (
+    source TEXT NOT NULL,
+    oid INTEGER NOT NULL,
+    geometry_hash TEXT NOT NULL,
+    unit_oids TEXT NOT NULL,
+    processor TEXT NOT NULL,
+    completed_at TEXT NOT NULL,
+    committed INTEGER NOT NULL DEFAULT 1,
+    contents_hash TEXT,
+    PRIMARY KEY (source, oid)
+)
+"""
+
+
+def geometry_hash(geom):
+    """
+    Returns a hex digest identifying a geometry's exact shape
+
+    Parameter geom: the geometry to hash
+    Condition: WKB bytes, an arcpy geometry or a shapely geometry
+    """
+    if isinstance(geom, (bytes, bytearray, memoryview)):
+        wkb = bytes(geom)
+    elif hasattr(geom, "WKB"):
+        wkb = bytes(geom.WKB)
+    else:
+        wkb = geom.wkb
+    return hashlib.sha1(wkb).hexdigest()
+
+
+def contents_hash(geometry_digest, unit_oids):
+    """
+    Returns a hex digest of a common parcel and what lies inside it
+
+    Parameter geometry_digest: the common parcel's geometry_hash()
+    Condition: a string
+
+    Parameter unit_oids: the OIDs of the unit parcels (or OUGs) inside it
+    Condition: a list of integers, in any order
+    """
+    units = json.dumps(sorted(int(oid) for oid in unit_oids))
+    return hashlib.sha1(f"{geometry_digest}:{units}".encode()).hexdigest()
+
+
+class Journal:
+    """
+    The record of common parcels already merged from one source layer
+
+    Parameter source: the common parcel dataset
+    Condition: a string, normally the dataset's catalog path, that is
+               the same from run to run
+
+    Parameter processor: the processor version OUGs are made with
+    Condition: a string (e.g. dissolve.PROCESSOR_VERSION)
+
+    Parameter path: the journal file
+    Condition: a path to a file that can be created or written
+    """
+
+    def __init__(self, source, processor, path=JOURNAL):
+        self.source = source
+        self.processor = processor
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute(SCHEMA)
+        columns = [row[1] for row in
+                   self._db.execute("PRAGMA table_info(commons)")]
+        # Journals from before rows were written ahead of the edit, and
+        # before contents were compared
+        if "committed" not in columns:
+            self._db.execute("ALTER TABLE commons ADD COLUMN "
+                             "committed INTEGER NOT NULL DEFAULT 1")
+        if "contents_hash" not in columns:
+            self._db.execute("ALTER TABLE commons ADD COLUMN "
+                             "contents_hash TEXT")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def completed(self):
+        """
+        Returns {OID: (geometry hash, contents hash)} for every common
+        parcel from this source merged by the current processor version
+
+        The contents hash is None for rows from journals that didn't
+        record one.
+        """
+        rows = self._db.execute(
+            "SELECT oid, geometry_hash, contents_hash FROM commons "
+            "WHERE source = ? AND processor = ? AND committed = 1",
+            (self.source, self.processor)
+        )
+        return {oid: (geom, contents) for oid, geom, contents in rows}
+
+    def in_flight(self):
+        """
+        Returns {OID: unit OIDs} for every common parcel from this source
+        whose edit session was started but never seen to be saved
+        """
+        rows = self._db.execute(
+            "SELECT oid, unit_oids FROM commons "
+            "WHERE source = ? AND processor = ? AND committed = 0",
+            (self.source, self.processor)
+        )
+        return {oid: json.loads(units) for oid, units in rows.fetchall()}
+
+    def known(self, hashes):
+        """
+        Returns the OIDs of hashes journaled with the same geometry,
+        committed or in flight: the ones whose contents need reading
+        before pending() can tell whether they changed
+
+        Parameter hashes: see pending()
+        """
+        rows = self._db.execute(
+            "SELECT oid, geometry_hash FROM commons "
+            "WHERE source = ? AND processor = ?",
+            (self.source, self.processor)
+        )
+        journaled = dict(rows.fetchall())
+        return [oid for oid, digest in hashes if journaled.get(oid) == digest]
+
+    def pending(self, hashes, contents):
+        """
+        Returns the OIDs that still need merging, in the order given
+
+        Parameter hashes: the common parcels about to be merged
+        Condition: a list of (OID, geometry hash) pairs
+
+        Parameter contents: what the known() common parcels hold now
+        Condition: a {OID: unit OIDs} dictionary covering known(hashes)
+        """
+        done = self.completed()
+        pending = []
+        for oid, digest in hashes:
+            geom, merged = done.get(oid, (None, None))
+            # Rows journaled before contents were only compare geometry
+            unchanged = geom == digest and (
+                merged is None
+                or merged == contents_hash(digest, contents.get(oid, [])))
+            if not unchanged:
+                pending.append(oid)
+        return pending
+
+    def begin(self, entries):
+        """
+        Records common parcels whose OUGs are about to be written
+
+        Parameter entries: the common parcels to record
+        Condition: see record()
+        """
+        self._write(entries, [None] * len(entries), 0)
+
+    def record(self, entries, outputs):
+        """
+        Records common parcels whose OUGs have been committed
+
+        Parameter entries: the common parcels to record
+        Condition: a list of (OID, geometry hash, unit OIDs) tuples
+
+        Parameter outputs: the OUGs written for each entry
+        Condition: a list of lists of OIDs, one per entry
+        """
+        self._write(entries, [contents_hash(digest, oids) for
+                              (_, digest, _), oids in zip(entries, outputs)],
+                    1)
+
+    def settle(self, contents):
+        """
+        Marks in-flight common parcels as committed
+
+        Parameter contents: the common parcels whose OUGs were found
+                            saved, with what they hold now
+        Condition: a {OID: unit OIDs} dictionary
+        """
+        rows = self._db.execute(
+            "SELECT oid, geometry_hash FROM commons "
+            "WHERE source = ? AND committed = 0", (self.source,)
+        )
+        digests = {oid: geom for oid, geom in rows if oid in contents}
+        self._db.executemany(
+            "UPDATE commons SET committed = 1, contents_hash = ? "
+            "WHERE source = ? AND oid = ?",
+            [(contents_hash(geom, contents[oid]), self.source, oid)
+             for oid, geom in digests.items()]
+        )
+        self._db.commit()
+
+    def _write(self, entries, contents, committed):
+        stamp = datetime.datetime.now().isoformat(timespec="seconds")
+        self._db.executemany(
+            "INSERT OR REPLACE INTO commons (source, oid, geometry_hash, "
+            "unit_oids, processor, completed_at, committed, contents_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(self.source, oid, digest, json.dumps(list(units)),
+              self.processor, stamp, committed, merged)
+             for (oid, digest, units), merged in zip(entries, contents)]
+        )
+        self._db.commit()
+
+    def forget(self):
+        """
+        Clears every entry for this source, so the next run redoes it all
+        """
+        self._db.execute("DELETE FROM commons WHERE source = ?",
+                         (self.source,))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,205 @@
+"""
+Adjacency clustering of unit parcels into candidate OUGs
+
+Townhome rows and duplex pairs have no common parcel around them, so
+Common Parcel to OUG can't find them. What they do have is shared
+walls: their parcels touch each other and nothing else of their kind.
+This module links every pair of parcels that touch (or come within a
+distance of each other) and agree on a set of fields, such as
+subdivision and property type, then takes the connected groups as
+candidate OUGs.
+
+Neighbours are found with one bulk shapely STRtree query (or, for
+arcpy geometries, a packed R-tree and a distance test per candidate)
+and linked with a vectorized union-find, so a county's residential
+parcels are clustered in seconds. Nothing in here imports arcpy. See
+cluster_units.py for the script tool, which writes cluster ids to a
+field that Selection to OUG can then group by.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import numpy as np
+
+import spatialindex as si
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+
+def group_key(values):
+    """
+    Returns the grouping key for one parcel, or None if it has no group
+
+    Text is compared without surrounding spaces or case, so
+    "Oak Hollow " and "OAK HOLLOW" are the same group. A parcel with
+    any grouping field null or blank doesn't belong to a group.
+
+    Parameter values: the parcel's values of the grouping fields
+    Condition: a list
+    """
+    key = []
+    for value in values:
+        if isinstance(value, str):
+            value = " ".join(value.split()).casefold()
+            if not value:
+                return None
+        elif value is None:
+            return None
+        key.append(value)
+    return tuple(key)
+
+
+def union_find(n, first, second):
+    """
+    Joins the integers 0 to n - 1 into sets, one pair at a time
+
+    Returns an array of the set each element ended up in, represented
+    by the set's smallest member, so the result doesn't depend on the
+    order of the pairs.
+
+    A union-find done in numpy rounds rather than a Python loop per
+    pair. Each round hooks the larger root of every pair under the
+    smaller, then jumps every element straight to its root, until no
+    pair spans two sets.
+
+    Parameter n: the number of elements
+    Condition: a non-negative integer
+
+    Parameters first, second: the pairs to join
+    Condition: integer arrays of the same length, all in range(n)
+    """
+    root = np.arange(n, dtype=np.int64)
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    while len(first):
+        a = root[first]
+        b = root[second]
+        apart = a != b
+        if not apart.any():
+            break
+        first, second = first[apart], second[apart]
+        np.minimum.at(root, np.maximum(a[apart], b[apart]),
+                      np.minimum(a[apart], b[apart]))
+        # Every element points at a root again
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+    return root
+
+
+def _codes(keys):
+    """
+    Returns keys as integers, equal where the keys are, -1 for None
+    """
+    codes = {}
+    return np.array([-1 if k is None else codes.setdefault(k, len(codes))
+                     for k in keys], dtype=np.int64)
+
+
+def adjacent_pairs(geoms, keys=None, distance=0.0):
+    """
+    Returns (i, j) position arrays of every pair of neighbouring parcels
+
+    Two parcels are neighbours if they touch or overlap, or with a
+    positive distance, come within it of each other. With keys, they
+    must also have equal, non-None keys. Each pair appears once, with
+    i < j.
+
+    Parameter geoms: the parcels
+    Condition: a list of shapely or arcpy polygons (None is allowed
+               and has no neighbours)
+
+    Parameter keys: what neighbours must agree on
+    Condition: a list the same length as geoms (see group_key()), or
+               None to only look at the shapes
+
+    Parameter distance: the largest gap between neighbours
+    Condition: a non-negative distance in the geometries' units
+    """
+    codes = np.zeros(len(geoms), dtype=np.int64) if keys is None \
+        else _codes(keys)
+    present = np.array([i for i, g in enumerate(geoms)
+                        if g is not None and codes[i] >= 0], dtype=np.int64)
+    vectorized = shapely is not None and len(present) > 0 and isinstance(
+        geoms[present[0]], shapely.Geometry)
+    if vectorized:
+        # One bulk query for every parcel at once
+        geom_array = np.asarray(geoms, dtype=object)[present]
+        hits = shapely.STRtree(geom_array).query(
+            geom_array, predicate="dwithin", distance=distance)
+        first, second = present[hits[0]], present[hits[1]]
+        keep = (first < second) & (codes[first] == codes[second])
+        return first[keep], second[keep]
+
+    index = si.PackedRTree([si.geometry_bounds(geoms[i]) for i in present])
+    first = []
+    second = []
+    for i in present:
+        geom = geoms[i]
+        xmin, ymin, xmax, ymax = si.geometry_bounds(geom)
+        candidates = present[index.query((xmin - distance, ymin - distance,
+                                          xmax + distance, ymax + distance))]
+        candidates = candidates[(candidates > i)
+                                & (codes[candidates] == codes[i])]
+        if len(candidates) == 0:
+            continue
+        if distance > 0:
+            near = [j for j in candidates
+                    if geom.distanceTo(geoms[j]) <= distance]
+        else:
+            near = [j for j in candidates if not geom.disjoint(geoms[j])]
+        first.extend([i] * len(near))
+        second.extend(near)
+    return (np.asarray(first, dtype=np.int64),
+            np.asarray(second, dtype=np.int64))
+
+
+def cluster_labels(geoms, keys=None, distance=0.0, min_size=2,
+                   max_size=None):
+    """
+    Clusters parcels into groups of neighbours
+
+    Returns an array with a cluster number for every parcel, or -1 for
+    parcels that aren't in a cluster. Clusters are numbered from 0 in
+    the order of their first parcel.
+
+    Parameters geoms, keys, distance: see adjacent_pairs()
+
+    Parameter min_size: the fewest parcels a cluster can have
+    Condition: a positive integer
+
+    Parameter max_size: the most parcels a cluster can have. Bigger
+                        clusters (e.g. a whole subdivision of touching
+                        lots) are left out
+    Condition: a positive integer, or None for no limit
+    """
+    first, second = adjacent_pairs(geoms, keys, distance)
+    roots = union_find(len(geoms), first, second)
+
+    sizes = np.bincount(roots, minlength=len(geoms))[roots]
+    keep = sizes >= min_size
+    if max_size is not None:
+        keep &= sizes <= max_size
+    labels = np.full(len(geoms), -1, dtype=np.int64)
+    # Roots are each cluster's first parcel, so ordering by root
+    # numbers clusters in order of their first parcel
+    _, labels[keep] = np.unique(roots[keep], return_inverse=True)
+    return labels
+
+
+def clusters(labels):
+    """
+    Returns the positions of the parcels in each cluster
+
+    Parameter labels: what cluster_labels() returned
+    """
+    clustered = np.flatnonzero(labels >= 0)
+    order = clustered[np.argsort(labels[clustered], kind="stable")]
+    splits = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, splits) if len(order) else []
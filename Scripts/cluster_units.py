@@ -0,0 +1,120 @@
+"""
+Script to find clusters of touching unit parcels
+    that should probably be Owned Unit Groupings (OUGs)
+
+Townhome rows and duplex pairs have no common parcel, so they used to
+be found and selected by hand for Selection to OUG. This tool links
+every pair of (selected) parcels that touch, or come within a search
+distance of each other, and agree on the match fields, and numbers the
+connected groups (see cluster.py). The numbers are written to a field,
+so the candidates can be reviewed on the map and then merged in one
+run of Selection to OUG grouped by that field.
+
+Nothing is merged by this tool.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+import arcbackend as ab
+from arcbackend import arcpy
+import arcscripttools as st
+import cluster as cl
+import editbatch as eb
+import ouglog as ol
+import schemacache as sc
+
+CLUSTER_FIELD = "OUG_CLUSTER"
+
+
+def script_tool(parcel_layer, match_fields=None, distance=0.0,
+                cluster_field=CLUSTER_FIELD, min_size=2, max_size=None):
+    """
+    Numbers the clusters of touching parcels in cluster_field
+
+    Every parcel read gets its cluster number, starting at 1, or null
+    if it isn't in a cluster, so numbers from an earlier run don't
+    linger.
+
+    Parameter parcel_layer: the parcels to cluster
+    Condition: a string describing a valid layer in the ArcPy environment
+               If the layer has a selection, only selected features
+               are clustered
+
+    Parameter match_fields: fields neighbours must agree on
+    Condition: a list of field names, or None. Text is compared
+               ignoring case and extra spaces, and parcels with any of
+               them null are never clustered
+
+    Parameter distance: the largest gap between neighbours
+    Condition: a non-negative distance in the layer's units
+
+    Parameter cluster_field: where to write the cluster numbers
+    Condition: a field name. A LONG field is added if it doesn't exist
+
+    Parameters min_size, max_size: see cluster.cluster_labels()
+    """
+    st.loginfo("Finding clusters of touching parcels")
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
+    ol.log.reset_timings()
+    match_fields = list(match_fields or [])
+
+    names = sc.schema.names(parcel_layer)
+    for fld in match_fields:
+        if fld not in names:
+            arcpy.AddError(f"{fld} is not a field of {parcel_layer}")
+            raise arcpy.ExecuteError()
+    if cluster_field not in names:
+        arcpy.AddWarning(f"{cluster_field} does not exist, "
+                         "adding now with type LONG")
+        sc.schema.add_field(parcel_layer, cluster_field, "LONG")
+
+    with ol.log.span("read"):
+        oids = []
+        geoms = []
+        keys = []
+        with arcpy.da.SearchCursor(parcel_layer,
+                                   ["OID@", "SHAPE@"] + match_fields) \
+                as cursor:
+            for row in cursor:
+                oids.append(row[0])
+                geoms.append(row[1])
+                keys.append(cl.group_key(row[2:]))
+    st.loginfo(f"Read {len(oids)} parcels")
+
+    with ol.log.span("cluster", parcels=len(oids)):
+        labels = cl.cluster_labels(geoms, keys if match_fields else None,
+                                   distance, min_size, max_size)
+    numbers = {oid: int(label) + 1 if label >= 0 else None
+               for oid, label in zip(oids, labels.tolist())}
+
+    workspace = eb.workspace_of(sc.schema.path(parcel_layer))
+    with ol.log.span("write"), arcpy.da.Editor(workspace):
+        with arcpy.da.UpdateCursor(parcel_layer,
+                                   ["OID@", cluster_field]) as cursor:
+            for oid, current in cursor:
+                if oid in numbers and numbers[oid] != current:
+                    cursor.updateRow([oid, numbers[oid]])
+
+    found = int(labels.max()) + 1 if len(labels) else 0
+    clustered = int((labels >= 0).sum())
+    st.loginfo(f"Found {found} clusters covering {clustered} parcels. "
+               f"Select {cluster_field} IS NOT NULL and run Selection to "
+               f"OUG grouped by {cluster_field} to merge them.")
+    st.loginfo(ol.log.log_summary(), 0)
+    return
+
+
+if __name__ == "__main__":
+    # Only with OUG_DEV_RELOAD set, for working on the scripts
+    ab.dev_reload(cl)
+    param0 = arcpy.GetParameterAsText(0)
+    # Optional
+    param1 = arcpy.GetParameterAsText(1)
+    param1 = param1.split(";") if param1 else None
+    param2 = arcpy.GetParameter(2) or 0.0
+    param3 = arcpy.GetParameterAsText(3) or CLUSTER_FIELD
+    param4 = arcpy.GetParameter(4) or 2
+    param5 = arcpy.GetParameter(5) or None
+
+    script_tool(param0, param1, param2, param3, param4, param5)
@@ -6,95 +6,161 @@ Author: Lilah Rosenfield (lrosenfield@wfrc.org)
 Organization: Wasatch Front Regional Council
 Version: August 23, 2023
 """
-import arcpy
-import arcpy.management as arcmg
+import arcbackend as ab
+from arcbackend import arcpy, arcmg
 from pprint import pformat as pf
 import arcscripttools as st
-import importlib as imp
+import editbatch as eb
+import geomcache as gm
+import ouglog as ol
+import parcelindex as pi
+import schemacache as sc
+import scratch as sw
 import unionmerge as um
 
 
-def script_tool(common_parcel_layer, review_parcel_layer, modified_fields):
-    """
-    Script code goes below
+def merge_common_parcel(cmn_prcl, unit_selection, edits, modified_fields,
+                        unit_oids=None, oug=None, record=None,
+                        cleanup=um.CLEANUP):
     """
-    cmn_prcl = r"memory\common_parcel_mem"
-    units = r"memory\interior_units_mem"
-    remapped = r"memory\rmp_mem"
+    Merges one hole-free common parcel and its units into a single OUG
 
-    st.validate_selection(common_parcel_layer, 2)
-    
-    st.loginfo(f"Running Common Parcel to OUG with {um.PROCESSOR_VERSION}")
+    The OUG and the deletion of the units in unit_selection are queued
+    on edits, and written to the unit parcel layer when it is flushed.
+    Each step is timed with an ouglog span tagged with oug.
 
-    um.checkfields(review_parcel_layer)
+    Parameter cmn_prcl: the common parcel, with interior parts removed
+    Condition: a string describing a valid layer in the ArcPy environment
+               containing (or with a selection of) exactly one feature
+
+    Parameter unit_selection: the unit parcels inside the common parcel
+    Condition: a layer or selection result on review_parcel_layer
+               containing only the units to be merged
+
+    Parameter edits: the pending edits to the unit parcel layer
+    Condition: an editbatch.EditBatch
+
+    Parameter modified_fields: the field map
+    Condition: see unionmerge.create_dissolve_stats()
+
+    Parameter unit_oids: the OIDs of the units in unit_selection
+    Condition: a list of integers, or None to read them from
+               unit_selection
+
+    Parameter oug: an identifier for this OUG in the log
+    Condition: anything JSON-serializable, e.g. the common parcel OID
+
+    Parameter record: handed to edits' on_commit once the OUG is saved
+    Condition: see editbatch.EditBatch.add()
 
-    # Unfortunately requires ArcPro License
-    arcmg.EliminatePolygonPart(
-        in_features=common_parcel_layer,
-        out_feature_class=cmn_prcl,
-        condition="PERCENT",
-        part_area="0 SquareMeters",
-        part_area_percent=90,
-        part_option="CONTAINED_ONLY"
-    )
-    st.clear_selection(common_parcel_layer)
-
-    layersByLoc = arcmg.SelectLayerByLocation(
-        in_layer=review_parcel_layer,
-        overlap_type="WITHIN",
-        select_features=cmn_prcl,
-        search_distance=None,
-        selection_type="NEW_SELECTION",
-        invert_spatial_relationship="NOT_INVERT"
-    )
-
-    lbl_c = arcmg.GetCount(layersByLoc)
-    st.loginfo(f'Found {lbl_c} features to be added to OUG')
-
-    #st.loginfo(type(interior_units))
-
-    arcmg.CopyFeatures(layersByLoc,units)
-    # ium_c = arcmg.GetCount(units)
-    # st.loginfo(f'there are {ium_c} units in the new dataset')
+    Parameter cleanup: see unionmerge.dissolve_and_rectify()
+    """
+    with ol.log.span("copy", oug=oug):
+        if unit_oids is None:
+            unit_oids = [row[0] for row in
+                         arcpy.da.SearchCursor(unit_selection, ["OID@"])]
+        # Reused from one OUG to the next
+        units = sw.pool.copy("interior_units", unit_selection,
+                             len(unit_oids))
+    remapped = sw.pool.path("oug", 1)
 
     # Always check if you need to spend time programming something folks
     #conform_attribute_table(units, cmn_prcl)
     # The functions I wrote for this can be found in a separate script
 
-    solvent = um.create_dissolve_stats(units,modified_fields)
+    with ol.log.span("dissolve stats", oug=oug):
+        solvent = um.create_dissolve_stats(units, modified_fields,
+                                           sorted(unit_oids))
+
+    with ol.log.span("append common", oug=oug):
+        arcmg.Append(
+            inputs = cmn_prcl, target = units, schema_type = "NO_TEST"
+            )
 
-    # st.loginfo(um.list_field_types(units))
+    with ol.log.span("dissolve", oug=oug):
+        um.dissolve_and_rectify(units, solvent, remapped, cleanup=cleanup)
 
-    arcmg.Append(
-        inputs = cmn_prcl, target = units, schema_type = "NO_TEST"
+        sc.schema.calculate_field(
+            layer=remapped,
+            field="SUBPROCESSOR",
+            expression="'" + "Common Parcel Merge" + "'",
+            expression_type="PYTHON3",
         )
 
-    # arcmg.CopyFeatures(r'memory\interior_units_mem',param2)
-    
-   
-    # arcmg.CopyFeatures(solution, "workingTest")
-    um.dissolve_and_rectify(units, solvent, remapped)
-    
-    #st.loginfo(pf(map.exportToString()))
-    # arcmg.CopyFeatures(units, "workingTest")
+    # Replaces an Append and a DeleteRows per OUG
+    with ol.log.span("queue edits", oug=oug):
+        edits.add_from(remapped, unit_oids, record)
+    return
 
-    arcmg.CalculateField(
-        in_table=remapped,
-        field="SUBPROCESSOR",
-        expression="'" + "Common Parcel Merge" + "'",
-        expression_type="PYTHON3",
-    )
 
-    # raise arcpy.ExecuteError()
+def script_tool(common_parcel_layer, review_parcel_layer, modified_fields):
+    """
+    Script code goes below
+    """
+    st.validate_selection(common_parcel_layer, 2)
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
+    
+    st.loginfo(f"Running Common Parcel to OUG with {um.PROCESSOR_VERSION}")
+    ol.log.reset_timings()
+    gm.cache.open(gm.CACHE, um.PROCESSOR_VERSION)
 
-    arcmg.Append(
-        inputs = remapped,
-        target= review_parcel_layer,
-        schema_type="TEST"
-    )
+    um.checkfields(review_parcel_layer)
 
-    arcmg.DeleteRows(layersByLoc)
-    #st.clear_selection(review_parcel_layer)
+    # Scratch datasets are deleted when the run ends, even if it fails
+    with sw.pool:
+        cmn_prcl = sw.pool.path("common_parcel", 1)
+        # Fills in the holes left by the units; no Advanced license needed
+        with ol.log.span("eliminate"):
+            st.eliminate_polygon_part(common_parcel_layer, cmn_prcl,
+                                      part_area_percent=90)
+        st.clear_selection(common_parcel_layer)
+
+        # Only the units the saved index finds around the common parcel
+        # are read and tested, rather than the whole layer
+        unit_oids = None
+        index = pi.open_index(review_parcel_layer)
+        with ol.log.span("select by location"):
+            if index is None:
+                layersByLoc = arcmg.SelectLayerByLocation(
+                    in_layer=review_parcel_layer,
+                    overlap_type="WITHIN",
+                    select_features=cmn_prcl,
+                    search_distance=None,
+                    selection_type="NEW_SELECTION",
+                    invert_spatial_relationship="NOT_INVERT"
+                )
+                lbl_c = int(arcmg.GetCount(layersByLoc)[0])
+            else:
+                commons = [row[0] for row in
+                           arcpy.da.SearchCursor(cmn_prcl, ["SHAPE@"])
+                           if row[0] is not None]
+                # Through the layer, so its definition query still
+                # applies; units it hides must not be deleted
+                st.clear_selection(review_parcel_layer)
+                unit_oids = pi.units_within(index, review_parcel_layer,
+                                            commons)
+                lbl_c = len(unit_oids)
+
+        st.loginfo(f'Found {lbl_c} features to be added to OUG')
+        if not lbl_c:
+            arcpy.AddWarning("The common parcel contains no unit parcels")
+            return
+        if index is not None:
+            where, = pi.where_clauses(review_parcel_layer, unit_oids,
+                                      len(unit_oids))
+            layersByLoc = arcmg.SelectLayerByAttribute(
+                review_parcel_layer, "NEW_SELECTION", where)
+
+        #st.loginfo(type(interior_units))
+
+        edits = eb.EditBatch(review_parcel_layer, index=index)
+        merge_common_parcel(cmn_prcl, layersByLoc, edits, modified_fields,
+                            unit_oids=unit_oids)
+        edits.flush()
+        st.clear_selection(review_parcel_layer)
+        st.loginfo(gm.cache.summary())
+        st.loginfo(ol.log.log_summary(), 0)
 
     return
 
@@ -102,7 +168,8 @@ def script_tool(common_parcel_layer, review_parcel_layer, modified_fields):
 if __name__ == "__main__":
     #arcpy.AddError("Script failed (as a test)")
     # st.loginfo("Script is still running")
-    imp.reload(um)
+    # Only with OUG_DEV_RELOAD set, for working on the scripts
+    ab.dev_reload(st, um)
     param0 = arcpy.GetParameterAsText(0)
     param1 = arcpy.GetParameterAsText(1)
     # Quick 'n dirty param removal
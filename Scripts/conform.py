@@ -13,9 +13,10 @@ Author: Lilah Rosenfield (lrosenfield@wfrc.org)
 Organization: Wasatch Front Regional Council
 Version: May 25, 2023
 """
-import arcpy
-import arcpy.management as arcmg
-import time
+from arcbackend import arcpy
+import schemacache as sc
+import schemaplan as sp
+import ouglog as ol
 
 from pprint import pformat as pf
 
@@ -26,8 +27,8 @@ def loginfo(msw, loglevel=1):
     Converts a message to a string, then add it 
     to the geoprocessing output.
 
-    If loglevel == 1, msw will also be appended to logfile
-    along with the time
+    If loglevel == 1, msw will also be written to the log file
+    (see ouglog.py) along with the time
 
     Parameter msw: The message you want sent.
     Condition: none
@@ -36,16 +37,9 @@ def loginfo(msw, loglevel=1):
     """
     msg = str(msw)
     if loglevel == 1:
+        ol.log.info(msg)
 
-        log = open("logfile",'a')
-        log.write('\n' + time.asctime() + ' - ')
-        log.write(msg)
-        log.close()
-        arcpy.AddMessage(msg)
-
-    else:
-        arcpy.AddMessage(msg)
-
+    arcpy.AddMessage(msg)
     return
 
 
@@ -56,12 +50,7 @@ def list_field_names(layer):
     Parameter: layer
     Condition: a string describing a valid layer in the ArcPy environment
     """
-    layer_names = []
-    layer_fields = arcpy.ListFields(layer)
-
-    for field in layer_fields:
-        layer_names.append(field.name)
-    return layer_names
+    return sc.schema.names(layer)
 
 
 def add_fields(old_fl, new_fl, fields):
@@ -69,7 +58,7 @@ def add_fields(old_fl, new_fl, fields):
     Adds correctly typed fields to new_fl
 
     We want to add fields named 'fields' found in old_fl to new_fl
-    with their correct type.
+    with their correct type. All fields are added in one AddFields call.
 
     Parameter old_fl: the layer to pull field types from
     Condition: a string describing a valid layer in the ArcPy environment
@@ -84,63 +73,97 @@ def add_fields(old_fl, new_fl, fields):
         - fields must only contain fields names found in old_fl
         - fields must not contain field names already found in new_fl
     """
-    for f in fields:
-        typ = arcpy.ListFields(old_fl,wild_card=f)[0].type
-        loginfo(f"adding field named {f} of type {typ} to the attribute table")
-        arcmg.AddField(new_fl,f, typ)
-
-
-def script_tool(conform_to, trg):
+    wanted = {f.lower() for f in fields}
+    plan = sp.SchemaPlan.from_template(old_fl)
+    specs = [spec for spec in plan.fields if spec["name"].lower() in wanted]
+    for spec in specs:
+        loginfo(f"adding field named {spec['name']} of type {spec['type']} "
+                "to the attribute table")
+    if specs:
+        sc.schema.add_fields(new_fl, [sp.field_description(spec)
+                                      for spec in specs])
+
+
+def log_diff(target, diff):
+    """
+    Logs what conforming target to a plan changes
+    """
+    loginfo(f"{target}: {len(diff.kept)} fields kept, "
+            f"{len(diff.drop)} removed, {len(diff.add)} added")
+    if diff.drop:
+        loginfo(f"the following attributes will be removed:")
+        loginfo(pf(diff.drop))
+    if diff.add:
+        loginfo(f"the following attributes will be added:")
+        loginfo(pf([spec["name"] for spec in diff.add]))
+    for name, old_type, new_type in diff.retype:
+        arcpy.AddWarning(f"{target}: {name} is {old_type} but the template "
+                         f"has {new_type}")
+
+
+def script_tool(conform_to, trg, workers=1, plan_file=None, retype=False):
     """
     Modifies the attribute table of trg to that of conform_to
 
     Useful if you want to automate the process of appending trg to
     conform_to without having to know what layers specifically are present
     
-    This function modifies layer trg, keeping conform_to untouched
+    This function modifies layer trg, keeping conform_to untouched.
+    The changes are planned once from conform_to (see schemaplan.py)
+    and applied to each target with one DeleteField and one AddFields.
 
-    Parameter conform_to: the layer which has the desired attribute table
+    Parameter conform_to: the layer which has the desired attribute table,
+                          or a plan saved by an earlier run
     Condition: a string describing a valid layer in the ArcPy environment
+               or the path to a .json plan
 
-    Parameter trg: the target layer whose attribute table will be modified
-    Condition: a string describing a valid layer in the ArcPy environment
+    Parameter trg: the target layer(s) whose attribute table will be modified
+    Condition: a string describing a valid layer in the ArcPy environment,
+               a semicolon-separated string of them, or a list
+
+    Parameter workers: the number of targets to conform at once
+    Condition: a positive integer
+
+    Parameter plan_file: where to save the plan for later runs
+    Condition: a path to a .json file, or None
+
+    Parameter retype: whether to replace fields whose type differs
+                      from the template (emptying them)
+    Condition: a boolean
     """
     loginfo("Conforming attribute tables")
-    unmofidied_fields = {"Shape_Length", "Shape_Area", 
-                         "SHAPE_Length", "SHAPE_Area",
-                         "SHAPE", "Shape"}
-    
-    new_table = list_field_names(conform_to)
-    existing_table = list_field_names(trg)
-
-    loginfo(f"Target table contains {len(existing_table)} fields")
-    loginfo(f"Template table contains {len(new_table)} fields")
-    ntb_set = set(new_table)
-    extb_set = set(existing_table)
-    tbrm = extb_set - ntb_set - unmofidied_fields
-    tbad = ntb_set - extb_set - unmofidied_fields
-    exov = ntb_set & extb_set
-    loginfo(f"The following attributes are present in both sets:")
-    loginfo(pf(exov))
-    loginfo(f"the following attributes will be removed:")
-    loginfo(pf(tbrm))
-    loginfo(f"the following attributes will be added:")
-    loginfo(pf(tbad))
-
-    arcmg.DeleteField(trg, list(tbrm))
-    add_fields(conform_to, trg, list(tbad))
-
-    loginfo("Target field now has the following attribute fields")
-    loginfo(pf(list_field_names(trg)))
-    loginfo("Compare to source")
-    loginfo(pf(list_field_names(conform_to)))
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
+
+    if str(conform_to).lower().endswith(".json"):
+        plan = sp.SchemaPlan.load(conform_to)
+    else:
+        plan = sp.SchemaPlan.from_template(conform_to)
+    loginfo(f"Template table contains {len(plan.fields)} fields")
+    if plan_file:
+        plan.save(plan_file)
+        loginfo(f"Saved the plan to {plan_file}")
+
+    targets = trg if isinstance(trg, list) else \
+        [t.strip("'\" ") for t in str(trg).split(";") if t.strip()]
+    for target in targets:
+        log_diff(target, plan.diff(sc.schema.fields(target)))
+
+    with ol.log.span("conform", targets=len(targets), workers=workers):
+        sp.apply_many(plan, targets, retype, workers)
+    loginfo(f"Conformed {len(targets)} layers")
     return
 
 
 if __name__ == "__main__":
 
     param0 = arcpy.GetParameterAsText(0)
+    # Multivalue, semicolon-separated
     param1 = arcpy.GetParameterAsText(1)
+    # Optional
+    param2 = arcpy.GetParameter(2) or 1
+    param3 = arcpy.GetParameterAsText(3) or None
+    param4 = bool(arcpy.GetParameter(4))
 
-    script_tool(param0, param1)
-    arcpy.SetParameterAsText(2, "Result")
\ No newline at end of file
+    script_tool(param0, param1, param2, param3, param4)
+    arcpy.SetParameterAsText(5, param1)
\ No newline at end of file
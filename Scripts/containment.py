@@ -0,0 +1,179 @@
+"""
+Bulk containment join between common parcels and unit parcels
+
+Finds, in one pass, which unit parcels lie within which common parcel,
+instead of a SelectLayerByLocation(WITHIN) per common parcel. Units
+are prefiltered by bounding box with a packed R-tree, and each common
+parcel is prepared once before being tested against its candidates.
+
+The result is a Containment: the unit ids of every common parcel laid
+end to end in one array, with an offsets array marking where each
+common parcel's run starts (the CSR layout of a sparse matrix). A unit
+belongs to at most one common parcel. Where common parcels overlap or
+nest, the smallest one containing the unit gets it.
+
+Works on shapely geometries (vectorized) or arcpy geometries (one
+within() test per candidate). Nothing in here imports arcpy.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import numpy as np
+
+import spatialindex as si
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+
+def _is_shapely(geoms):
+    return shapely is not None and any(
+        isinstance(g, shapely.Geometry) for g in geoms if g is not None)
+
+
+class Containment:
+    """
+    The units inside each common parcel, in CSR form
+
+    Parameter common_ids: the id of each common parcel
+    Condition: an array of length n
+
+    Parameter offsets: where each common parcel's units start
+    Condition: an int64 array of length n + 1, starting at 0
+
+    Parameter unit_ids: the units of every common parcel, in order
+    Condition: an array of length offsets[-1]
+    """
+
+    def __init__(self, common_ids, offsets, unit_ids):
+        self.common_ids = np.asarray(common_ids)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.unit_ids = np.asarray(unit_ids)
+
+    def __len__(self):
+        return len(self.common_ids)
+
+    def __iter__(self):
+        """
+        Yields (common id, array of unit ids) for every common parcel
+        """
+        for i in range(len(self)):
+            yield self.common_ids[i], self.units_of(i)
+
+    @property
+    def counts(self):
+        """
+        The number of units in each common parcel
+        """
+        return np.diff(self.offsets)
+
+    def units_of(self, i):
+        """
+        Returns the unit ids of the common parcel at position i
+        """
+        return self.unit_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def unit_lists(self):
+        """
+        Returns the unit ids of every common parcel as a list of lists
+        """
+        return [part.tolist()
+                for part in np.split(self.unit_ids, self.offsets[1:-1])]
+
+    def owners(self):
+        """
+        Returns a {unit id: common id} dictionary
+        """
+        owners = np.repeat(self.common_ids, self.counts)
+        return dict(zip(self.unit_ids.tolist(), owners.tolist()))
+
+
+def _candidate_pairs(commons, units, tolerance):
+    """
+    Returns (common positions, unit positions) of every unit within a
+    common parcel
+    """
+    # Positions of the units that have a shape
+    present = np.array([i for i, g in enumerate(units) if g is not None],
+                       dtype=np.int64)
+    index = si.PackedRTree([si.geometry_bounds(units[i]) for i in present])
+    vectorized = _is_shapely(commons)
+    unit_array = np.asarray(units, dtype=object) if vectorized else None
+
+    c_hits = []
+    u_hits = []
+    for c, common in enumerate(commons):
+        if common is None:
+            continue
+        xmin, ymin, xmax, ymax = si.geometry_bounds(common)
+        candidates = index.query((xmin - tolerance, ymin - tolerance,
+                                  xmax + tolerance, ymax + tolerance))
+        if len(candidates) == 0:
+            continue
+        candidates = present[candidates]
+        container = common.buffer(tolerance) if tolerance > 0 else common
+        if vectorized:
+            shapely.prepare(container)
+            inside = candidates[shapely.contains(container,
+                                                 unit_array[candidates])]
+        else:
+            inside = [u for u in candidates if units[u].within(container)]
+        c_hits.extend([c] * len(inside))
+        u_hits.extend(inside)
+    return (np.asarray(c_hits, dtype=np.int64),
+            np.asarray(u_hits, dtype=np.int64))
+
+
+def containment_join(commons, units, common_ids=None, unit_ids=None,
+                     tolerance=0.0):
+    """
+    Returns a Containment of the units within each common parcel
+
+    Parameter commons: the common parcels, holes already filled in
+    Condition: a list of shapely or arcpy polygons (None is allowed
+               and contains nothing)
+
+    Parameter units: the unit parcels
+    Condition: a list of geometries of the same kind as commons
+
+    Parameter common_ids: the id of each common parcel
+    Condition: a list the same length as commons, or None to use
+               positions
+
+    Parameter unit_ids: the id (normally OID) of each unit parcel
+    Condition: a list the same length as units, or None to use
+               positions
+
+    Parameter tolerance: how far outside its common parcel a unit
+                         may reach and still count as within it
+    Condition: a non-negative distance in the geometries' units
+    """
+    common_ids = np.arange(len(commons)) if common_ids is None \
+        else np.asarray(common_ids)
+    unit_ids = np.arange(len(units)) if unit_ids is None \
+        else np.asarray(unit_ids)
+
+    c_idx, u_idx = _candidate_pairs(commons, units, tolerance)
+    if len(c_idx):
+        # One owner per unit: the smallest containing common parcel,
+        # then the first one, for ties
+        if _is_shapely(commons):
+            area = shapely.area(np.asarray(commons, dtype=object)[c_idx])
+        else:
+            area = np.array([commons[c].area for c in c_idx])
+        order = np.lexsort((c_idx, area, u_idx))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = u_idx[order][1:] != u_idx[order][:-1]
+        keep = order[first]
+        c_idx, u_idx = c_idx[keep], u_idx[keep]
+
+        # CSR: grouped by common parcel, units in index order
+        order = np.lexsort((u_idx, c_idx))
+        c_idx, u_idx = c_idx[order], u_idx[order]
+
+    offsets = np.zeros(len(commons) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(c_idx, minlength=len(commons)), out=offsets[1:])
+    return Containment(common_ids, offsets, unit_ids[u_idx])
@@ -0,0 +1,598 @@
+"""
+In-process dissolve engine for Owned Unit Groupings
+
+PairwiseDissolve renames every statistics field (SUM_UNITS, FIRST_NAME...)
+and changes some of their types, which unionmerge then has to undo with
+a field map and another copy of the data. This module does the dissolve
+itself: it unions the geometries and reduces each attribute column with
+the NumPy reducers in aggregation.py, so results keep the original
+field names and types. Many OUGs can be dissolved at once, each
+column then being reduced for all of them in one pass.
+
+Nothing in here depends on arcpy. Features are plain Python
+(geometry, attributes) pairs, and geometries can be anything with a
+union() method - arcpy geometries in the toolbox, shapely geometries
+when testing or running outside ArcGIS.
+
+Units stacked on top of each other (one per floor of a condo tower)
+share a shape. Each distinct shape is unioned once, however many
+units have it, while every unit's attributes are still reduced. A
+union already worked out in an earlier run comes out of the geometry
+cache (see geomcache.py).
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import hashlib
+
+import numpy as np
+
+import aggregation as ag
+import cleanup as cu
+import geomcache as gm
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+# Tagged on every OUG. Bump it when merge results change.
+PROCESSOR_VERSION = "OUG Merge Processor v1.2"
+# Set on every OUG after dissolving, so they may vary between the
+# features dissolved: an OUG merged again with units added since
+TAGS = ["IS_OUG", "PROCESSOR", "SUBPROCESSOR"]
+
+# Statistics types accepted by PairwiseDissolve, in the same spelling.
+# The in-process engine takes anything registered in aggregation.py
+OPERATIONS = ["SUM", "MEAN", "MIN", "MAX", "RANGE", "STD", "COUNT",
+              "FIRST", "LAST", "MEDIAN", "VARIANCE", "UNIQUE", "CONCATENATE"]
+# The most unparseable values listed in an error
+REPORT_LIMIT = 10
+
+# Optional field holding the most features stacked on one shape
+STACK_FIELD = "STACK_COUNT"
+
+INTEGER_TYPES = ["SmallInteger", "Integer", "BigInteger"]
+FLOAT_TYPES = ["Single", "Double"]
+
+
+def _wkb(geoms):
+    """
+    Returns the normalized WKB of each geometry
+
+    shapely normalizes vertex and ring order, so the same shape drawn
+    starting from a different corner gives the same bytes. Without
+    shapely, arcpy geometries are compared by their WKB as is.
+    """
+    if shapely is None:
+        return [bytes(g.WKB) for g in geoms]
+    if not isinstance(geoms[0], shapely.Geometry):
+        geoms = shapely.from_wkb([bytes(g.WKB) for g in geoms])
+    return list(shapely.to_wkb(shapely.normalize(
+        np.asarray(geoms, dtype=object))))
+
+
+def stack_geometries(geoms):
+    """
+    Groups geometries that have exactly the same shape
+
+    Returns (shapes, counts): one geometry per distinct shape, in the
+    order each first appears, and how many of geoms have that shape.
+
+    Parameter geoms: the geometries to group
+    Condition: a list of arcpy or shapely geometries, without None
+    """
+    shapes, counts, _ = _stack(geoms)
+    return shapes, counts
+
+
+def _stack(geoms):
+    """
+    Does the work of stack_geometries(), also returning each shape's
+    digest
+    """
+    shapes = []
+    counts = []
+    position = {}
+    if not geoms:
+        return shapes, counts, []
+    for geom, wkb in zip(geoms, _wkb(geoms)):
+        key = hashlib.sha1(wkb).digest()
+        if key in position:
+            counts[position[key]] += 1
+        else:
+            position[key] = len(shapes)
+            shapes.append(geom)
+            counts.append(1)
+    return shapes, counts, list(position)
+
+
+def union_geometries(geoms):
+    """
+    Returns the union of a list of geometries
+
+    Stacked copies of a shape are unioned once (see stack_geometries()).
+    shapely geometries are unioned in one call. Anything else is unioned
+    pairwise as a balanced tree, which keeps intermediate results small.
+
+    Parameter geoms: the geometries to union
+    Condition: a non-empty list of arcpy or shapely geometries
+    """
+    geoms = [g for g in geoms if g is not None]
+    if not geoms:
+        return None
+    shapes, _ = stack_geometries(geoms)
+    return _union(shapes)
+
+
+def _union(geoms):
+    """
+    Unions a non-empty list of distinct geometries
+    """
+    if shapely is not None and isinstance(geoms[0], shapely.Geometry):
+        return shapely.union_all(geoms)
+    while len(geoms) > 1:
+        paired = [geoms[i].union(geoms[i + 1])
+                  for i in range(0, len(geoms) - 1, 2)]
+        if len(geoms) % 2:
+            paired.append(geoms[-1])
+        geoms = paired
+    return geoms[0]
+
+
+def _numeric(values):
+    """
+    Returns values as a float array, or None if they aren't all numbers
+    """
+    try:
+        return np.asarray(values, dtype="f8")
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_numeric(values):
+    """
+    Parses a column of text as numbers in one vectorized pass
+
+    Returns (numbers, bad). numbers is a float array with NaN wherever
+    the value is null or blank, and bad the positions of the values
+    that aren't numbers at all. Surrounding whitespace is ignored.
+
+    Parameter values: the column to parse
+    Condition: a list of strings (or numbers), possibly containing None
+    """
+    text = np.char.strip(np.array(["" if v is None else str(v)
+                                   for v in values], dtype=str))
+    blank = text == ""
+    try:
+        numbers = np.where(blank, "nan", text).astype("f8")
+        bad = ~blank & ~np.isfinite(numbers)
+    except ValueError:
+        # Something in there isn't a number. Find out what.
+        numbers = np.full(len(text), np.nan)
+        bad = np.zeros(len(text), dtype=bool)
+        for i in np.flatnonzero(~blank):
+            try:
+                numbers[i] = float(text[i])
+            except ValueError:
+                bad[i] = True
+        bad |= ~blank & ~np.isfinite(numbers)
+        numbers[bad] = np.nan
+    return numbers, np.flatnonzero(bad)
+
+
+def numeric_text(columns):
+    """
+    Sorts text columns into those holding only numbers and those that don't
+
+    Returns (numeric, bad): the set of columns that parse cleanly, and
+    a dictionary of {field: positions of unparseable values} for the
+    rest.
+
+    Parameter columns: the text columns to check
+    Condition: a dictionary of {field name: list of values}
+    """
+    numeric = set()
+    bad = {}
+    for field, values in columns.items():
+        _, unparseable = parse_numeric(values)
+        if len(unparseable):
+            bad[field] = [int(i) for i in unparseable]
+        else:
+            numeric.add(field)
+    return numeric, bad
+
+
+def bad_value_report(field, ids, values, limit=REPORT_LIMIT):
+    """
+    Returns a message listing the values of a text field that aren't numbers
+
+    Parameter field: the field checked
+    Condition: a string
+
+    Parameter ids: the features the values came from
+    Condition: a list of OIDs (or other ids), one per value
+
+    Parameter values: the unparseable values
+    Condition: a list, the same length as ids
+
+    Parameter limit: the most values to list
+    Condition: a positive integer
+    """
+    listed = ", ".join(f"{i}: {v!r}" for i, v in
+                       list(zip(ids, values))[:limit])
+    more = f" and {len(values) - limit} more" if len(values) > limit else ""
+    return (f"Text field {field} holds {len(values)} values that aren't "
+            f"numbers, so it can't be combined as numbers. "
+            f"OID: value - {listed}{more}")
+
+
+def reduce_column(values, op, separator="", weights=None):
+    """
+    Reduces a column of attribute values to one value with a statistic
+
+    Nulls are ignored by every operation except FIRST and LAST, which,
+    like Dissolve, take the value of the first / last feature as is.
+    Returns None if there is nothing left to reduce.
+
+    Parameter values: the column to reduce
+    Condition: a list of attribute values, possibly containing None
+
+    Parameter op: the statistic to compute
+    Condition: an operation registered in aggregation.py
+
+    Parameter separator: the separator used by CONCATENATE
+    Condition: a string
+
+    Parameter weights: see aggregation.reduce_groups()
+    """
+    return ag.reduce_groups(values, np.zeros(len(values), dtype=np.int64),
+                            1, op, weights, separator)[0]
+
+
+def cast_value(value, field_type):
+    """
+    Casts a reduced value back to the type of the field it came from
+
+    This is what keeps a SUM of an integer field an integer, instead of
+    the float Dissolve hands back.
+
+    Parameter value: the value to cast
+    Condition: any value returned by reduce_column()
+
+    Parameter field_type: the ArcGIS type of the original field
+    Condition: a Field.type string (e.g. 'Integer', 'String') or None
+    """
+    if value is None or field_type is None:
+        return value
+    if field_type in INTEGER_TYPES and isinstance(value, (int, float)):
+        return int(round(value))
+    if field_type in FLOAT_TYPES and isinstance(value, (int, float)):
+        return float(value)
+    if field_type == "String" and not isinstance(value, str):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    return value
+
+
+def aggregate(columns, stats, field_types=None, separator="",
+              parse=(), weights=None):
+    """
+    Returns a dictionary of {field: value} reducing every column in stats
+
+    Parameter columns: the attribute values to reduce
+    Condition: a dictionary of {field name: list of values}, with a
+               key for every field in stats, all lists the same length
+
+    Parameter stats: the statistic for each field
+    Condition: a dictionary of {field name: operation registered in
+               aggregation.py}
+
+    Parameter field_types: the original type of each field
+    Condition: a dictionary of {field name: Field.type string} or None.
+               Values are not cast if None
+
+    Parameter separator: the separator used by CONCATENATE
+    Condition: a string
+
+    Parameter parse: text fields to reduce as numbers
+    Condition: a collection of field names in stats. Values that
+               aren't numbers are treated as null (see parse_numeric())
+
+    Parameter weights: each feature's area, for weighted operations
+    Condition: see aggregation.reduce_groups()
+    """
+    length = len(next(iter(columns.values()), []))
+    return aggregate_groups(columns, np.zeros(length, dtype=np.int64), 1,
+                            stats, field_types, separator, parse,
+                            weights)[0]
+
+
+def aggregate_groups(columns, groups, n, stats, field_types=None,
+                     separator="", parse=(), weights=None):
+    """
+    Reduces every column in stats for many groups of features at once
+
+    Returns a list of n dictionaries of {field: value}, one per group.
+
+    Parameter groups: the group each feature belongs to
+    Condition: an integer array in range(n), as long as the columns
+
+    Parameter n: the number of groups
+    Condition: a non-negative integer
+
+    Other parameters: see aggregate()
+    """
+    field_types = field_types or {}
+    results = [{} for _ in range(n)]
+    for field, op in stats.items():
+        values = columns[field]
+        if field in parse:
+            numbers, _ = parse_numeric(values)
+            values = numbers
+        reduced = ag.reduce_groups(values, groups, n, op, weights, separator)
+        field_type = field_types.get(field)
+        for result, value in zip(results, reduced):
+            result[field] = cast_value(value, field_type)
+    return results
+
+
+def _areas(geoms):
+    """
+    Returns each geometry's area as a float array, NaN for None
+    """
+    positions = [i for i, g in enumerate(geoms) if g is not None]
+    areas = np.full(len(geoms), np.nan)
+    if not positions:
+        return areas
+    present = [geoms[i] for i in positions]
+    if shapely is not None and isinstance(present[0], shapely.Geometry):
+        areas[positions] = shapely.area(np.asarray(present, dtype=object))
+    else:
+        areas[positions] = [g.area for g in present]
+    return areas
+
+
+def dissolve_features(features, stats, field_types=None, separator="",
+                      parse=(), stack_field=None, cleanup=None):
+    """
+    Dissolves a list of features into a single feature
+
+    Returns a (geometry, attributes) pair. attributes has one entry
+    per field in stats, under the original field name.
+
+    Each distinct shape is unioned once, but the attributes of every
+    feature are reduced, stacked or not.
+
+    Parameter features: the features to dissolve
+    Condition: a non-empty list of (geometry, attributes) pairs,
+               where attributes is a dictionary containing
+               every field in stats
+
+    Parameters stats, field_types, separator, parse: see aggregate()
+
+    Parameter stack_field: where to put the most features that share
+                           one shape
+    Condition: a field name, or None to leave it out. Overrides any
+               statistic for the same field
+
+    Parameter cleanup: how to clean the geometries before the union
+                       (see cleanup.py). The union is then done in
+                       shapely on the same grid and returned as the
+                       same kind of geometry as the features
+    Condition: a cleanup.Cleanup, or None to union them as they are
+    """
+    return dissolve_groups([features], stats, field_types, separator,
+                           parse, stack_field, cleanup)[0]
+
+
+def dissolve_groups(groups, stats, field_types=None, separator="",
+                    parse=(), stack_field=None, cleanup=None):
+    """
+    Dissolves each of many lists of features into a single feature
+
+    Returns a (geometry, attributes) pair per group, in order. The
+    attributes of every group are reduced together, one pass per field
+    (see aggregate_groups()); the shapes are unioned group by group.
+
+    Parameter groups: the features of each group
+    Condition: a list of lists as taken by dissolve_features(), all
+               dissolved with the same stats and parse
+
+    Other parameters: see dissolve_features()
+    """
+    features = [f for group in groups for f in group]
+    labels = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    columns = {field: [attrs[field] for _, attrs in features]
+               for field in stats}
+    weights = None
+    if any(ag.get(op).weighted for op in stats.values()):
+        weights = _areas([geom for geom, _ in features])
+    reduced = aggregate_groups(columns, labels, len(groups), stats,
+                               field_types, separator, parse, weights)
+    return [(_dissolve_shapes([geom for geom, _ in group
+                               if geom is not None],
+                              attrs, stack_field, cleanup), attrs)
+            for group, attrs in zip(groups, reduced)]
+
+
+def _dissolve_shapes(geoms, attrs, stack_field, cleanup):
+    """
+    Returns the union of one group's shapes, filling in stack_field
+    """
+    shapes, counts, digests = _stack(geoms)
+    if stack_field is not None:
+        attrs[stack_field] = max(counts, default=0)
+    if not shapes:
+        return None
+
+    # The same shapes with the same cleanup always make the same OUG,
+    # whatever order they come in
+    key = None
+    if gm.cache.enabled:
+        key = gm.cache.key("union", digests,
+                           list(cleanup) if cleanup is not None else None,
+                           ordered=False)
+        found = gm.cache.lookup([key])
+        if key in found:
+            return gm.from_wkb(found[key], shapes[0])
+
+    if cleanup is not None:
+        # Each stacked shape is only cleaned once too
+        cleaned = [g for g in cu.clean_geometries(shapes, cleanup)
+                   if g is not None]
+        geom = cu.like(cu.union_clean(cleaned, cleanup), shapes[0]) \
+            if cleaned else None
+    else:
+        geom = _union(shapes)
+    if key is not None and geom is not None:
+        gm.cache.store([(key, gm.to_wkb(geom))])
+    return geom
+
+
+class StatisticsError(ValueError):
+    """
+    Raised by plan_statistics() when a field can't be dissolved
+
+    Attribute field: the offending field
+    """
+
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+class SystemFieldError(StatisticsError):
+    """A system-managed field was given an operation"""
+
+
+class TextOperationError(StatisticsError):
+    """A text field was given an operation other than FIRST"""
+
+    def __init__(self, field, op, detail=None):
+        message = f"Cannot perform operation {op} on field {field} " \
+                  "with type Text"
+        if detail:
+            message += f". {detail}"
+        super().__init__(field, message)
+        self.op = op
+
+
+class VaryingFieldError(StatisticsError):
+    """A field varies between features but has no operation"""
+
+
+class UnknownOperationError(StatisticsError):
+    """A field was given an operation that isn't registered"""
+
+
+def varying_columns(columns):
+    """
+    Returns the set of columns whose values aren't all the same
+
+    Parameter columns: the attribute values to check
+    Condition: a dictionary of {field name: list of values}
+    """
+    varying = set()
+    for field, values in columns.items():
+        if values and any(v != values[0] for v in values[1:]):
+            varying.add(field)
+    return varying
+
+
+def plan_statistics(field_types, user_ops, varying, insolubles=(),
+                    numeric=()):
+    """
+    Returns the statistic to dissolve each field with
+
+    These are the rules of unionmerge.create_dissolve_stats(), minus
+    the arcpy: user operations take precedence and must be registered
+    in aggregation.py, text fields may only take the operations that
+    accept text (FIRST, "Common Attribute", MODE, COUNT_DISTINCT)
+    unless they hold nothing but numbers, in which case they can also
+    take numeric ones, Shape_Length and Shape_Area take LAST, and any
+    other field but the TAGS must be the same for every feature, which
+    then takes FIRST.
+
+    Raises a StatisticsError subclass for the first field that
+    breaks a rule.
+
+    Parameter field_types: the fields of the layer being dissolved
+    Condition: a dictionary of {field name: Field.type string},
+               in field order
+
+    Parameter user_ops: the operations from the field map
+    Condition: a dictionary of {field name: operation}
+
+    Parameter varying: the fields whose values differ between features
+    Condition: a set of field names (see varying_columns())
+
+    Parameter insolubles: system-managed fields that are never dissolved
+    Condition: a list of field names
+
+    Parameter numeric: text fields holding only numbers
+    Condition: a set of field names (see numeric_text())
+    """
+    stats = {}
+    for field, field_type in field_types.items():
+        if field in user_ops:
+            op = user_ops[field]
+            if field in insolubles:
+                raise SystemFieldError(
+                    field, "Cannot combine system-managed values!")
+            if op not in ag.REDUCERS:
+                raise UnknownOperationError(
+                    field, f"{op} is not a supported operation "
+                           f"(field {field})")
+            if field_type == "String" and not ag.accepts_text(op) and not (
+                    ag.is_numeric(op) and field in numeric):
+                raise TextOperationError(field, op)
+            stats[field] = op
+        elif field in ["Shape_Length", "Shape_Area"]:
+            stats[field] = "LAST"
+        elif field in varying and field not in TAGS:
+            raise VaryingFieldError(
+                field, f"Attributes in column {field} vary between "
+                       "features, but no operation was provided "
+                       "to combine them!")
+        elif field not in insolubles:
+            stats[field] = "FIRST"
+    return stats
+
+
+def plan_features(units, user_ops, field_types, insolubles=()):
+    """
+    Checks a group of features against the field map and plans its
+    statistics
+
+    Works out which fields vary between the features and which text
+    fields given a numeric operation hold only numbers, then applies
+    plan_statistics(). Returns (stats, numeric): the statistic for each
+    field to dissolve, leaving out insolubles, and the text fields to
+    reduce as numbers (see aggregate()).
+
+    Raises a StatisticsError subclass if the features can't be
+    dissolved with user_ops.
+
+    Parameter units: the features to dissolve
+    Condition: a non-empty list of (id, geometry, attributes), where
+               attributes is a dictionary of {field name: value}. The
+               ids are only used in error messages
+
+    Parameters user_ops, field_types, insolubles: see plan_statistics()
+    """
+    checked = {f: [attrs.get(f) for _, _, attrs in units]
+               for f in field_types
+               if f not in user_ops and f not in insolubles}
+    text = {f: [attrs.get(f) for _, _, attrs in units]
+            for f, op in user_ops.items()
+            if field_types.get(f) == "String" and ag.is_numeric(op)}
+    numeric, unparseable = numeric_text(text)
+    for f, rows in unparseable.items():
+        raise TextOperationError(f, user_ops[f], bad_value_report(
+            f, [units[i][0] for i in rows], [text[f][i] for i in rows]))
+    stats = plan_statistics(field_types, user_ops, varying_columns(checked),
+                            insolubles, numeric)
+    return {f: op for f, op in stats.items() if f not in insolubles}, numeric
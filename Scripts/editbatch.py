@@ -0,0 +1,207 @@
+"""
+Batched write-back of OUGs to the unit parcel layer
+
+Each OUG used to be written with an Append (schema tested) and its
+units removed with a DeleteRows, two geoprocessing calls per OUG
+against the production feature class. EditBatch collects finished OUG
+rows and the OIDs of the units they replace, and writes them with one
+insert cursor and one OID-list delete inside a single edit session
+every batch_size OUGs.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import os
+from arcbackend import arcpy
+import arcscripttools as st
+import ouglog as ol
+import schemacache as sc
+
+# OUGs per edit session
+BATCH_SIZE = 500
+# OIDs per IN (...) clause when deleting
+OIDS_PER_CLAUSE = 1000
+# Field types an insert cursor can't write
+READ_ONLY_TYPES = ["OID", "Geometry", "GlobalID"]
+
+
+def workspace_of(dataset):
+    """
+    Returns the workspace (geodatabase) a dataset is stored in
+
+    Parameter dataset: the dataset's catalog path
+    Condition: a path to a dataset, possibly inside a feature dataset
+    """
+    path = os.path.dirname(dataset)
+    while path and arcpy.Describe(path).dataType != "Workspace":
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class EditBatch:
+    """
+    Collects OUGs and doomed unit OIDs for one target and writes them in bulk
+
+    Nothing is written until flush() is called, either explicitly or
+    by add() once batch_size OUGs are waiting. Call flush() once more
+    at the end of a run.
+
+    Parameter target: the unit parcel layer to write to
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter batch_size: the number of OUGs per edit session
+    Condition: a positive integer
+
+    Parameter on_commit: called after each edit session is saved
+    Condition: a function taking the list of records passed to add()
+               for the OUGs just written and, for each record, the
+               list of OIDs its OUG was written with, or None
+
+    Parameter on_begin: called just before each edit session starts
+    Condition: a function taking the list of records passed to add()
+               for the OUGs about to be written, or None
+
+    Parameter index: kept up to date with the OUGs written and the
+                     units deleted
+    Condition: a parcelindex.ParcelIndex of target, or None
+
+    Attribute written: (OUG OID, unit OIDs) for every OUG written so far
+    """
+
+    def __init__(self, target, batch_size=BATCH_SIZE, on_commit=None,
+                 index=None, on_begin=None):
+        self.target = sc.schema.path(target)
+        self.batch_size = batch_size
+        self.on_commit = on_commit
+        self.on_begin = on_begin
+        self.index = index
+        self.fields = [f.name for f in sc.schema.fields(target)
+                       if f.type not in READ_ONLY_TYPES
+                       and f.name not in st.INSOLUBLES]
+        self.inserted = 0
+        self.deleted = 0
+        self.written = []
+        self._rows = []
+        self._units = []
+        self._doomed = []
+        self._records = []
+        self._owners = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, geometry, attributes, unit_oids, record=None):
+        """
+        Queues one OUG and the units it replaces
+
+        Parameter geometry: the OUG's shape
+        Condition: an arcpy Geometry
+
+        Parameter attributes: the OUG's attributes
+        Condition: a dictionary of {field name: value}. Fields the target
+                   doesn't have are ignored, missing fields are left null
+
+        Parameter unit_oids: the OIDs of the units to delete from target
+        Condition: a list of integers
+
+        Parameter record: passed to on_begin before the OUG is written
+                          and to on_commit once it is saved
+        Condition: anything, or None to pass nothing
+        """
+        self._queue(geometry, attributes, unit_oids, self._owner(record))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def add_from(self, dataset, unit_oids, record=None):
+        """
+        Queues every feature in dataset as an OUG replacing unit_oids
+
+        Parameter dataset: the dissolved OUG (e.g. from dissolve_and_rectify)
+        Condition: a string describing a valid dataset in the ArcPy
+                   environment
+
+        Parameters unit_oids, record: see add()
+        """
+        names = set(sc.schema.names(dataset))
+        fields = [f for f in self.fields if f in names]
+        with arcpy.da.SearchCursor(dataset, ["SHAPE@"] + fields) as cursor:
+            rows = [(row[0], dict(zip(fields, row[1:]))) for row in cursor]
+        # Every part goes in the same batch as its record
+        owner = self._owner(record)
+        for i, (geometry, attributes) in enumerate(rows):
+            # Only count the units against the OUG once
+            self._queue(geometry, attributes, unit_oids if i == 0 else [],
+                        owner)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def _owner(self, record):
+        """
+        Queues record, returning its position, or None for no record
+        """
+        if record is None:
+            return None
+        self._records.append(record)
+        return len(self._records) - 1
+
+    def _queue(self, geometry, attributes, unit_oids, owner):
+        self._rows.append([geometry] + [attributes.get(f)
+                                        for f in self.fields])
+        self._units.append(list(unit_oids))
+        self._doomed.extend(unit_oids)
+        self._owners.append(owner)
+
+    def flush(self):
+        """
+        Writes every queued OUG and deletes every queued unit in one edit
+
+        Returns the number of OUGs written
+        """
+        if not self._rows and not self._doomed:
+            return 0
+
+        records = self._records
+        if self.on_begin is not None and records:
+            self.on_begin(records)
+
+        oid_field = arcpy.AddFieldDelimiters(
+            self.target, arcpy.Describe(self.target).OIDFieldName)
+        deleted = []
+        with ol.log.span("write", ougs=len(self._rows)), \
+                arcpy.da.Editor(workspace_of(self.target)):
+            with arcpy.da.InsertCursor(self.target,
+                                       ["SHAPE@"] + self.fields) as cursor:
+                new_oids = [cursor.insertRow(row) for row in self._rows]
+
+            for i in range(0, len(self._doomed), OIDS_PER_CLAUSE):
+                chunk = self._doomed[i:i + OIDS_PER_CLAUSE]
+                where = f"{oid_field} IN ({','.join(map(str, chunk))})"
+                with arcpy.da.UpdateCursor(self.target, ["OID@"],
+                                           where_clause=where) as cursor:
+                    for (oid,) in cursor:
+                        cursor.deleteRow()
+                        deleted.append(oid)
+        self.deleted += len(deleted)
+        if self.index is not None:
+            with ol.log.span("update spatial index"):
+                self.index.apply(new_oids, deleted)
+
+        written = len(self._rows)
+        self.inserted += written
+        self.written.extend(zip(new_oids, self._units))
+        outputs = [[] for _ in records]
+        for oid, owner in zip(new_oids, self._owners):
+            if owner is not None:
+                outputs[owner].append(oid)
+        self._rows = []
+        self._units = []
+        self._doomed = []
+        self._records = []
+        self._owners = []
+        if self.on_commit is not None and records:
+            self.on_commit(records, outputs)
+        return written
@@ -0,0 +1,254 @@
+"""
+License-free replacement for Eliminate Polygon Part
+
+Reproduces EliminatePolygonPart with condition="PERCENT" and
+part_option="CONTAINED_ONLY", which is how the OUG tools use it to fill
+in the holes the unit parcels leave in a common parcel. The Eliminate
+Polygon Part tool needs an Advanced license and is a full
+geoprocessing call per run; this does the same job in-process for any
+number of polygons at once.
+
+All rings of all polygons are packed into one coordinate array, so ring
+areas for a whole county of common parcels come out of one vectorized
+shoelace sum. Polygons can be shapely or arcpy geometries; each is
+returned as the same kind it came in as. Polygons already cleaned in
+an earlier run come out of the geometry cache (see geomcache.py).
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import numpy as np
+
+import geomcache as gm
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+
+def _is_shapely(geom):
+    return shapely is not None and isinstance(geom, shapely.Geometry)
+
+
+def _close(ring):
+    """
+    Returns ring as a closed (n, 2) array
+    """
+    ring = np.asarray(ring, dtype="f8")[:, :2]
+    if len(ring) and not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+    return ring
+
+
+def polygon_rings(geom):
+    """
+    Returns the parts of a polygon as lists of rings, exterior ring first
+
+    Parameter geom: the polygon to decompose
+    Condition: a shapely Polygon / MultiPolygon or an arcpy Polygon
+    """
+    parts = []
+    if _is_shapely(geom):
+        for poly in shapely.get_parts(geom):
+            if poly.is_empty:
+                continue
+            rings = [_close(poly.exterior.coords)]
+            rings.extend(_close(hole.coords) for hole in poly.interiors)
+            parts.append(rings)
+        return parts
+
+    # arcpy parts are arrays of points, with None between rings
+    for part in geom:
+        rings = []
+        current = []
+        for point in part:
+            if point is None:
+                rings.append(_close(current))
+                current = []
+            else:
+                current.append((point.X, point.Y))
+        if current:
+            rings.append(_close(current))
+        parts.append(rings)
+    return parts
+
+
+def _ring_wkt(ring):
+    return "(" + ", ".join(f"{float(x)!r} {float(y)!r}"
+                           for x, y in ring) + ")"
+
+
+def rings_to_wkt(parts):
+    """
+    Returns WKT for a polygon given as a list of parts of rings
+    """
+    if not parts:
+        return "POLYGON EMPTY"
+    return "MULTIPOLYGON (" + ", ".join(
+        "(" + ", ".join(_ring_wkt(ring) for ring in rings) + ")"
+        for rings in parts
+    ) + ")"
+
+
+def build_polygon(parts, like):
+    """
+    Builds a polygon from parts of rings, of the same kind as like
+
+    Parameter parts: the polygon, as returned by polygon_rings()
+
+    Parameter like: the geometry the parts came from
+    Condition: a shapely or arcpy geometry
+    """
+    if _is_shapely(like):
+        polys = [shapely.Polygon(rings[0], rings[1:]) for rings in parts]
+        if len(polys) == 1:
+            return polys[0]
+        return shapely.MultiPolygon(polys)
+
+    from arcbackend import arcpy
+    return arcpy.FromWKT(rings_to_wkt(parts), like.spatialReference)
+
+
+def ring_areas(coords, offsets):
+    """
+    Returns the unsigned area of every ring in a packed coordinate array
+
+    Parameter coords: the coordinates of every ring, one after another
+    Condition: an (n, 2) array, each ring closed
+
+    Parameter offsets: where each ring starts in coords
+    Condition: an integer array with one entry per ring plus a final
+               entry equal to len(coords)
+    """
+    x = coords[:, 0]
+    y = coords[:, 1]
+    cross = np.zeros(len(coords))
+    cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+    # The last vertex of a ring doesn't pair with the next ring's first
+    cross[offsets[1:] - 1] = 0
+    return np.abs(np.add.reduceat(cross, offsets[:-1])) / 2
+
+
+def _point_in_ring(point, ring):
+    """
+    Ray-casting test for whether point lies inside a closed ring
+    """
+    x, y = point
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at_x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crosses & (x < at_x)) % 2)
+
+
+def eliminate_polygon_parts(polygons, part_area_percent=90):
+    """
+    Removes small holes and contained parts from a batch of polygons
+
+    Matches EliminatePolygonPart with condition="PERCENT" and
+    part_option="CONTAINED_ONLY": a hole, or a part that sits inside
+    another part of the same polygon, is removed if its area is less
+    than part_area_percent of the polygon's total outer area. Removing
+    a hole fills it in. Parts that aren't contained by anything are
+    always kept.
+
+    Returns a list of polygons, in the same order and of the same kind
+    as the input. None in the input stays None.
+
+    Parameter polygons: the polygons to clean
+    Condition: a list of shapely or arcpy polygons
+
+    Parameter part_area_percent: the size threshold, as a percentage
+    Condition: a number between 0 and 100
+    """
+    if not gm.cache.enabled:
+        return _eliminate(polygons, part_area_percent)
+    # Polygons cleaned before are read back from the geometry cache
+    present = [i for i, g in enumerate(polygons) if g is not None]
+    wkbs = [gm.to_wkb(polygons[i]) for i in present]
+    keys = [gm.cache.key("eliminate", [gm.digest(wkb)], part_area_percent)
+            for wkb in wkbs]
+    found = gm.cache.lookup(keys)
+
+    cleaned = list(polygons)
+    todo = [i for i, k in zip(present, keys) if k not in found]
+    for i, k in zip(present, keys):
+        if k in found:
+            cleaned[i] = gm.from_wkb(found[k], polygons[i])
+    if todo:
+        for i, geom in zip(todo, _eliminate([polygons[i] for i in todo],
+                                            part_area_percent)):
+            cleaned[i] = geom
+        done = dict(zip(present, keys))
+        gm.cache.store([(done[i], gm.to_wkb(cleaned[i])) for i in todo])
+    return cleaned
+
+
+def _eliminate(polygons, part_area_percent):
+    """
+    Does the work of eliminate_polygon_parts(), without the cache
+    """
+    decomposed = [polygon_rings(g) if g is not None else []
+                  for g in polygons]
+
+    rings = []
+    poly_ids = []
+    exterior = []
+    for poly_id, parts in enumerate(decomposed):
+        for part in parts:
+            for ring_no, ring in enumerate(part):
+                rings.append(ring)
+                poly_ids.append(poly_id)
+                exterior.append(ring_no == 0)
+    if not rings:
+        return list(polygons)
+
+    poly_ids = np.asarray(poly_ids)
+    exterior = np.asarray(exterior)
+    lengths = np.array([len(r) for r in rings])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    areas = ring_areas(np.concatenate(rings), offsets)
+
+    outer = np.bincount(poly_ids[exterior], weights=areas[exterior],
+                        minlength=len(polygons))
+    small = areas < outer[poly_ids] * part_area_percent / 100
+
+    cleaned = []
+    ring_no = 0
+    for poly_id, parts in enumerate(decomposed):
+        if polygons[poly_id] is None:
+            cleaned.append(None)
+            continue
+        kept = []
+        part_areas = []
+        for part in parts:
+            kept.append([part[0]] + [
+                hole for i, hole in enumerate(part[1:], ring_no + 1)
+                if not small[i]
+            ])
+            part_areas.append((areas[ring_no], small[ring_no]))
+            ring_no += len(part)
+
+        # Islands left inside a removed hole are swallowed by the filled
+        # part; an island inside a hole that was kept stays where it is
+        if len(kept) > 1:
+            survivors = []
+            for i, part in enumerate(kept):
+                area, is_small = part_areas[i]
+                point = part[0][0]
+                contained = is_small and any(
+                    j != i and part_areas[j][0] > area
+                    and _point_in_ring(point, other[0])
+                    and not any(_point_in_ring(point, hole)
+                                for hole in other[1:])
+                    for j, other in enumerate(kept)
+                )
+                if not contained:
+                    survivors.append(part)
+            kept = survivors
+
+        cleaned.append(build_polygon(kept, polygons[poly_id]))
+    return cleaned
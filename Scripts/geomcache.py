@@ -0,0 +1,289 @@
+"""
+Persistent cache of geometry results
+
+Filling in a common parcel's holes and unioning its units only depend
+on the shapes going in, yet re-running a tool on the same condos (as
+review sessions mostly do) used to redo both from scratch. This module
+keeps their results in a small SQLite database of WKB blobs, keyed by a
+hash of the input shapes, the operation and its parameters, and the
+processor version, so anything already worked out is read back instead.
+
+The cache is bounded: once it holds more than MAX_BYTES of geometry,
+the entries used least recently are evicted. Bumping
+dissolve.PROCESSOR_VERSION changes every key, so stale results are
+never read again and age out the same way.
+
+The cache lives in Scripts/geomcache.sqlite, or wherever the
+OUG_GEOMCACHE environment variable points (set it empty to turn the
+cache off). If Scripts can't be written to, it goes in the temporary
+folder instead, and if the file can't be opened at all, the tools run
+without it. Delete the file to clear it.
+
+Nothing in here depends on arcpy, except to turn WKB back into arcpy
+geometries.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+CACHE = os.environ.get("OUG_GEOMCACHE", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "geomcache.sqlite"))
+# Where the default cache goes when Scripts can't be written to
+FALLBACK = os.path.join(tempfile.gettempdir(), "geomcache.sqlite")
+MAX_BYTES = 256 * 2 ** 20
+# Eviction goes down to this fraction of MAX_BYTES, so it doesn't run
+# again on the very next store
+LOW_WATER = 0.9
+# The most keys per SELECT, under SQLite's parameter limit
+CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    wkb BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+)
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS results_used ON results (used)"
+
+
+def to_wkb(geom):
+    """
+    Returns a geometry's WKB
+
+    Parameter geom: the geometry
+    Condition: a shapely or arcpy geometry
+    """
+    if shapely is not None and isinstance(geom, shapely.Geometry):
+        return shapely.to_wkb(geom)
+    return bytes(geom.WKB)
+
+
+def from_wkb(wkb, like):
+    """
+    Returns WKB as the same kind of geometry as like
+
+    Parameter wkb: the geometry
+    Condition: WKB bytes
+
+    Parameter like: a geometry of the kind wanted
+    Condition: a shapely or arcpy geometry
+    """
+    if shapely is not None and isinstance(like, shapely.Geometry):
+        return shapely.from_wkb(wkb)
+    from arcbackend import arcpy
+    return arcpy.FromWKB(bytearray(wkb), like.spatialReference)
+
+
+def digest(wkb):
+    """
+    Returns the SHA-1 digest of a geometry's WKB
+    """
+    return hashlib.sha1(wkb).digest()
+
+
+class GeometryCache:
+    """
+    A size-bounded store of geometry results, least recently used out
+
+    Closed until open() is called, and while closed every lookup
+    misses and nothing is stored, so code can always go through it.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.version = ""
+        self.max_bytes = MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._size = 0
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def open(self, path=CACHE, version="", max_bytes=MAX_BYTES):
+        """
+        Starts using the cache at path. Returns self.
+
+        Reopening the cache that is already open only updates version
+        and max_bytes. The hit and miss counts start over either way.
+
+        If the file can't be opened, the default CACHE is tried in the
+        temporary folder (FALLBACK), and otherwise the cache is left
+        closed with a message on stderr.
+
+        Parameter path: the cache file
+        Condition: a path to a file that can be created or written, or
+                   an empty string or None to leave the cache closed
+
+        Parameter version: part of every key, so results made by other
+                           versions are never read
+        Condition: a string (e.g. dissolve.PROCESSOR_VERSION)
+
+        Parameter max_bytes: the most geometry to keep
+        Condition: a positive integer
+        """
+        if path != self.path:
+            self.close()
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not path or self._db is not None:
+            return self
+        paths = [path, FALLBACK] if path == CACHE else [path]
+        for candidate in paths:
+            try:
+                self._connect(candidate)
+                return self
+            except (OSError, sqlite3.Error) as err:
+                self.close()
+                error = err
+        print(f"geomcache: can't open {' or '.join(paths)}, caching is "
+              f"off: {error}", file=sys.stderr)
+        return self
+
+    def _connect(self, path):
+        # Worker processes write to the same file
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Losing the last few results in a power cut only costs a miss
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._db.execute(INDEX)
+        self._db.commit()
+        self.path = path
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+        self._db = None
+        self.path = None
+
+    def key(self, operation, digests, params=(), ordered=True):
+        """
+        Returns the key of an operation on a list of shapes
+
+        Parameter operation: the operation's name
+        Condition: a string
+
+        Parameter digests: the shapes going in
+        Condition: a list of digest() bytes
+
+        Parameter params: the operation's other inputs
+        Condition: anything JSON-serializable
+
+        Parameter ordered: whether the order of the shapes matters
+        Condition: a boolean. Use False for e.g. a union
+        """
+        h = hashlib.sha1(json.dumps([self.version, operation, params],
+                                    default=str).encode())
+        for d in (digests if ordered else sorted(digests)):
+            h.update(d)
+        return h.digest()
+
+    def lookup(self, keys):
+        """
+        Returns {key: WKB} for the keys that are cached
+
+        Parameter keys: the keys to look up
+        Condition: a list of key() bytes
+        """
+        if self._db is None:
+            self.misses += len(keys)
+            return {}
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), CHUNK):
+            chunk = unique[start:start + CHUNK]
+            found.update(self._db.execute(
+                "SELECT key, wkb FROM results WHERE key IN "
+                f"({', '.join('?' * len(chunk))})", chunk).fetchall())
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE results SET used = ? WHERE key = ?",
+                                 [(now, k) for k in found])
+            self._db.commit()
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return {bytes(k): bytes(wkb) for k, wkb in found.items()}
+
+    def store(self, items):
+        """
+        Caches results, evicting old ones if the cache is over its size
+
+        Parameter items: the results
+        Condition: a list of (key, WKB) pairs
+        """
+        if self._db is None or not items:
+            return
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            [(k, wkb, len(wkb), now) for k, wkb in items]
+        )
+        self._db.commit()
+        self._size += sum(len(wkb) for _, wkb in items)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used results until the cache is
+        below LOW_WATER of max_bytes
+        """
+        # Other processes may have stored or evicted since
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        excess = self._size - int(self.max_bytes * LOW_WATER)
+        if excess <= 0:
+            return
+        doomed = []
+        for k, size in self._db.execute(
+                "SELECT key, size FROM results ORDER BY used"):
+            if excess <= 0:
+                break
+            doomed.append((k,))
+            excess -= size
+            self._size -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self._db.commit()
+
+    def clear(self):
+        """
+        Removes every cached result
+        """
+        if self._db is not None:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+            self._size = 0
+
+    def summary(self):
+        """
+        Returns a line on how much this session found in the cache
+        """
+        total = self.hits + self.misses
+        rate = f"{100 * self.hits / total:.0f}%" if total else "n/a"
+        return (f"Geometry cache: {self.hits} hits, {self.misses} misses "
+                f"({rate})")
+
+
+cache = GeometryCache()
@@ -0,0 +1,381 @@
+"""
+GeoParquet input and output for merging common parcels offline
+
+The script tools only work on layers open in ArcGIS Pro. This module
+runs the same merge as Batch Common Parcel to OUG (containment join,
+hole filling, the field map checks of create_dissolve_stats(), the
+dissolve and the IS_OUG / PROCESSOR tags) on GeoParquet files instead,
+so a snapshot of the parcels can be merged on any machine with
+pyarrow and shapely, no arcpy needed:
+
+    python geoparquet.py commons.parquet units.parquet out.parquet
+        --field-map field_map.json --workers 8
+
+Files are read a row group at a time with only the columns needed, and
+the output is written the same way: the unit parcels that weren't
+merged are streamed across batch by batch, then the OUGs are added.
+Columns stay in Arrow until they are handed to the dissolve, which
+needs Python records to send to its worker processes; that is the one
+copy. Geometries stay WKB from the file to the workers and back.
+
+The output has the unit file's columns, plus any of IS_OUG, PROCESSOR
+and SUBPROCESSOR it was missing. OUGs get new ids after the largest
+unit id, and Shape_Length / Shape_Area are recomputed if present.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import argparse
+import json
+import sys
+
+import cleanup as cu
+import dissolve as dv
+import geomcache as gm
+import ouglog as ol
+import parallel as pl
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+ID_FIELD = "OBJECTID"
+# Used when a file has no "geo" metadata
+GEOMETRY = "geometry"
+# Rows per batch read from or written to a file
+BATCH_ROWS = 65536
+# Fields the merge never dissolves (see arcscripttools.INSOLUBLES)
+INSOLUBLES = [ID_FIELD, "Shape_Length", "Shape_Area"]
+SUBPROCESSOR = "Common Parcel Merge"
+# Operations that give one of the values they combine, so keep a
+# boolean column's 0s and 1s (see field_type())
+BOOLEAN_OPS = ["FIRST", "LAST", "Common Attribute", "MIN", "MAX", "MODE"]
+
+
+def _require():
+    if pa is None or shapely is None:
+        raise ImportError("GeoParquet support requires pyarrow and shapely")
+
+
+def geometry_column(schema):
+    """
+    Returns the name of a GeoParquet file's primary geometry column
+
+    Parameter schema: the file's schema
+    Condition: a pyarrow Schema
+    """
+    geo = (schema.metadata or {}).get(b"geo")
+    if geo is None:
+        return GEOMETRY
+    return json.loads(geo)["primary_column"]
+
+
+def field_type(arrow_type):
+    """
+    Returns the ArcGIS Field.type of an Arrow type
+
+    Booleans are SmallInteger, as ArcGIS stores them, so they are
+    dissolved as 0 and 1 and written back as booleans by oug_table().
+
+    Parameter arrow_type: the type of a column
+    Condition: a pyarrow DataType
+    """
+    if pa.types.is_boolean(arrow_type) or pa.types.is_int8(arrow_type) \
+            or pa.types.is_int16(arrow_type):
+        return "SmallInteger"
+    if pa.types.is_integer(arrow_type):
+        return "BigInteger" if arrow_type.bit_width == 64 else "Integer"
+    if pa.types.is_float32(arrow_type) or pa.types.is_float16(arrow_type):
+        return "Single"
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "Double"
+    if pa.types.is_timestamp(arrow_type):
+        return "Date"
+    if pa.types.is_date(arrow_type):
+        return "DateOnly"
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return "Blob"
+    return "String"
+
+
+def field_types(path):
+    """
+    Returns a {field name: Field.type} dictionary for a GeoParquet file
+
+    The geometry column is left out. Only the file's footer is read.
+
+    Parameter path: the file
+    Condition: a path to a GeoParquet file
+    """
+    _require()
+    schema = pq.read_schema(path)
+    geometry = geometry_column(schema)
+    return {f.name: field_type(f.type) for f in schema
+            if f.name != geometry}
+
+
+def read_table(path, fields, id_field=ID_FIELD, batch_rows=BATCH_ROWS):
+    """
+    Returns the id, geometry and fields of a GeoParquet file as a Table
+
+    Only those columns are read, a batch at a time, and features
+    without a geometry are filtered out before the batches are put
+    together. The table keeps the file's "geo" metadata.
+
+    Parameter path: the file to read
+    Condition: a path to a GeoParquet file with WKB geometries
+
+    Parameter fields: the attribute fields to read
+    Condition: a list of column names found in the file
+
+    Parameter id_field: the column identifying each feature
+    Condition: the name of an integer column in the file
+
+    Parameter batch_rows: the most rows to read at once
+    Condition: a positive integer
+    """
+    _require()
+    parquet = pq.ParquetFile(path)
+    geometry = geometry_column(parquet.schema_arrow)
+    columns = [id_field, geometry] + fields
+    schema = pa.schema([parquet.schema_arrow.field(c) for c in columns],
+                       metadata=parquet.schema_arrow.metadata)
+    batches = [batch.filter(pc.is_valid(batch.column(geometry)))
+               for batch in parquet.iter_batches(batch_size=batch_rows,
+                                                 columns=columns)]
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def read_features(path, fields, id_field=ID_FIELD, batch_rows=BATCH_ROWS):
+    """
+    Returns a list of (id, WKB, attributes) for every feature in a file
+
+    This is the form parallel.dissolve_parallel() takes, since it
+    pickles features out to its workers, so here every column of
+    read_table() is copied into Python objects, one column at a time.
+    Features without a geometry are left out.
+
+    Parameters: see read_table()
+    """
+    table = read_table(path, fields, id_field, batch_rows)
+    ids = table.column(id_field).to_pylist()
+    wkbs = table.column(geometry_column(table.schema)).to_pylist()
+    columns = [table.column(f).to_pylist() for f in fields]
+    return [(fid, wkb, dict(zip(fields, values)))
+            for fid, wkb, *values in zip(ids, wkbs, *columns)]
+
+
+def output_schema(schema):
+    """
+    Returns schema with any missing OUG tag fields added
+    """
+    metadata = schema.metadata
+    for name, arrow_type in [("PROCESSOR", pa.string()),
+                             ("SUBPROCESSOR", pa.string()),
+                             ("IS_OUG", pa.int16())]:
+        if schema.get_field_index(name) < 0:
+            schema = schema.append(pa.field(name, arrow_type))
+    return schema.with_metadata(metadata)
+
+
+def oug_table(ougs, schema, first_id, id_field=ID_FIELD):
+    """
+    Returns the OUGs as a pyarrow Table laid out like schema
+
+    Parameter ougs: dissolved OUGs
+    Condition: a list of (common id, WKB, attributes, unit ids) as
+               returned by parallel.dissolve_parallel()
+
+    Parameter schema: the output schema
+    Condition: a pyarrow Schema from output_schema()
+
+    Parameter first_id: the id of the first OUG
+    Condition: an integer not used by any unit parcel
+    """
+    geometry = geometry_column(schema)
+    geoms = shapely.from_wkb([wkb for _, wkb, _, _ in ougs])
+    tags = {"IS_OUG": 1, "PROCESSOR": dv.PROCESSOR_VERSION,
+            "SUBPROCESSOR": SUBPROCESSOR}
+    columns = {}
+    for field in schema:
+        name = field.name
+        if name == id_field:
+            values = list(range(first_id, first_id + len(ougs)))
+        elif name == geometry:
+            values = [wkb for _, wkb, _, _ in ougs]
+        elif name == "Shape_Area":
+            values = shapely.area(geoms).tolist()
+        elif name == "Shape_Length":
+            values = shapely.length(geoms).tolist()
+        elif name in tags:
+            values = [tags[name]] * len(ougs)
+        else:
+            values = [attrs.get(name) for _, _, attrs, _ in ougs]
+            if pa.types.is_boolean(field.type):
+                values = [None if v is None else bool(v) for v in values]
+        columns[name] = pa.array(values, type=field.type)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def write_merged(unit_path, out_path, ougs, id_field=ID_FIELD,
+                 batch_rows=BATCH_ROWS):
+    """
+    Writes the unit parcels that weren't merged, then the OUGs
+
+    Returns the number of unit parcels copied across
+
+    Parameter unit_path: the unit parcels
+    Condition: a path to a GeoParquet file
+
+    Parameter out_path: where to write
+    Condition: a path to a new GeoParquet file
+
+    Parameter ougs: see oug_table()
+    """
+    _require()
+    parquet = pq.ParquetFile(unit_path)
+    schema = output_schema(parquet.schema_arrow)
+    merged = pa.array(sorted({oid for _, _, _, oids in ougs for oid in oids}),
+                      type=parquet.schema_arrow.field(id_field).type)
+
+    kept = 0
+    last_id = 0
+    with pq.ParquetWriter(out_path, schema) as writer:
+        for batch in parquet.iter_batches(batch_size=batch_rows):
+            ids = batch.column(id_field)
+            if len(ids):
+                last_id = max(last_id, pc.max(ids).as_py() or 0)
+            batch = batch.filter(pc.invert(pc.is_in(ids, value_set=merged)))
+            columns = [batch.column(f.name)
+                       if batch.schema.get_field_index(f.name) >= 0
+                       else pa.nulls(batch.num_rows, f.type)
+                       for f in schema]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns,
+                                                          schema=schema))
+            kept += batch.num_rows
+        if ougs:
+            writer.write_table(oug_table(ougs, schema, last_id + 1, id_field),
+                               row_group_size=batch_rows)
+    return kept
+
+
+def merge_commons(common_path, unit_path, out_path, field_ops, workers=1,
+                  tolerance=0.0, part_area_percent=90, id_field=ID_FIELD,
+                  batch_rows=BATCH_ROWS, cleanup=None):
+    """
+    Merges every common parcel in a GeoParquet file into OUGs
+
+    Works like Batch Common Parcel to OUG with more than one worker
+    (see parallel.dissolve_parallel()). Common parcels that can't be
+    dissolved are skipped with a warning in the log.
+
+    Returns the number of OUGs made and the number of units merged
+
+    Raises a ValueError if field_ops gives a boolean column an
+    operation not in BOOLEAN_OPS, before anything is read.
+
+    Parameter common_path: the common parcels
+    Condition: a path to a GeoParquet file
+
+    Parameter unit_path: the unit parcels
+    Condition: a path to a GeoParquet file
+
+    Parameter out_path: where to write the unit parcels after merging
+    Condition: a path to a new GeoParquet file
+
+    Parameter field_ops: the field map
+    Condition: a dictionary of {field name: operation}, with operations
+               as in the tool's field map (see dissolve.plan_statistics())
+
+    Parameters workers, tolerance, part_area_percent, cleanup:
+        see parallel.dissolve_parallel()
+    """
+    _require()
+    for field in pq.read_schema(unit_path):
+        op = field_ops.get(field.name)
+        if pa.types.is_boolean(field.type) and op is not None \
+                and op not in BOOLEAN_OPS:
+            raise ValueError(f"{field.name} is a boolean column and can't "
+                             f"be combined with {op}")
+    types = field_types(unit_path)
+    fields = [f for f in types if f not in INSOLUBLES]
+    common_names = set(field_types(common_path))
+
+    with ol.log.span("read"):
+        commons = read_features(common_path,
+                                [f for f in fields if f in common_names],
+                                id_field, batch_rows)
+        units = read_features(unit_path, fields, id_field, batch_rows)
+    ol.log.info(f"Processing {len(commons)} common parcels against "
+                f"{len(units)} unit parcels with {workers} workers")
+
+    with ol.log.span("dissolve", workers=workers):
+        ougs, skipped = pl.dissolve_parallel(
+            commons, units, field_ops, types, INSOLUBLES,
+            part_area_percent=part_area_percent, workers=workers,
+            tolerance=tolerance, cleanup=cleanup
+        )
+    for cid, reason in skipped:
+        ol.log.warning(f"Common parcel {cid} skipped: {reason}")
+
+    with ol.log.span("write", ougs=len(ougs)):
+        write_merged(unit_path, out_path, ougs, id_field, batch_rows)
+    return len(ougs), sum(len(oids) for _, _, _, oids in ougs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge common parcels into OUGs from GeoParquet files")
+    parser.add_argument("commons", help="common parcel GeoParquet file")
+    parser.add_argument("units", help="unit parcel GeoParquet file")
+    parser.add_argument("out", help="GeoParquet file to write")
+    parser.add_argument("--field-map", required=True,
+                        help="JSON file of {field: operation}")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.0)
+    parser.add_argument("--grid-size", type=float, default=0.0,
+                        help="snap unit parcels to this precision grid")
+    parser.add_argument("--min-sliver-area", type=float, default=0.0,
+                        help="drop parcel parts smaller than this")
+    parser.add_argument("--min-sliver-width", type=float, default=0.0,
+                        help="drop parcel parts thinner than this")
+    parser.add_argument("--cache", default=None,
+                        help="geometry cache file to reuse results from "
+                             "(see geomcache.py)")
+    parser.add_argument("--clean", action="store_true",
+                        help="repair invalid parcels even with no grid "
+                             "or sliver thresholds")
+    parser.add_argument("--id-field", default=ID_FIELD)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args(argv)
+
+    with open(args.field_map) as field_map:
+        field_ops = json.load(field_map)
+    cleanup = cu.Cleanup(args.grid_size, args.min_sliver_area,
+                         args.min_sliver_width)
+    if not args.clean and not any(cleanup):
+        cleanup = None
+    ol.log.echo = sys.stdout
+    ol.log.reset_timings()
+    gm.cache.open(args.cache, dv.PROCESSOR_VERSION)
+    oug_count, unit_count = merge_commons(
+        args.commons, args.units, args.out, field_ops, args.workers,
+        args.tolerance, id_field=args.id_field, batch_rows=args.batch_rows,
+        cleanup=cleanup)
+    ol.log.info(f"Created {oug_count} OUGs from {unit_count} unit parcels")
+    ol.log.info(gm.cache.summary())
+    ol.log.info(ol.log.log_summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Structured logging and stage timing for the OUG tools
+
+Log records are written as JSON lines by a background thread, so
+logging a message never waits on the file system, and the log file
+always lives in the same place (next to these scripts, unless the
+OUG_LOGFILE environment variable says otherwise) no matter what the
+current directory is. The file and thread are only opened by the first
+record logged, and never in worker processes (see parallel.py), which
+keep their timings but leave the file to the process that started
+them.
+
+Pipeline stages are timed with spans:
+
+    with log.span("dissolve", oug=oid):
+        ...
+
+    @log.span("eliminate")
+    def eliminate(...):
+        ...
+
+Each span writes a record with its duration, and the logger keeps
+running totals so a run can finish with log.log_summary().
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import ContextDecorator
+from datetime import datetime
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+LOGFILE = os.environ.get(
+    "OUG_LOGFILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "logfile.jsonl")
+)
+
+
+class FileSink:
+    """
+    Appends JSON lines to a file from a background thread
+
+    Records are queued by write() and written in batches. The file is
+    opened here, so a file that can't be opened raises OSError to the
+    caller rather than stopping the thread, and kept open for the life
+    of the sink. A batch that fails to write is dropped, and the first
+    failure reported on stderr, so the thread keeps going.
+
+    Parameter path: the file to append to
+    Condition: a path to a writable file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue = queue.Queue()
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="ouglog-sink")
+        self._thread.start()
+
+    def _run(self):
+        with self._file as log:
+            while True:
+                batch = [self._queue.get()]
+                # Drain whatever else is waiting before touching the file
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    lines = [json.dumps(r, default=str) + "\n"
+                             for r in batch if r is not None]
+                    log.writelines(lines)
+                    log.flush()
+                except Exception as err:
+                    # The batch is lost, but flush() mustn't wait on it
+                    if not self._failed:
+                        print(f"ouglog: can't write to {self.path}, some "
+                              f"records were lost: {err}", file=sys.stderr)
+                    self._failed = True
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if None in batch:
+                    return
+
+    def write(self, record):
+        """
+        Queues a record (any JSON-serializable dictionary) to be written
+        """
+        self._queue.put(record)
+
+    def flush(self):
+        """
+        Blocks until every queued record has been written
+        """
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """
+        Writes everything still queued and stops the background thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class Span(ContextDecorator):
+    """
+    Times a block of code (or every call of a function) for a Logger
+
+    Created by Logger.span(); see the module documentation.
+    """
+
+    def __init__(self, logger, name, fields):
+        self.logger = logger
+        self.name = name
+        self.fields = fields
+        self._starts = []
+
+    def __enter__(self):
+        self._starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._starts.pop()
+        self.logger.record_span(self.name, duration,
+                                failed=exc_type is not None, **self.fields)
+        return False
+
+
+class Logger:
+    """
+    Leveled JSON-lines logger with stage timing
+
+    Parameter path: the log file, or None to only keep timings
+    Condition: a path to a writable file or None. It isn't opened
+               until the first record is logged
+
+    Parameter level: the lowest level written to the file
+    Condition: one of LEVELS
+
+    Parameter echo: where messages are also written as plain text,
+                    e.g. sys.stdout for a command line tool
+    Condition: a text stream, or None to only write the file
+    """
+
+    def __init__(self, path=LOGFILE, level="INFO", echo=None):
+        self.level = level
+        self.echo = echo
+        self.path = path
+        self._sink = None
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def _open_sink(self):
+        """
+        Returns the file sink, opening it on first use
+
+        Returns None in worker processes, without a path, or once the
+        file has failed to open. A failure is reported on stderr once.
+        """
+        if self._sink is not None or self.path is None:
+            return self._sink
+        if multiprocessing.parent_process() is not None:
+            return None
+        with self._lock:
+            if self._sink is None and self.path is not None:
+                try:
+                    self._sink = FileSink(self.path)
+                except OSError as err:
+                    print(f"ouglog: can't open {self.path}, logging to "
+                          f"file is off: {err}", file=sys.stderr)
+                    self.path = None
+        return self._sink
+
+    def log(self, level, msg, **fields):
+        """
+        Writes a record with a message and any extra fields
+
+        Parameter level: the level of the message
+        Condition: one of LEVELS
+
+        Parameter msg: the message
+        Condition: none, it is converted to a string
+        """
+        if LEVELS[level] < LEVELS[self.level]:
+            return
+        if self.echo is not None:
+            print(msg if level == "INFO" else f"{level}: {msg}",
+                  file=self.echo)
+        sink = self._open_sink()
+        if sink is None:
+            return
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"),
+                  "level": level,
+                  "message": str(msg)}
+        record.update(fields)
+        sink.write(record)
+
+    def debug(self, msg, **fields):
+        self.log("DEBUG", msg, **fields)
+
+    def info(self, msg, **fields):
+        self.log("INFO", msg, **fields)
+
+    def warning(self, msg, **fields):
+        self.log("WARNING", msg, **fields)
+
+    def error(self, msg, **fields):
+        self.log("ERROR", msg, **fields)
+
+    def span(self, name, **fields):
+        """
+        Returns a context manager / decorator that times a pipeline stage
+
+        Parameter name: the name of the stage (e.g. "dissolve")
+        Condition: a string
+
+        Any keyword arguments (e.g. oug=oid) are added to the record.
+        """
+        return Span(self, name, fields)
+
+    def record_span(self, name, duration, **fields):
+        """
+        Adds a finished span to the timings and writes it to the log
+        """
+        with self._lock:
+            self._timings.setdefault(name, []).append(duration)
+        self.log("WARNING" if fields.get("failed") else "INFO",
+                 f"{name} took {duration:.3f}s",
+                 span=name, duration=duration, **fields)
+
+    def summary(self):
+        """
+        Returns {stage: {count, total, mean, max}} over all recorded spans
+        """
+        with self._lock:
+            timings = {name: list(d) for name, d in self._timings.items()}
+        return {
+            name: {"count": len(d),
+                   "total": sum(d),
+                   "mean": sum(d) / len(d),
+                   "max": max(d)}
+            for name, d in timings.items()
+        }
+
+    def log_summary(self):
+        """
+        Writes the timing summary to the log and returns it as text
+        """
+        summary = self.summary()
+        lines = [f"{name}: {s['count']} runs, {s['total']:.2f}s total, "
+                 f"{s['mean']:.3f}s mean, {s['max']:.3f}s max"
+                 for name, s in summary.items()]
+        self.log("INFO", "Stage timings", timings=summary)
+        return "\n".join(lines)
+
+    def reset_timings(self):
+        """
+        Clears the recorded spans, e.g. at the start of a tool run
+        """
+        with self._lock:
+            self._timings.clear()
+
+    def flush(self):
+        """
+        Blocks until every record logged so far is on disk
+        """
+        if self._sink is not None:
+            self._sink.flush()
+
+
+# Shared by every module in the toolbox
+log = Logger()
+atexit.register(log.flush)
@@ -0,0 +1,327 @@
+"""
+Tile-partitioned parallel OUG merging
+
+Merging one common parcel into an OUG doesn't depend on any other
+common parcel, so a whole layer can be split up between processes.
+The extent of the common parcels is cut into quadtree tiles until no
+tile holds more than max_per_tile of them, and each tile (its common
+parcels plus every unit parcel that could be inside them) is dissolved
+in a worker process.
+
+A common parcel belongs to the tile containing the centre of its
+bounding box. Tiles are half-open on their upper edges, so a common
+parcel straddling a tile edge is assigned to exactly one tile, and
+always the same one. Units are matched to common parcels before the
+work is split up, so each unit goes to the one tile that needs it.
+
+Workers don't use arcpy. Geometries travel as WKB and are dissolved
+with shapely, using the same statistics rules as
+unionmerge.create_dissolve_stats() (see dissolve.plan_statistics()).
+batch_common_to_oug.py converts the results back and writes them.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import containment as cn
+import dissolve as dv
+import eliminate as el
+import geomcache as gm
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+# Tiles per worker, so a few slow tiles don't leave workers idle
+TILES_PER_WORKER = 4
+# Deeper than this and every centre in the tile is the same point
+MAX_DEPTH = 32
+
+
+def default_workers():
+    """
+    Returns the number of worker processes to use by default
+    """
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def plan_tiles(centers, max_per_tile):
+    """
+    Splits a set of points into quadtree tiles
+
+    Returns a list of index arrays, one per non-empty tile, in a fixed
+    order. Every point is in exactly one tile: a point on the line
+    between two tiles goes to the upper / right one.
+
+    Parameter centers: the points to split up
+    Condition: an (n, 2) array of x, y coordinates
+
+    Parameter max_per_tile: the most points a tile may hold
+    Condition: a positive integer
+    """
+    centers = np.asarray(centers, dtype="f8").reshape(-1, 2)
+    if len(centers) == 0:
+        return []
+    tiles = []
+    # (xmin, ymin, xmax, ymax, indices, depth), split depth first
+    stack = [(*centers.min(axis=0), *centers.max(axis=0),
+              np.arange(len(centers)), 0)]
+    while stack:
+        xmin, ymin, xmax, ymax, idx, depth = stack.pop()
+        if len(idx) <= max_per_tile or depth >= MAX_DEPTH:
+            tiles.append(idx)
+            continue
+        xmid = (xmin + xmax) / 2
+        ymid = (ymin + ymax) / 2
+        right = centers[idx, 0] >= xmid
+        top = centers[idx, 1] >= ymid
+        # Pushed in reverse so tiles come out in a fixed order
+        for is_right, is_top, box in reversed([
+                (False, False, (xmin, ymin, xmid, ymid)),
+                (True, False, (xmid, ymin, xmax, ymid)),
+                (False, True, (xmin, ymid, xmid, ymax)),
+                (True, True, (xmid, ymid, xmax, ymax))]):
+            sub = idx[(right == is_right) & (top == is_top)]
+            if len(sub):
+                stack.append((*box, sub, depth + 1))
+    return tiles
+
+
+def dissolve_common(common_geom, common_attrs, units, user_ops,
+                    field_types, insolubles=(), cleanup=None):
+    """
+    Dissolves one common parcel and its units into an OUG
+
+    Works like common_to_oug.merge_common_parcel(): the statistics are
+    planned from the units, then the common parcel is added as the
+    last feature and everything is dissolved.
+
+    Returns a (geometry, attributes) pair.
+    Raises dissolve.StatisticsError if the field map doesn't cover
+    every field that varies between the units, or gives a numeric
+    operation to a text field that isn't all numbers.
+
+    Parameter common_geom: the common parcel
+    Condition: a shapely polygon
+
+    Parameter common_attrs: the common parcel's attributes
+    Condition: a dictionary of {field name: value}. Fields the units
+               have but the common parcel doesn't are left null, like
+               an Append without schema testing
+
+    Parameter units: the unit parcels inside the common parcel
+    Condition: a non-empty list of (OID, shapely polygon, attributes)
+
+    Parameters user_ops, field_types, insolubles:
+        see dissolve.plan_statistics()
+
+    Parameter cleanup: see dissolve.dissolve_features()
+    """
+    stats, numeric, features = plan_common(common_geom, common_attrs, units,
+                                           user_ops, field_types, insolubles)
+    stack_field = dv.STACK_FIELD if dv.STACK_FIELD in field_types else None
+    return dv.dissolve_features(features, stats, field_types, parse=numeric,
+                                stack_field=stack_field, cleanup=cleanup)
+
+
+def plan_common(common_geom, common_attrs, units, user_ops, field_types,
+                insolubles=()):
+    """
+    Plans the dissolve of one common parcel and its units
+
+    Returns (stats, numeric, features), as taken by
+    dissolve.dissolve_features(). Raises dissolve.StatisticsError like
+    dissolve_common().
+
+    Parameters: see dissolve_common()
+    """
+    stats, numeric = dv.plan_features(units, user_ops, field_types,
+                                      insolubles)
+    features = [(geom, {f: attrs.get(f) for f in stats})
+                for _, geom, attrs in units + [(None, common_geom,
+                                                common_attrs)]]
+    return stats, numeric, features
+
+
+def dissolve_tile(task):
+    """
+    Dissolves every common parcel in one tile. Runs in a worker process.
+
+    Returns a list of (common id, OUG WKB, attributes, unit OIDs), a
+    list of (common id, message) for common parcels that couldn't be
+    dissolved, and the geometry cache's (hits, misses) for the tile.
+
+    Parameter task: everything the worker needs
+    Condition: a dictionary with keys
+        commons: a list of (id, WKB, attributes, units) common parcels,
+                 holes already filled in, where units is a non-empty
+                 list of (OID, WKB, attributes) unit parcels
+        user_ops, field_types, insolubles: see plan_statistics()
+        cleanup: see dissolve.dissolve_features()
+        cache: the geometry cache's (path, version), or None
+    """
+    if task["cache"] and not gm.cache.enabled:
+        gm.cache.open(*task["cache"])
+    hits, misses = gm.cache.hits, gm.cache.misses
+    field_types = task["field_types"]
+    stack_field = dv.STACK_FIELD if dv.STACK_FIELD in field_types else None
+    # Common parcels planned the same way are dissolved together, so
+    # each field is aggregated once for all of them
+    plans = {}
+    failed = []
+    for cid, cwkb, cattrs, units in task["commons"]:
+        unit_geoms = shapely.from_wkb([wkb for _, wkb, _ in units])
+        try:
+            stats, numeric, features = plan_common(
+                shapely.from_wkb(cwkb), cattrs,
+                [(oid, g, attrs) for (oid, _, attrs), g
+                 in zip(units, unit_geoms)],
+                task["user_ops"], field_types, task["insolubles"]
+            )
+        except dv.StatisticsError as err:
+            failed.append((cid, str(err)))
+            continue
+        plan = plans.setdefault(
+            (tuple(stats.items()), frozenset(numeric)), (stats, numeric, []))
+        plan[2].append((cid, features, [oid for oid, _, _ in units]))
+
+    results = []
+    for stats, numeric, commons in plans.values():
+        ougs = dv.dissolve_groups(
+            [features for _, features, _ in commons], stats, field_types,
+            parse=numeric, stack_field=stack_field, cleanup=task["cleanup"]
+        )
+        results.extend((cid, shapely.to_wkb(geom), attrs, oids)
+                       for (cid, _, oids), (geom, attrs)
+                       in zip(commons, ougs))
+    # Common id order, like the tile came in
+    order = {cid: i for i, (cid, _, _, _) in enumerate(task["commons"])}
+    results.sort(key=lambda r: order[r[0]])
+    return results, failed, (gm.cache.hits - hits, gm.cache.misses - misses)
+
+
+def process_context():
+    """
+    Returns the multiprocessing context for the worker pool
+
+    Inside ArcGIS Pro sys.executable is ArcGISPro.exe, so workers
+    have to be pointed at the Python that ships with it.
+    """
+    context = multiprocessing.get_context("spawn")
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        for name in ["pythonw.exe", "python.exe", "python"]:
+            candidate = os.path.join(sys.exec_prefix, name)
+            if os.path.exists(candidate):
+                context.set_executable(candidate)
+                break
+    return context
+
+
+def dissolve_parallel(commons, units, user_ops, field_types, insolubles=(),
+                      part_area_percent=90, workers=None, max_per_tile=None,
+                      tolerance=0.0, cleanup=None):
+    """
+    Dissolves many common parcels into OUGs across worker processes
+
+    Holes are filled in and units matched to common parcels here, in
+    one containment join (see containment.py), so each unit is sent to
+    exactly one worker. The workers only dissolve.
+
+    Returns (ougs, skipped). ougs is a list of
+    (common id, OUG WKB, attributes, unit OIDs) in common id order.
+    skipped is a list of (common id, reason) for common parcels that
+    contain no units or couldn't be dissolved.
+
+    Results are the same for any number of workers or tiles.
+
+    Parameter commons: the common parcels
+    Condition: a list of (id, WKB, attributes) with unique, sortable ids
+
+    Parameter units: the unit parcels
+    Condition: a list of (OID, WKB, attributes)
+
+    Parameters user_ops, field_types, insolubles:
+        see dissolve.plan_statistics()
+
+    Parameter part_area_percent: see eliminate.eliminate_polygon_parts()
+
+    Parameter workers: the number of worker processes
+    Condition: a positive integer, or None for default_workers().
+               With 1, everything runs in this process
+
+    Parameter max_per_tile: the most common parcels per tile
+    Condition: a positive integer, or None to make about
+               TILES_PER_WORKER tiles per worker
+
+    Parameter tolerance: see containment.containment_join()
+
+    Parameter cleanup: see dissolve.dissolve_features()
+    """
+    if shapely is None:
+        raise ImportError("Parallel merging requires shapely")
+    workers = workers or default_workers()
+    if not commons:
+        return [], []
+    if max_per_tile is None:
+        max_per_tile = max(1, -(-len(commons) // (workers * TILES_PER_WORKER)))
+
+    common_geoms = el.eliminate_polygon_parts(
+        list(shapely.from_wkb([wkb for _, wkb, _ in commons])),
+        part_area_percent
+    )
+    unit_geoms = list(shapely.from_wkb([wkb for _, wkb, _ in units]))
+    join = cn.containment_join(common_geoms, unit_geoms, tolerance=tolerance)
+
+    skipped = [(commons[i][0], "contains no unit parcels")
+               for i in np.flatnonzero(join.counts == 0)]
+    common_bounds = shapely.bounds(np.asarray(common_geoms, dtype=object))
+    centers = np.column_stack([
+        (common_bounds[:, 0] + common_bounds[:, 2]) / 2,
+        (common_bounds[:, 1] + common_bounds[:, 3]) / 2,
+    ])
+
+    tasks = []
+    for tile in plan_tiles(centers, max_per_tile):
+        tile_commons = []
+        for i in tile:
+            inside = join.units_of(i)
+            if len(inside) == 0:
+                continue
+            cid, _, cattrs = commons[i]
+            tile_commons.append((cid, shapely.to_wkb(common_geoms[i]), cattrs,
+                                 [units[u] for u in inside]))
+        if tile_commons:
+            tasks.append({
+                "commons": tile_commons,
+                "user_ops": user_ops,
+                "field_types": field_types,
+                "insolubles": list(insolubles),
+                "cleanup": cleanup,
+                "cache": (gm.cache.path, gm.cache.version)
+                if gm.cache.enabled else None,
+            })
+
+    if workers == 1 or len(tasks) <= 1:
+        done = [dissolve_tile(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=process_context()) as pool:
+            done = list(pool.map(dissolve_tile, tasks))
+        # Counted in the workers' copies of the cache
+        for _, _, (hits, misses) in done:
+            gm.cache.hits += hits
+            gm.cache.misses += misses
+
+    ougs = sorted((r for tile, _, _ in done for r in tile),
+                  key=lambda r: r[0])
+    skipped += [s for _, tile, _ in done for s in tile]
+    skipped.sort(key=lambda s: s[0])
+    return ougs, skipped
@@ -0,0 +1,663 @@
+"""
+Persistent spatial index of a parcel layer
+
+Finding the units inside a common parcel used to mean asking ArcGIS to
+run SelectLayerByLocation against the whole unit parcel layer, and the
+batch tool read every unit's shape to do its own containment join,
+however few common parcels it was given. Nothing carried over from one
+run to the next. This module packs the bounding boxes of a layer's
+features into a spatialindex.PackedRTree once, saves it to a flat file
+next to the data, and memory-maps it on later runs, so opening it costs
+next to nothing and only the candidates it returns are read and tested.
+Several tool runs and processes can map the same file at once.
+
+The file keeps a fingerprint of the layer: the number of features with
+a shape and a sum of hashes of each one's OID, centroid, area and
+perimeter, which ArcGIS reads without building any geometries. The
+OUGs the tools append and the units they delete are recorded in a
+small delta file next to the index, and folded into a newly packed
+tree once they amount to COMPACT_FRACTION of it, so a saved index is
+used as it is from one run to the next. Only a rebuild (see
+open_index()) reads the whole layer to check the fingerprint, which is
+needed after the layer is edited outside these tools. For a file
+geodatabase, a change to its files since the index was saved is noted
+in the log as a reminder.
+
+Indexes are kept next to the workspace, as <workspace>.<dataset>.oidx,
+or in the directory the OUG_SPATIAL_INDEX environment variable points
+to (set it empty to turn the index off, and go back to
+SelectLayerByLocation). Delete the files to have them built again.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from arcbackend import arcpy
+import arcscripttools as st
+import containment as cn
+import editbatch as eb
+import ouglog as ol
+import schemacache as sc
+import spatialindex as si
+
+INDEX_DIR = os.environ.get("OUG_SPATIAL_INDEX")
+EXTENSION = ".oidx"
+MAGIC = b"OUGIDX1\n"
+# Every array in the file starts on a multiple of this many bytes
+ALIGN = 64
+# Edits since the tree was packed, as a fraction of its size, before it
+# is packed again
+COMPACT_FRACTION = 0.1
+# Above this fraction of the layer, reading every unit beats reading
+# the candidates OID list by OID list
+SCAN_FRACTION = 0.5
+# The tokens a feature's hash is made of; none of them builds a geometry
+HASH_FIELDS = ["OID@", "SHAPE@XY", "SHAPE@AREA", "SHAPE@LENGTH"]
+
+
+def _mix(x):
+    """
+    splitmix64's finalizer, over an array of uint64
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def row_hashes(oids, xs, ys, areas, lengths):
+    """
+    Returns a uint64 hash of each feature's OID, centroid, area and
+    perimeter
+
+    Parameters: one array or list of numbers per attribute, one entry
+                per feature
+    """
+    h = _mix(np.asarray(oids, dtype=np.int64).view(np.uint64))
+    for column in (xs, ys, areas, lengths):
+        h = _mix(h ^ np.asarray(column, dtype="f8").view(np.uint64))
+    return h
+
+
+def fingerprint(hashes):
+    """
+    Returns (count, hash sum) of a set of features
+
+    The sum wraps around at 2 ** 64, so features can be added to it and
+    taken out of it again in any order.
+
+    Parameter hashes: the features' hashes
+    Condition: a uint64 array from row_hashes()
+    """
+    return len(hashes), int(np.sum(hashes, dtype=np.uint64))
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _replace(path, write):
+    """
+    Writes a file through write(file) next to path, then moves it over
+    path, so no one ever maps half a file
+    """
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as out:
+            write(out)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ParcelIndex:
+    """
+    A packed R-tree over the bounding boxes of a dataset's features,
+    and the features added to and deleted from it since it was packed
+
+    Queries return OIDs. Deleted features are filtered out of the tree's
+    results and added ones tested one by one, until save() packs them
+    into a new tree.
+
+    Parameter path: the index file
+    Condition: a path, see index_path()
+
+    Parameter dataset: the catalog path of the indexed dataset
+
+    Parameter tree: the packed tree, with OIDs as its order
+    Condition: a spatialindex.PackedRTree
+
+    Parameter hashes: the hash of each of the tree's leaf entries
+    Condition: a uint64 array in the tree's leaf order
+
+    Attribute fingerprint: (count, hash sum) of the features indexed
+
+    Attribute stamp: the workspace_stamp() the index last matched, or None
+
+    Attribute verified: whether the index is taken to match the dataset
+                        (see open_index())
+    """
+
+    def __init__(self, path, dataset, tree, hashes):
+        self.path = path
+        self.dataset = dataset
+        self.tree = tree
+        self.hashes = hashes
+        self.count, self.total = fingerprint(hashes)
+        # (count, hash sum) of the tree alone, which ties a delta
+        # file to the tree it was recorded against
+        self.base = (self.count, self.total)
+        self.added_ids = np.empty(0, dtype=np.int64)
+        self.added_boxes = np.empty((0, 4), dtype="f8")
+        self.added_hashes = np.empty(0, dtype=np.uint64)
+        self.deleted = np.empty(0, dtype=np.int64)
+        self.stamp = None
+        self.verified = False
+        self._by_id = None
+        # The tree isn't on disk yet
+        self._packed = False
+
+    @property
+    def fingerprint(self):
+        return self.count, self.total
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def build(cls, path, dataset, oids, boxes, hashes,
+              node_size=si.NODE_SIZE):
+        """
+        Packs a new index over features
+
+        Parameters path, dataset: see ParcelIndex
+
+        Parameters oids, boxes, hashes: the features, as from read_rows()
+        """
+        tree = si.PackedRTree(boxes, node_size)
+        # Queries return OIDs rather than positions
+        tree.order = np.asarray(oids, dtype=np.int64)[tree.order]
+        hashes = _reorder(oids, tree.order,
+                          np.asarray(hashes, dtype=np.uint64))
+        index = cls(path, dataset, tree, hashes)
+        index._packed = True
+        return index
+
+    @classmethod
+    def load(cls, path, dataset):
+        """
+        Returns the index saved at path, memory-mapped, with the edits
+        recorded since, or None if there is no usable index there
+
+        Parameter dataset: the catalog path of the dataset it must be for
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                (length,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(length))
+            if header.get("dataset") != dataset:
+                return None
+            raw = np.memmap(path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError, struct.error):
+            return None
+
+        offset = len(MAGIC) + 8 + length
+        arrays = []
+        try:
+            for dtype, rows in ([("<i8", header["size"]),
+                                 ("<u8", header["size"])]
+                                + [("<f8", n) for n in header["levels"]]):
+                offset = _aligned(offset)
+                width = 1 if dtype != "<f8" else 4
+                nbytes = rows * width * 8
+                if offset + nbytes > len(raw):
+                    # A truncated file
+                    return None
+                array = raw[offset:offset + nbytes].view(dtype)
+                arrays.append(array if width == 1
+                              else array.reshape(rows, width))
+                offset += nbytes
+        except (KeyError, TypeError, ValueError):
+            return None
+        tree = si.PackedRTree.from_levels(arrays[2:], arrays[0],
+                                          header["node_size"])
+        index = cls(path, dataset, tree, arrays[1])
+        if header.get("base") != list(index.base):
+            return None
+        index._load_delta()
+        return index
+
+    def _load_delta(self):
+        try:
+            with np.load(self.path + ".delta") as delta:
+                if tuple(delta["base"].tolist()) != self.base:
+                    return
+                self.added_ids = delta["ids"]
+                self.added_boxes = delta["boxes"].reshape(-1, 4)
+                self.added_hashes = delta["hashes"]
+                self.deleted = delta["deleted"]
+                self.count, self.total = delta["fingerprint"].tolist()
+                self.stamp = delta["stamp"].tolist() or None
+        except (OSError, ValueError, KeyError):
+            # No delta, or not a usable one
+            return
+
+    def query(self, bbox):
+        """
+        Returns the OIDs of every feature whose box intersects bbox,
+        sorted
+
+        Parameter bbox: the box to search
+        Condition: an (xmin, ymin, xmax, ymax) tuple
+        """
+        found = self.tree.query(bbox)
+        if len(self.deleted):
+            found = found[~np.isin(found, self.deleted)]
+        if len(self.added_ids):
+            xmin, ymin, xmax, ymax = bbox
+            boxes = self.added_boxes
+            hit = ((boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin)
+                   & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin))
+            found = np.union1d(found, self.added_ids[hit])
+        return found
+
+    def _positions(self, oids):
+        """
+        Returns the leaf position of each OID in the tree, or -1
+        """
+        if self.tree.size == 0:
+            return np.full(len(oids), -1, dtype=np.int64)
+        if self._by_id is None:
+            self._by_id = np.argsort(self.tree.order, kind="stable")
+        ids = np.asarray(self.tree.order)[self._by_id]
+        at = np.minimum(np.searchsorted(ids, oids), len(ids) - 1)
+        return np.where(ids[at] == oids, self._by_id[at], -1)
+
+    def update(self, oids, boxes, hashes, deleted):
+        """
+        Records features added to and deleted from the dataset
+
+        Deleting a feature the index doesn't have (one without a shape)
+        does nothing.
+
+        Parameters oids, boxes, hashes: the features added, as from
+                                        read_rows()
+
+        Parameter deleted: the OIDs of the features deleted
+        Condition: a list of integers
+        """
+        deleted = np.unique(np.asarray(deleted, dtype=np.int64))
+        # Added since the tree was packed: out of the delta again
+        gone = np.isin(self.added_ids, deleted)
+        self._forget(self.added_hashes[gone])
+        self.added_ids = self.added_ids[~gone]
+        self.added_boxes = self.added_boxes[~gone]
+        self.added_hashes = self.added_hashes[~gone]
+
+        deleted = np.setdiff1d(deleted, self.deleted)
+        positions = self._positions(deleted)
+        packed = positions >= 0
+        self._forget(np.asarray(self.hashes)[positions[packed]])
+        self.deleted = np.union1d(self.deleted, deleted[packed])
+
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        self.added_ids = np.concatenate(
+            [self.added_ids, np.asarray(oids, dtype=np.int64)])
+        self.added_boxes = np.concatenate(
+            [self.added_boxes, np.asarray(boxes, dtype="f8").reshape(-1, 4)])
+        self.added_hashes = np.concatenate([self.added_hashes, hashes])
+        count, total = fingerprint(hashes)
+        self.count += count
+        self.total = (self.total + total) % 2 ** 64
+
+    def _forget(self, hashes):
+        count, total = fingerprint(hashes)
+        self.count -= count
+        self.total = (self.total - total) % 2 ** 64
+
+    def apply(self, added, deleted):
+        """
+        Records edits made to the dataset, reading the features added
+        from it, and saves the index
+
+        Failing to save is only a warning: the index on disk no longer
+        matches the dataset, so it is rebuilt the next time it's opened.
+        Only an index known to have matched the dataset before the edits
+        takes the workspace's new stamp.
+
+        Parameter added: the OIDs of the features added
+        Condition: a list of integers
+
+        Parameter deleted: see update()
+        """
+        oids, boxes, hashes = read_rows(self.dataset, added, shapes=True)
+        self.update(oids, boxes, hashes, deleted)
+        self.stamp = workspace_stamp(self.dataset) if self.verified else None
+        try:
+            self.save()
+        except OSError as e:
+            arcpy.AddWarning(f"Couldn't save the spatial index {self.path}: "
+                             f"{e}")
+
+    def _pack(self):
+        """
+        Packs the live features of the tree and the delta into a new tree
+        """
+        live = ~np.isin(self.tree.order, self.deleted)
+        leaves = (self.tree.levels[0] if self.tree.levels
+                  else np.empty((0, 4), dtype="f8"))
+        packed = ParcelIndex.build(
+            self.path, self.dataset,
+            np.concatenate([np.asarray(self.tree.order)[live],
+                            self.added_ids]),
+            np.concatenate([leaves[live], self.added_boxes]),
+            np.concatenate([np.asarray(self.hashes)[live],
+                            self.added_hashes]),
+            self.tree.node_size)
+        packed.stamp = self.stamp
+        packed.verified = self.verified
+        # Drops the memory map of the old file, which can't be replaced
+        # while it is open on Windows
+        self.__dict__.update(packed.__dict__)
+
+    def save(self):
+        """
+        Writes the index to its path, packing a new tree if the edits
+        recorded since the last one make up COMPACT_FRACTION of it
+        """
+        edits = len(self.added_ids) + len(self.deleted)
+        if edits > COMPACT_FRACTION * max(self.tree.size, 1):
+            self._pack()
+        if self._packed:
+            _replace(self.path, self._write_tree)
+            self._packed = False
+        if len(self.added_ids) or len(self.deleted) or self.stamp:
+            _replace(self.path + ".delta", self._write_delta)
+        elif os.path.exists(self.path + ".delta"):
+            os.remove(self.path + ".delta")
+
+    def _write_tree(self, out):
+        arrays = ([np.asarray(self.tree.order, dtype="<i8"),
+                   np.asarray(self.hashes, dtype="<u8")]
+                  + [np.asarray(level, dtype="<f8")
+                     for level in self.tree.levels])
+        header = json.dumps({
+            "dataset": self.dataset,
+            "node_size": self.tree.node_size,
+            "size": self.tree.size,
+            "levels": [len(level) for level in self.tree.levels],
+            "base": list(self.base),
+        }).encode("utf-8")
+        out.write(MAGIC)
+        out.write(struct.pack("<Q", len(header)))
+        out.write(header)
+        for array in arrays:
+            out.write(b"\0" * (_aligned(out.tell()) - out.tell()))
+            out.write(np.ascontiguousarray(array).tobytes())
+
+    def _write_delta(self, out):
+        np.savez(out,
+                 base=np.array(self.base, dtype=np.uint64),
+                 fingerprint=np.array(self.fingerprint, dtype=np.uint64),
+                 stamp=np.array(self.stamp or [], dtype=np.int64),
+                 ids=self.added_ids, boxes=self.added_boxes,
+                 hashes=self.added_hashes, deleted=self.deleted)
+
+
+def _reorder(oids, order, values):
+    """
+    Returns values, given in the order of oids, in the order of order
+    """
+    oids = np.asarray(oids, dtype=np.int64)
+    by_id = np.argsort(oids, kind="stable")
+    return values[by_id[np.searchsorted(oids[by_id], order)]]
+
+
+def index_path(layer):
+    """
+    Returns where the index of a layer's dataset is kept, or None if
+    the index is turned off or there's nowhere to keep it (e.g. for a
+    memory workspace)
+
+    Parameter layer: the layer
+    Condition: a string describing a valid layer in the ArcPy environment
+    """
+    if INDEX_DIR == "":
+        return None
+    dataset = sc.schema.path(layer)
+    if INDEX_DIR is not None:
+        digest = hashlib.sha1(dataset.encode("utf-8")).hexdigest()[:12]
+        name = os.path.basename(dataset.replace("\\", os.sep))
+        return os.path.join(INDEX_DIR, f"{name}-{digest}{EXTENSION}")
+    workspace = eb.workspace_of(dataset)
+    if not workspace or not os.path.exists(workspace):
+        return None
+    inside = os.path.relpath(dataset, workspace).replace(os.sep, ".")
+    return f"{workspace}.{inside}{EXTENSION}"
+
+
+def workspace_stamp(dataset):
+    """
+    Returns [latest modification time, total size] of the files in a
+    dataset's workspace, or None if the workspace isn't a folder (e.g.
+    an enterprise geodatabase or a memory workspace)
+
+    Lock files, which ArcGIS makes just to read a geodatabase, are left
+    out.
+
+    Parameter dataset: the catalog path of the dataset
+    """
+    workspace = eb.workspace_of(dataset)
+    if not workspace or not os.path.isdir(workspace):
+        return None
+    latest = size = 0
+    with os.scandir(workspace) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.endswith(".lock"):
+                stat = entry.stat()
+                latest = max(latest, stat.st_mtime_ns)
+                size += stat.st_size
+    return [latest, size]
+
+
+def where_clauses(dataset, oids, per_clause=eb.OIDS_PER_CLAUSE):
+    """
+    Yields where clauses selecting OIDs, per_clause at a time
+
+    Parameter dataset: the dataset or layer to build the clauses for
+    Condition: a string describing a valid dataset in the ArcPy
+               environment
+
+    Parameter oids: the OIDs to select
+    Condition: a list of integers
+
+    Parameter per_clause: the most OIDs in one clause
+    Condition: a positive integer
+    """
+    oid_field = arcpy.AddFieldDelimiters(
+        dataset, arcpy.Describe(dataset).OIDFieldName)
+    oids = [int(o) for o in oids]
+    for i in range(0, len(oids), per_clause):
+        chunk = oids[i:i + per_clause]
+        yield f"{oid_field} IN ({','.join(map(str, chunk))})"
+
+
+def read_rows(dataset, oids=None, shapes=False):
+    """
+    Returns (OIDs, bounding boxes, hashes) of the features of a dataset
+    that have a shape
+
+    Parameter dataset: the dataset, not a layer, so a selection on the
+                       layer doesn't hide features from the index
+    Condition: a catalog path
+
+    Parameter oids: the features to read
+    Condition: a list of integers, or None for all of them
+
+    Parameter shapes: whether to read the shapes for their bounding
+                      boxes, which is what makes the read slow
+    Condition: a boolean. Without shapes, the boxes are None
+    """
+    fields = HASH_FIELDS + (["SHAPE@"] if shapes else [])
+    clauses = [None] if oids is None else where_clauses(dataset, oids)
+    rows = []
+    boxes = []
+    for where in clauses:
+        with arcpy.da.SearchCursor(dataset, fields,
+                                   where_clause=where) as cursor:
+            for row in cursor:
+                oid, xy, area, length = row[:4]
+                if area is None or not xy or xy[0] is None:
+                    continue
+                rows.append((oid, xy[0], xy[1], area, length))
+                if shapes:
+                    boxes.append(si.geometry_bounds(row[4]))
+    columns = list(zip(*rows)) if rows else [[]] * 5
+    return (np.asarray(columns[0], dtype=np.int64),
+            np.asarray(boxes, dtype="f8").reshape(-1, 4) if shapes else None,
+            row_hashes(*columns))
+
+
+def load_index(layer):
+    """
+    Returns the saved index of a layer without checking it against the
+    layer, or None
+
+    Good enough to keep an index up to date through edits (an index
+    that didn't match the layer before still won't), not to query.
+
+    Parameter layer: the layer
+    Condition: a string describing a valid layer in the ArcPy environment
+    """
+    path = index_path(layer)
+    if path is None:
+        return None
+    dataset = sc.schema.path(layer)
+    index = ParcelIndex.load(path, dataset)
+    if index is not None:
+        index.verified = index.stamp is not None \
+            and index.stamp == workspace_stamp(dataset)
+    return index
+
+
+def open_index(layer, rebuild=False):
+    """
+    Returns the index of a layer, or None if the index is turned off or
+    there's nowhere to keep it
+
+    A saved index is loaded with the edits recorded since it was
+    packed, without reading the layer. It is only built when there is
+    none, or checked against the layer when asked to rebuild.
+
+    Parameter layer: the layer
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter rebuild: whether to read the whole layer and build the
+                       index again if it no longer matches, as after
+                       edits made outside these tools
+    Condition: a boolean
+    """
+    path = index_path(layer)
+    if path is None:
+        return None
+    dataset = sc.schema.path(layer)
+    with ol.log.span("spatial index"):
+        stamp = workspace_stamp(dataset)
+        index = ParcelIndex.load(path, dataset)
+        if index is not None and rebuild:
+            _, _, hashes = read_rows(dataset)
+            if index.fingerprint != fingerprint(hashes):
+                index = None
+        if index is None:
+            st.loginfo(f"Building the spatial index of {dataset}")
+            with ol.log.span("build spatial index"):
+                index = ParcelIndex.build(path, dataset,
+                                          *read_rows(dataset, shapes=True))
+        elif stamp is not None and index.stamp != stamp:
+            ol.log.info(f"{dataset}'s workspace changed since its spatial "
+                        "index was saved; if it was edited outside the "
+                        f"OUG tools, delete {path} to build it again")
+        index.verified = True
+        if index._packed or index.stamp != stamp:
+            index.stamp = stamp
+            try:
+                index.save()
+            except OSError as e:
+                arcpy.AddWarning(f"Couldn't save the spatial index {path}: "
+                                 f"{e}")
+    return index
+
+
+def candidates(index, boxes, tolerance=0.0, scan=True):
+    """
+    Returns the OIDs of the features that may be within any of a set of
+    bounding boxes, sorted, or None if they are so much of the layer
+    that reading it all is faster (see SCAN_FRACTION)
+
+    Parameter index: the index of the layer
+    Condition: a ParcelIndex
+
+    Parameter boxes: the boxes
+    Condition: a list of (xmin, ymin, xmax, ymax) tuples
+
+    Parameter tolerance: how far to grow each box
+    Condition: a non-negative distance
+
+    Parameter scan: whether to return None rather than too many OIDs
+    Condition: a boolean
+    """
+    found = [index.query((xmin - tolerance, ymin - tolerance,
+                          xmax + tolerance, ymax + tolerance))
+             for xmin, ymin, xmax, ymax in boxes]
+    found = np.unique(np.concatenate(found)) if found \
+        else np.empty(0, dtype=np.int64)
+    if scan and len(found) > SCAN_FRACTION * len(index):
+        return None
+    return found.tolist()
+
+
+def units_within(index, layer, commons, tolerance=0.0):
+    """
+    Returns the OIDs of the features of an indexed layer within any of
+    commons, like SelectLayerByLocation(WITHIN), but reading only the
+    features the index finds around them
+
+    The candidates are read through layer, so features its definition
+    query hides are left out, as SelectLayerByLocation would.
+
+    Parameter index: the index of the unit parcel layer
+    Condition: a ParcelIndex that matches the layer
+
+    Parameter layer: the unit parcel layer
+    Condition: a string describing a valid layer in the ArcPy environment
+               with no selection
+
+    Parameter commons: the common parcels, holes filled in
+    Condition: a list of arcpy geometries
+
+    Parameter tolerance: see containment.containment_join()
+    """
+    oids = candidates(index, [si.geometry_bounds(c) for c in commons],
+                      tolerance, scan=False)
+    units = []
+    for where in where_clauses(layer, oids):
+        with arcpy.da.SearchCursor(layer, ["OID@", "SHAPE@"],
+                                   where_clause=where) as cursor:
+            units.extend(row for row in cursor if row[1] is not None)
+    if not units:
+        return []
+    join = cn.containment_join(commons, [g for _, g in units],
+                               unit_ids=[o for o, _ in units],
+                               tolerance=tolerance)
+    return sorted(join.unit_ids.tolist())
@@ -0,0 +1,228 @@
+"""
+Quality checks for merged OUGs
+
+Merging can lose information without failing. A summed field is off if
+the common parcel had a value of its own, or if a sum was cast to a
+narrower type on the way back into the unit layer. Common parcel
+fields whose name or type doesn't match the unit layer are dropped
+altogether. These checks catch that without anyone having to look at
+the OUGs one by one.
+
+Conservation checks compare, for every OUG, the sum of each summed
+field over the units it replaced with the value the OUG ended up with.
+The units of all OUGs are laid end to end (the same CSR layout as
+containment.Containment), so each field is summed for every OUG in
+one numpy reduceat call.
+
+Nothing in here imports arcpy. Reading the rows is up to the caller
+(see batch_common_to_oug.py).
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import csv
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+import dissolve as dv
+
+# A sum matches if it is within ATOL + RTOL * |sum| of the OUG's value.
+# Single fields only hold about seven significant digits.
+RTOL = 1e-6
+ATOL = 1e-6
+
+# expected, actual: (OUGs, fields) float arrays, NaN for null
+# ok: (OUGs, fields) boolean array
+# missing: the number of each OUG's units that weren't in the snapshot
+Conservation = namedtuple("Conservation",
+                          ["expected", "actual", "ok", "missing"])
+
+
+def numbers(values):
+    """
+    Returns a column of values as a float array, NaN for null
+
+    Text is parsed as numbers, with anything that isn't a number
+    counted as null (see dissolve.parse_numeric()).
+
+    Parameter values: the column
+    Condition: a list of numbers or strings, possibly containing None
+    """
+    try:
+        return np.asarray(values, dtype="f8")
+    except (TypeError, ValueError):
+        column, _ = dv.parse_numeric(values)
+        return column
+
+
+def group_offsets(groups):
+    """
+    Returns the CSR offsets of a list of lists
+
+    Parameter groups: the units of each OUG
+    Condition: a list of lists
+    """
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum([len(g) for g in groups], out=offsets[1:])
+    return offsets
+
+
+def unit_sums(unit_ids, unit_values, groups):
+    """
+    Sums unit values over each group of units
+
+    Returns (sums, missing). sums is a (groups, fields) array, NaN
+    where every unit of a group is null, like SUM in a dissolve.
+    missing counts the units of each group that aren't in unit_ids.
+
+    Parameter unit_ids: the ids of the units with known values
+    Condition: a 1D integer array without duplicates
+
+    Parameter unit_values: the values of each unit
+    Condition: an (units, fields) float array, NaN for null
+
+    Parameter groups: the unit ids making up each group
+    Condition: a list of lists of integers
+    """
+    unit_ids = np.asarray(unit_ids, dtype=np.int64)
+    unit_values = np.asarray(unit_values, dtype="f8").reshape(
+        len(unit_ids), -1)
+    offsets = group_offsets(groups)
+    flat = np.fromiter(chain.from_iterable(groups), dtype=np.int64,
+                       count=offsets[-1])
+    sums = np.full((len(groups), unit_values.shape[1]), np.nan)
+    if len(flat) == 0 or len(unit_ids) == 0:
+        return sums, np.diff(offsets)
+
+    order = np.argsort(unit_ids, kind="stable")
+    pos = order[np.minimum(np.searchsorted(unit_ids, flat, sorter=order),
+                           len(unit_ids) - 1)]
+    found = unit_ids[pos] == flat
+    values = np.where(found[:, None], unit_values[pos], np.nan)
+    present = ~np.isnan(values)
+
+    # reduceat needs every group to be non-empty, so sum the non-empty
+    # ones and leave the rest NaN
+    sizes = np.diff(offsets)
+    starts = offsets[:-1][sizes > 0]
+    totals = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(present, starts, axis=0)
+    totals[counts == 0] = np.nan
+    sums[sizes > 0] = totals
+    missing = np.zeros(len(groups), dtype=np.int64)
+    missing[sizes > 0] = np.add.reduceat(~found, starts)
+    return sums, missing
+
+
+def check_conservation(unit_ids, unit_values, groups, oug_values,
+                       rtol=RTOL, atol=ATOL):
+    """
+    Checks that each OUG's summed fields equal the sums of its units
+
+    A null sum and a null OUG value match. Returns a Conservation.
+
+    Parameters unit_ids, unit_values, groups: see unit_sums()
+
+    Parameter oug_values: the OUGs' values of the same fields
+    Condition: an (OUGs, fields) float array in the order of groups,
+               NaN for null
+    """
+    expected, missing = unit_sums(unit_ids, unit_values, groups)
+    actual = np.asarray(oug_values, dtype="f8").reshape(expected.shape)
+    both_null = np.isnan(expected) & np.isnan(actual)
+    close = np.abs(actual - expected) <= atol + rtol * np.abs(expected)
+    return Conservation(expected, actual, both_null | close, missing)
+
+
+def type_changes(before, after):
+    """
+    Returns (field, type before, type after) for every field whose type
+    changed
+
+    Parameters before, after: the fields of the two layers
+    Condition: dictionaries of {field name: Field.type}
+    """
+    return [(fld, before[fld], after[fld]) for fld in before
+            if fld in after and before[fld] != after[fld]]
+
+
+def dropped_fields(common_fields, unit_fields, ignore=()):
+    """
+    Returns (field, reason) for every common parcel field that won't
+    make it into an OUG
+
+    A common parcel field only carries over if the unit layer has a
+    field with exactly the same name and type.
+
+    Parameter common_fields: the common parcel layer's fields
+    Condition: a dictionary of {field name: Field.type}
+
+    Parameter unit_fields: the unit parcel layer's fields
+    Condition: a dictionary of {field name: Field.type}
+
+    Parameter ignore: fields not to report, e.g. system fields
+    Condition: a collection of field names
+    """
+    dropped = []
+    for fld, field_type in common_fields.items():
+        if fld in ignore:
+            continue
+        if fld not in unit_fields:
+            dropped.append((fld, "not in the unit parcel layer"))
+        elif unit_fields[fld] != field_type:
+            dropped.append((fld, f"{field_type} in the common parcel "
+                                 f"layer but {unit_fields[fld]} in the "
+                                 "unit parcel layer"))
+    return dropped
+
+
+def _cell(value):
+    return "" if np.isnan(value) else f"{value:.15g}"
+
+
+def write_report(path, oug_ids, groups, fields, result):
+    """
+    Writes one CSV row per OUG with its unit sums and values
+
+    Each row has the OUG's id, its number of units, a STATUS of OK or
+    CHECK followed by the fields that don't add up, and for every
+    field the unit sum and the OUG's value side by side.
+
+    Returns the number of OUGs that need checking
+
+    Parameter path: where to write the report
+    Condition: a path to a CSV file, which is overwritten
+
+    Parameter oug_ids: the id of each OUG
+    Condition: a list in the order of groups
+
+    Parameter groups: see unit_sums()
+
+    Parameter fields: the names of the checked fields
+    Condition: a list in the order of result's columns
+
+    Parameter result: the checks to report
+    Condition: a Conservation from check_conservation()
+    """
+    flagged = 0
+    with open(path, "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(["OUG_OID", "UNITS", "MISSING_UNITS", "STATUS"]
+                        + [f"{fld}_{side}" for fld in fields
+                           for side in ("UNITS", "OUG")])
+        for i, oug_id in enumerate(oug_ids):
+            bad = [fields[j] for j in np.flatnonzero(~result.ok[i])]
+            if bad or result.missing[i]:
+                flagged += 1
+                status = "CHECK " + ";".join(bad) if bad else "CHECK"
+            else:
+                status = "OK"
+            writer.writerow(
+                [oug_id, len(groups[i]), int(result.missing[i]), status]
+                + [_cell(v) for pair in zip(result.expected[i],
+                                            result.actual[i])
+                   for v in pair])
+    return flagged
@@ -0,0 +1,153 @@
+"""
+Cache of field metadata for the layers the OUG tools work on
+
+Every ListFields call is a round trip to the underlying workspace,
+which for file geodatabases is slow enough to dominate the time spent
+on each OUG. This module reads each dataset's fields once and keeps
+them until our own code changes that dataset's schema.
+
+Schema changes made through the add_field, delete_field and
+calculate_field methods invalidate the cache automatically. Anything
+else that (re)creates a dataset in place, like CopyFeatures onto an
+existing memory dataset, needs an explicit call to invalidate().
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+from arcbackend import arcpy, arcmg
+from collections import namedtuple
+
+FieldInfo = namedtuple("FieldInfo", ["name", "type", "length", "nullable",
+                                     "alias"])
+
+
+class SchemaCache:
+    """
+    Field metadata for datasets, keyed by dataset (catalog) path
+
+    Layers are resolved to the dataset they point at, so a layer and
+    the feature class behind it share one cache entry.
+    """
+
+    def __init__(self):
+        self._fields = {}
+        self._paths = {}
+
+    def path(self, layer):
+        """
+        Returns the catalog path of the dataset behind layer
+
+        Parameter layer: the layer or dataset to resolve
+        Condition: a string describing a valid layer in the ArcPy environment
+        """
+        key = str(layer)
+        if key not in self._paths:
+            try:
+                self._paths[key] = arcpy.Describe(key).catalogPath
+            except (OSError, AttributeError):
+                # Datasets without a catalog path are their own key
+                self._paths[key] = key
+        return self._paths[key]
+
+    def fields(self, layer):
+        """
+        Returns a list of FieldInfo tuples for every field in layer
+
+        Parameter layer: the layer or dataset to read
+        Condition: a string describing a valid layer in the ArcPy environment
+        """
+        path = self.path(layer)
+        if path not in self._fields:
+            self._fields[path] = [
+                FieldInfo(f.name, f.type, f.length, f.isNullable,
+                          f.aliasName)
+                for f in arcpy.ListFields(str(layer))
+            ]
+        return self._fields[path]
+
+    def field(self, layer, name):
+        """
+        Returns the FieldInfo for the field called name, or None
+
+        Field names are matched case-insensitively, as ArcGIS does
+        """
+        for info in self.fields(layer):
+            if info.name.lower() == name.lower():
+                return info
+        return None
+
+    def names(self, layer):
+        """
+        Returns a list of all field names in layer
+        """
+        return [info.name for info in self.fields(layer)]
+
+    def types(self, layer):
+        """
+        Returns a list of all field types in layer
+        """
+        return [info.type for info in self.fields(layer)]
+
+    def invalidate(self, layer=None):
+        """
+        Drops the cached schema for layer, or for everything if layer is None
+
+        Parameter layer: the layer or dataset whose schema changed
+        Condition: a string describing a valid layer in the ArcPy environment
+                   or None
+        """
+        if layer is None:
+            self._fields.clear()
+            self._paths.clear()
+            return
+        self._fields.pop(self.path(layer), None)
+
+    def add_field(self, layer, field_name, field_type, **kwargs):
+        """
+        Wrapper for arcpy.management.AddField that invalidates layer
+
+        Keyword arguments are passed through to AddField
+        """
+        arcmg.AddField(layer, field_name, field_type, **kwargs)
+        self.invalidate(layer)
+
+    def add_fields(self, layer, field_description, **kwargs):
+        """
+        Wrapper for arcpy.management.AddFields that invalidates layer
+
+        Keyword arguments are passed through to AddFields
+        """
+        arcmg.AddFields(layer, field_description, **kwargs)
+        self.invalidate(layer)
+
+    def delete_field(self, layer, drop_field, **kwargs):
+        """
+        Wrapper for arcpy.management.DeleteField that invalidates layer
+
+        Keyword arguments are passed through to DeleteField
+        """
+        arcmg.DeleteField(layer, drop_field, **kwargs)
+        self.invalidate(layer)
+
+    def calculate_field(self, layer, field, expression,
+                        expression_type="PYTHON3", **kwargs):
+        """
+        Wrapper for arcpy.management.CalculateField that invalidates layer
+
+        CalculateField creates field if it doesn't exist yet,
+        so it counts as a schema change.
+        Keyword arguments are passed through to CalculateField
+        """
+        arcmg.CalculateField(
+            in_table=layer,
+            field=field,
+            expression=expression,
+            expression_type=expression_type,
+            **kwargs
+        )
+        self.invalidate(layer)
+
+
+# Shared by every module in the toolbox
+schema = SchemaCache()
@@ -0,0 +1,220 @@
+"""
+Schema plans for conforming many layers to one template
+
+Conform Attribute Table used to work out the field differences between
+two layers and then add the missing fields one AddField call at a
+time. A SchemaPlan reads the template's fields once, can be saved to
+and loaded from JSON, and is applied to each target with at most one
+DeleteField and one AddFields call. Many targets can be conformed at
+once in separate processes.
+
+Each target is compared to the plan on its own, so targets that
+started out with different schemas all end up with the template's.
+Fields whose type differs from the template are reported, and only
+replaced (which empties them) if asked to.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import json
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import parallel as pl
+import schemacache as sc
+
+# Geometry fields the geodatabase maintains itself (matched lowercase)
+UNMODIFIED_FIELDS = {"shape_length", "shape_area", "shape"}
+# Field types that can't be added or dropped
+SYSTEM_TYPES = ["OID", "Geometry", "GlobalID"]
+# AddFields wants keywords rather than the types ListFields reports
+FIELD_KEYWORDS = {
+    "String": "TEXT",
+    "SmallInteger": "SHORT",
+    "Integer": "LONG",
+    "BigInteger": "BIGINTEGER",
+    "Single": "FLOAT",
+    "Double": "DOUBLE",
+    "Date": "DATE",
+    "DateOnly": "DATEONLY",
+    "TimeOnly": "TIMEONLY",
+    "TimestampOffset": "TIMESTAMPOFFSET",
+    "Blob": "BLOB",
+    "Guid": "GUID",
+    "Raster": "RASTER",
+}
+
+# add: field specs to add, drop: names to drop,
+# retype: (name, target type, template type) for mismatched fields
+LayerDiff = namedtuple("LayerDiff", ["add", "drop", "retype", "kept"])
+
+
+def _managed(name, field_type):
+    """
+    Returns True for fields a plan never adds or drops
+    """
+    return name.lower() in UNMODIFIED_FIELDS or field_type in SYSTEM_TYPES
+
+
+def field_description(spec):
+    """
+    Returns the AddFields row for a field spec
+
+    Parameter spec: the field to describe
+    Condition: a dictionary with name, type, length and alias keys
+    """
+    length = spec["length"] if spec["type"] == "String" else None
+    return [spec["name"], FIELD_KEYWORDS.get(spec["type"], spec["type"]),
+            spec["alias"], length]
+
+
+class SchemaPlan:
+    """
+    The fields a set of layers should have, taken from a template
+
+    Parameter fields: the template's fields
+    Condition: a list of dictionaries with name, type, length and alias
+               keys, leaving out fields the geodatabase manages
+
+    Parameter template: where the fields came from, for the record
+    Condition: a string or None
+    """
+
+    def __init__(self, fields, template=None):
+        self.fields = fields
+        self.template = template
+
+    @classmethod
+    def from_template(cls, template):
+        """
+        Returns the plan for conforming layers to template
+
+        Parameter template: the layer with the desired attribute table
+        Condition: a string describing a valid layer in the ArcPy environment
+        """
+        fields = [{"name": f.name, "type": f.type, "length": f.length,
+                   "alias": f.alias}
+                  for f in sc.schema.fields(template)
+                  if not _managed(f.name, f.type)]
+        return cls(fields, sc.schema.path(template))
+
+    def to_dict(self):
+        return {"template": self.template, "fields": self.fields}
+
+    @classmethod
+    def from_dict(cls, plan):
+        return cls(plan["fields"], plan.get("template"))
+
+    def save(self, path):
+        """
+        Writes the plan to a JSON file
+        """
+        with open(path, "w") as out:
+            json.dump(self.to_dict(), out, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a plan written by save()
+        """
+        with open(path) as plan:
+            return cls.from_dict(json.load(plan))
+
+    def diff(self, target_fields):
+        """
+        Returns the LayerDiff turning target_fields into the plan's fields
+
+        Field names are matched case-insensitively, as ArcGIS does
+
+        Parameter target_fields: the target's current fields
+        Condition: a list of schemacache.FieldInfo (or arcpy Field-like)
+        """
+        current = {f.name.lower(): f for f in target_fields}
+        wanted = {spec["name"].lower() for spec in self.fields}
+
+        add = []
+        retype = []
+        kept = []
+        for spec in self.fields:
+            field = current.get(spec["name"].lower())
+            if field is None:
+                add.append(spec)
+            elif field.type != spec["type"]:
+                retype.append((field.name, field.type, spec["type"]))
+            else:
+                kept.append(field.name)
+        drop = [f.name for f in target_fields
+                if f.name.lower() not in wanted
+                and not _managed(f.name, f.type)]
+        return LayerDiff(add, drop, retype, kept)
+
+    def apply(self, target, retype=False):
+        """
+        Conforms target to the plan. Returns the LayerDiff applied.
+
+        Fields not in the plan are dropped in one DeleteField call and
+        missing fields added in one AddFields call. With retype, fields
+        of the wrong type are dropped and added again with the plan's
+        type, losing their values. Without it they are left alone.
+
+        Parameter target: the layer to modify
+        Condition: a string describing a valid layer in the ArcPy environment
+
+        Parameter retype: whether to replace fields of the wrong type
+        Condition: a boolean
+        """
+        diff = self.diff(sc.schema.fields(target))
+        drop = list(diff.drop)
+        add = list(diff.add)
+        if retype and diff.retype:
+            by_name = {spec["name"].lower(): spec for spec in self.fields}
+            drop += [name for name, _, _ in diff.retype]
+            add += [by_name[name.lower()] for name, _, _ in diff.retype]
+
+        if drop:
+            sc.schema.delete_field(target, drop)
+        if add:
+            sc.schema.add_fields(target, [field_description(spec)
+                                          for spec in add])
+        return diff
+
+
+def _apply_worker(job):
+    """
+    Applies a plan in a worker process. Returns the LayerDiff as a tuple.
+    """
+    plan, target, retype = job
+    return tuple(SchemaPlan.from_dict(plan).apply(target, retype))
+
+
+def apply_many(plan, targets, retype=False, workers=1):
+    """
+    Conforms every target to plan
+
+    Returns a dictionary of {target: LayerDiff}
+
+    Parameter plan: the plan to apply
+    Condition: a SchemaPlan
+
+    Parameter targets: the layers to modify
+    Condition: a list of strings describing valid layers or datasets.
+               With more than one worker, layers are resolved to their
+               datasets, which must not be in the memory workspace
+
+    Parameter retype: see SchemaPlan.apply()
+
+    Parameter workers: the number of targets to conform at once
+    Condition: a positive integer
+    """
+    if workers <= 1 or len(targets) <= 1:
+        return {target: plan.apply(target, retype) for target in targets}
+
+    paths = [sc.schema.path(target) for target in targets]
+    jobs = [(plan.to_dict(), path, retype) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                             mp_context=pl.process_context()) as pool:
+        diffs = list(pool.map(_apply_worker, jobs))
+    for target in targets:
+        sc.schema.invalidate(target)
+    return {target: LayerDiff(*diff) for target, diff in zip(targets, diffs)}
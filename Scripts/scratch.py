@@ -0,0 +1,188 @@
+"""
+Pool of scratch datasets for the OUG tools
+
+The tools used to copy their intermediate data to fixed names in the
+memory workspace (memory\\interior_units_mem and so on). Every OUG
+dropped and recreated those datasets, and nothing ever deleted them,
+so a long session held on to all of them.
+
+The pool hands out scratch datasets by name instead. Filling a
+dataset that already has the right fields truncates and appends to it
+rather than recreating it, and release_all() deletes everything the
+pool made, which every tool does when it finishes. Datasets go in the
+memory workspace until the pool holds more than ceiling features
+there, after which new ones spill to the scratch file geodatabase.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import os
+from arcbackend import arcpy, arcmg
+import schemacache as sc
+
+MEMORY = "memory"
+# The most features the pool keeps in the memory workspace
+MEMORY_CEILING = 500000
+# Fields that don't need to match for a dataset to be reused
+IGNORED_TYPES = ["OID", "Geometry", "GlobalID"]
+
+
+def _layout(layer):
+    """
+    Returns the (name, type, length) of the fields a copy of layer has
+    """
+    return [(f.name.lower(), f.type, f.length) for f in sc.schema.fields(layer)
+            if f.type not in IGNORED_TYPES
+            and f.name.lower() not in ("shape_length", "shape_area")]
+
+
+class ScratchPool:
+    """
+    Scratch datasets, reused while their schema fits and deleted together
+
+    Parameter ceiling: the most features to hold in the memory workspace
+    Condition: a non-negative integer
+    """
+
+    def __init__(self, ceiling=MEMORY_CEILING):
+        self.ceiling = ceiling
+        self._paths = {}
+        self._rows = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release_all()
+        return False
+
+    @property
+    def memory_rows(self):
+        """
+        The number of features the pool holds in the memory workspace
+        """
+        return sum(rows for path, rows in self._rows.items()
+                   if path.startswith(MEMORY + "\\"))
+
+    def managed(self, path):
+        return path in self._rows
+
+    def path(self, name, rows=0):
+        """
+        Returns the path of the scratch dataset called name
+
+        The dataset goes in the memory workspace unless adding rows
+        features would take the pool over its ceiling, in which case it
+        goes in the scratch file geodatabase. If that moves a dataset
+        that already exists, the old one is deleted.
+
+        Parameter name: the dataset's name
+        Condition: a valid feature class name
+
+        Parameter rows: the number of features about to be written
+        Condition: a non-negative integer
+        """
+        old = self._paths.get(name)
+        held = self.memory_rows - self._rows.get(old, 0)
+        if held + rows <= self.ceiling:
+            path = f"{MEMORY}\\{name}"
+        else:
+            path = os.path.join(arcpy.env.scratchGDB, name)
+        if old is not None and old != path:
+            self._delete(old)
+        self._paths[name] = path
+        self._rows.setdefault(path, 0)
+        return path
+
+    def fill(self, out_path, in_features, rows=None):
+        """
+        Copies in_features to out_path. Returns out_path.
+
+        If out_path is a pool dataset that already exists with the same
+        fields as in_features, it is truncated and appended to instead
+        of being deleted and created again. Anything else is a plain
+        CopyFeatures.
+
+        Parameter out_path: where to copy to
+        Condition: a path returned by path(), or any new dataset path
+
+        Parameter in_features: the features to copy
+        Condition: a string describing a valid layer in the ArcPy
+                   environment. If it has a selection, only selected
+                   features are copied
+
+        Parameter rows: the number of features being copied
+        Condition: a non-negative integer, or None to count them
+        """
+        if self.managed(out_path) and arcpy.Exists(out_path) \
+                and _layout(out_path) == _layout(in_features):
+            arcmg.TruncateTable(out_path)
+            arcmg.Append(inputs=in_features, target=out_path,
+                         schema_type="NO_TEST")
+        else:
+            arcmg.CopyFeatures(in_features, out_path)
+            sc.schema.invalidate(out_path)
+        if self.managed(out_path):
+            if rows is None:
+                rows = int(arcmg.GetCount(out_path)[0])
+            self._rows[out_path] = rows
+        return out_path
+
+    def copy(self, name, in_features, rows=None):
+        """
+        Copies in_features to the scratch dataset called name
+
+        Returns the dataset's path. See fill() for the parameters.
+        """
+        return self.fill(self.path(name, rows or 0), in_features, rows)
+
+    def empty_like(self, out_path, template):
+        """
+        Makes out_path an empty polygon feature class shaped like template
+
+        Returns out_path. A pool dataset that already has template's
+        fields is truncated rather than recreated.
+
+        Parameter out_path: the feature class to (re)create
+        Condition: a path returned by path(), or any dataset path
+
+        Parameter template: the dataset whose fields to copy
+        Condition: a string describing a valid dataset in the ArcPy
+                   environment
+        """
+        if self.managed(out_path) and arcpy.Exists(out_path) \
+                and _layout(out_path) == _layout(template):
+            arcmg.TruncateTable(out_path)
+        else:
+            if arcpy.Exists(out_path):
+                arcmg.Delete(out_path)
+            out_dir, out_name = os.path.split(out_path)
+            arcmg.CreateFeatureclass(
+                out_dir,
+                out_name,
+                "POLYGON",
+                template=template,
+                spatial_reference=arcpy.Describe(template).spatialReference
+            )
+            sc.schema.invalidate(out_path)
+        if self.managed(out_path):
+            self._rows[out_path] = 0
+        return out_path
+
+    def _delete(self, path):
+        if arcpy.Exists(path):
+            arcmg.Delete(path)
+        sc.schema.invalidate(path)
+        self._rows.pop(path, None)
+
+    def release_all(self):
+        """
+        Deletes every dataset the pool has handed out
+        """
+        for path in list(self._rows):
+            self._delete(path)
+        self._paths.clear()
+
+
+pool = ScratchPool()
@@ -7,63 +7,218 @@ Organization: Wasatch Front Regional Council
 Version: August 23, 2023
 """
 
-import arcpy
-import arcpy.management as arcmg
+import arcbackend as ab
+from arcbackend import arcpy, arcmg
 from pprint import pformat as pf
 import arcscripttools as st
+import cluster as cl
+import dissolve as dv
+import editbatch as eb
+import geomcache as gm
+import ouglog as ol
+import parcelindex as pi
+import schemacache as sc
+import scratch as sw
 import unionmerge as um
 
 
-def script_tool(parcel_layer, modified_fields, prop_type):
-    """
-    Script code goes below
-    """
-    units = r"memory\interior_units_mem"
-    remapped = r"memory\rmp_mem"
+SUBPROCESSOR = "Selected Parcel Merge"
 
-    st.validate_selection(parcel_layer, 50)
 
-    st.loginfo(f"Running Selection to OUG with {um.PROCESSOR_VERSION}")
+def merge_groups(parcel_layer, modified_fields, prop_type, group_fields,
+                 edits):
+    """
+    Merges the selected parcels into one OUG per group
 
-    un_c = arcmg.GetCount(parcel_layer)
-    st.loginfo(f'Layers by location has {un_c} units')
+    The selection is read with a single cursor and grouped by
+    cluster.group_key(), so text is grouped ignoring case and extra
+    spaces. Each group is checked against the field map (see
+    dissolve.plan_features()), and groups with the same statistics are
+    dissolved together in this process (see dissolve.dissolve_groups()),
+    then queued on edits. Groups of one parcel are left alone, and
+    groups that can't be dissolved with the field map are skipped with
+    a warning.
+
+    Returns the number of OUGs made and the number of parcels merged
 
-    arcmg.CopyFeatures(parcel_layer, units)
+    Parameters: see script_tool(). edits is the EditBatch to write to.
+    """
+    field_info = {f.name: f for f in sc.schema.fields(parcel_layer)}
+    for fld in group_fields:
+        if fld not in field_info or fld in st.INSOLUBLES:
+            arcpy.AddError(f"Can't group by {fld}: not a field of "
+                           f"{parcel_layer} that can be grouped on")
+            raise arcpy.ExecuteError()
+    fields = [f.name for f in field_info.values()
+              if f.type not in eb.READ_ONLY_TYPES
+              and f.name not in st.INSOLUBLES]
+    field_types = um.dict_of_fields(parcel_layer)
+    # Spellings of a group's key may differ, so they take the first
+    # one unless the field map says otherwise
+    user_ops = {fld: "FIRST" for fld in group_fields}
+    user_ops.update(um.vt_to_dict(modified_fields))
+    stack_field = dv.STACK_FIELD if dv.STACK_FIELD in field_info else None
+
+    groups = {}
+    ungrouped = 0
+    with ol.log.span("read"):
+        with arcpy.da.SearchCursor(parcel_layer,
+                                   ["OID@", "SHAPE@"] + fields) as cursor:
+            for row in cursor:
+                attrs = dict(zip(fields, row[2:]))
+                key = cl.group_key([attrs[fld] for fld in group_fields])
+                if key is None:
+                    ungrouped += 1
+                    continue
+                groups.setdefault(key, []).append((row[0], row[1], attrs))
+    st.loginfo(f"Found {len(groups)} groups by {', '.join(group_fields)}")
+    if ungrouped:
+        arcpy.AddWarning(f"{ungrouped} parcels have no value for "
+                         f"{', '.join(group_fields)} and were left alone")
+
+    # Groups planned the same way are dissolved together, so each field
+    # is aggregated once for all of them
+    plans = {}
+    with ol.log.span("plan"):
+        for key, units in groups.items():
+            if len(units) < 2:
+                continue
+            label = ", ".join(str(v) for v in key)
+            try:
+                stats, numeric = dv.plan_features(units, user_ops,
+                                                  field_types, st.INSOLUBLES)
+            except dv.StatisticsError as err:
+                arcpy.AddWarning(f"Group {label} skipped: {err}")
+                continue
+            plan = plans.setdefault((tuple(stats.items()), frozenset(numeric)),
+                                    (stats, numeric, []))
+            plan[2].append(units)
+
+    oug_count = 0
+    unit_count = 0
+    for stats, numeric, bucket in plans.values():
+        with ol.log.span("dissolve", groups=len(bucket)):
+            ougs = dv.dissolve_groups(
+                [[(g, {f: a.get(f) for f in stats}) for _, g, a in units]
+                 for units in bucket],
+                stats, field_types, parse=numeric, stack_field=stack_field,
+                cleanup=um.CLEANUP
+            )
+        for units, (geom, attrs) in zip(bucket, ougs):
+            attrs = um.fit_to_fields(attrs, field_info)
+            attrs.update({"IS_OUG": 1,
+                          "PROCESSOR": um.PROCESSOR_VERSION,
+                          "SUBPROCESSOR": SUBPROCESSOR,
+                          "SUBTYPE": prop_type})
+            edits.add(geom, attrs, [oid for oid, _, _ in units])
+            oug_count += 1
+            unit_count += len(units)
+    return oug_count, unit_count
+
+
+def script_tool(parcel_layer, modified_fields, prop_type, group_fields=None,
+                batch_size=eb.BATCH_SIZE):
+    """
+    Merges the selected parcels into an OUG, or one OUG per group
 
-    solvent = um.create_dissolve_stats(units, modified_fields)
+    Parameter parcel_layer: the parcels to merge
+    Condition: a string describing a valid layer in the ArcPy environment
+               with a selection. Without group_fields, fewer than 50
+               parcels may be selected
 
-    um.dissolve_and_rectify(units, solvent, remapped)
+    Parameter modified_fields: the field map
+    Condition: see unionmerge.create_dissolve_stats()
 
-    arcmg.CalculateField(
-        in_table=remapped,
-        field="SUBPROCESSOR",
-        expression="'" + "Selected Parcel Merge" + "'",
-        expression_type="PYTHON3",
-    )
+    Parameter prop_type: the SUBTYPE to give the OUGs
+    Condition: a string
 
-    arcmg.CalculateField(
-        in_table=remapped,
-        field="SUBTYPE",
-        expression="'" + prop_type + "'",
-        expression_type="PYTHON3",
-    )
+    Parameter group_fields: the fields to group the selection by
+    Condition: a list of field names, or None to merge the whole
+               selection into one OUG
 
-    arcmg.Append(
-        inputs = remapped,
-        target = parcel_layer,
-        schema_type = "TEST"
-    )
+    Parameter batch_size: the number of OUGs per edit session when
+                          grouping
+    Condition: a positive integer
+    """
+    if group_fields:
+        st.require_selection(parcel_layer)
+    else:
+        st.validate_selection(parcel_layer, 50)
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
 
-    arcmg.DeleteRows(parcel_layer)
+    st.loginfo(f"Running Selection to OUG with {um.PROCESSOR_VERSION}")
+    ol.log.reset_timings()
+    gm.cache.open(gm.CACHE, um.PROCESSOR_VERSION)
 
+    un_c = arcmg.GetCount(parcel_layer)
+    st.loginfo(f'Layers by location has {un_c} units')
+    # Keeps a saved spatial index of the layer in step with the edits,
+    # without checking it first (see parcelindex.load_index())
+    index = pi.load_index(parcel_layer)
+
+    if group_fields:
+        edits = eb.EditBatch(parcel_layer, batch_size, index=index)
+        oug_count, unit_count = merge_groups(parcel_layer, modified_fields,
+                                             prop_type, group_fields, edits)
+        edits.flush()
+        st.clear_selection(parcel_layer)
+        st.loginfo(f"Created {oug_count} OUGs from {unit_count} parcels")
+        st.loginfo(gm.cache.summary())
+        st.loginfo(ol.log.log_summary(), 0)
+        return
+
+    # Scratch datasets are deleted when the run ends, even if it fails
+    with sw.pool:
+        with ol.log.span("copy"):
+            unit_oids = [row[0] for row in
+                         arcpy.da.SearchCursor(parcel_layer, ["OID@"])]
+            units = sw.pool.copy("interior_units", parcel_layer,
+                                 len(unit_oids))
+        remapped = sw.pool.path("oug", 1)
+
+        with ol.log.span("dissolve stats"):
+            solvent = um.create_dissolve_stats(units, modified_fields,
+                                               sorted(unit_oids))
+
+        with ol.log.span("dissolve"):
+            um.dissolve_and_rectify(units, solvent, remapped)
+
+            sc.schema.calculate_field(
+                layer=remapped,
+                field="SUBPROCESSOR",
+                expression="'" + SUBPROCESSOR + "'",
+                expression_type="PYTHON3",
+            )
+
+            sc.schema.calculate_field(
+                layer=remapped,
+                field="SUBTYPE",
+                expression="'" + prop_type + "'",
+                expression_type="PYTHON3",
+            )
+
+        # One edit session instead of an Append and a DeleteRows
+        edits = eb.EditBatch(parcel_layer, index=index)
+        edits.add_from(remapped, unit_oids)
+        edits.flush()
+        st.clear_selection(parcel_layer)
+
+    st.loginfo(gm.cache.summary())
+    st.loginfo(ol.log.log_summary(), 0)
     return
 
 
 if __name__ == "__main__":
-
+    # Only with OUG_DEV_RELOAD set, for working on the scripts
+    ab.dev_reload(st, um)
     param0 = arcpy.GetParameterAsText(0)
     param1 = arcpy.GetParameter(1)
     param2 = arcpy.GetParameterAsText(2)
+    # Optional
+    param3 = arcpy.GetParameterAsText(3)
+    param3 = param3.split(";") if param3 else None
+    param4 = arcpy.GetParameter(4) or eb.BATCH_SIZE
 
-    script_tool(param0, param1, param2)
+    script_tool(param0, param1, param2, param3, param4)
     #arcpy.SetParameterAsText(2, "Result")
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Packed R-tree spatial index over feature bounding boxes
+
+Lets the batch tools find every unit parcel contained by every common
+parcel in one pass, instead of asking ArcGIS to run SelectLayerByLocation
+against the whole unit parcel layer once per common parcel.
+
+The tree is built once with Sort-Tile-Recursive packing and is static
+after that: there is no insert or delete (parcelindex.py saves one to
+disk and keeps track of edits on top of it). Queries only filter on
+bounding boxes, so callers still need to refine the candidates with a
+real geometry test (e.g. Geometry.within()).
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import math
+import numpy as np
+
+NODE_SIZE = 16
+
+
+def geometry_bounds(geom):
+    """
+    Returns the bounding box of a geometry as (xmin, ymin, xmax, ymax)
+
+    Works for both arcpy geometries (which expose an extent) and
+    shapely geometries (which expose bounds)
+
+    Parameter geom: the geometry to measure
+    Condition: an arcpy Geometry or a shapely geometry
+    """
+    if hasattr(geom, "extent"):
+        ext = geom.extent
+        return (ext.XMin, ext.YMin, ext.XMax, ext.YMax)
+    return tuple(geom.bounds)
+
+
+def _str_order(boxes, node_size):
+    """
+    Returns the Sort-Tile-Recursive ordering of a set of boxes
+
+    Boxes are sorted into vertical slices by x center, then by y center
+    within each slice, so each run of node_size boxes is a compact tile.
+    """
+    count = len(boxes)
+    leaf_count = math.ceil(count / node_size)
+    slice_count = math.ceil(math.sqrt(leaf_count))
+    slice_size = slice_count * node_size
+
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    x_rank = np.empty(count, dtype=np.int64)
+    x_rank[np.argsort(cx, kind="stable")] = np.arange(count)
+    slice_id = x_rank // slice_size
+    return np.lexsort((cy, slice_id))
+
+
+def _pack(boxes, node_size):
+    """
+    Returns the parent level for a level of boxes
+
+    Every run of node_size consecutive boxes becomes one parent
+    whose box is the union of its children.
+    """
+    starts = np.arange(0, len(boxes), node_size)
+    return np.column_stack([
+        np.minimum.reduceat(boxes[:, 0], starts),
+        np.minimum.reduceat(boxes[:, 1], starts),
+        np.maximum.reduceat(boxes[:, 2], starts),
+        np.maximum.reduceat(boxes[:, 3], starts),
+    ])
+
+
+class PackedRTree:
+    """
+    Static, packed R-tree over a set of bounding boxes
+
+    Items are identified by their position in the sequence of bounds
+    the tree was built from, so keep that sequence (or a parallel list
+    of OIDs / geometries) around to make sense of query results.
+
+    Parameter bounds: the boxes to index
+    Condition: a sequence of (xmin, ymin, xmax, ymax) tuples
+               or an (n, 4) array
+
+    Parameter node_size: the number of children per node
+    Condition: an integer greater than 1
+    """
+
+    def __init__(self, bounds, node_size=NODE_SIZE):
+        boxes = np.asarray(bounds, dtype="f8").reshape(-1, 4)
+        self.node_size = node_size
+        self.size = len(boxes)
+        if self.size == 0:
+            self.order = np.empty(0, dtype=np.int64)
+            self.levels = []
+            return
+
+        self.order = _str_order(boxes, node_size)
+        # levels[0] holds the leaf entries, levels[-1] the root
+        self.levels = [boxes[self.order]]
+        while len(self.levels[-1]) > 1:
+            self.levels.append(_pack(self.levels[-1], node_size))
+
+    @classmethod
+    def from_levels(cls, levels, order, node_size=NODE_SIZE):
+        """
+        Returns a tree over levels packed by an earlier tree
+
+        Nothing is copied, so the levels may be memory-mapped.
+
+        Parameter levels: the earlier tree's levels
+        Condition: a list of (n, 4) arrays, leaves first
+
+        Parameter order: what query() returns for each leaf entry
+        Condition: an array as long as levels[0], e.g. the earlier
+                   tree's order or the OIDs of its items
+        """
+        tree = cls.__new__(cls)
+        tree.node_size = node_size
+        tree.size = len(order)
+        tree.order = order
+        tree.levels = list(levels)
+        return tree
+
+    def __len__(self):
+        return self.size
+
+    def query(self, bbox):
+        """
+        Returns the indices of all items whose box intersects bbox
+
+        Indices are sorted ascending and refer to the position of each
+        item in the bounds the tree was built from.
+
+        Parameter bbox: the box to search
+        Condition: an (xmin, ymin, xmax, ymax) tuple
+        """
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        xmin, ymin, xmax, ymax = bbox
+        children = np.arange(self.node_size)
+        candidates = np.arange(len(self.levels[-1]))
+
+        for depth in range(len(self.levels) - 1, -1, -1):
+            boxes = self.levels[depth][candidates]
+            hit = ((boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin)
+                   & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin))
+            candidates = candidates[hit]
+            if depth == 0 or len(candidates) == 0:
+                break
+            # Descend: node i at this level owns a contiguous run
+            # of node_size entries on the level below
+            below = (candidates[:, None] * self.node_size + children).ravel()
+            candidates = below[below < len(self.levels[depth - 1])]
+
+        return np.sort(self.order[candidates])
@@ -10,29 +10,47 @@ Organization: Wasatch Front Regional Council
 Version: August 23, 2023
 """
 
-import arcpy
-import arcpy.management as arcmg
-from pprint import pformat as pf
+from arcbackend import arcpy
+import aggregation as ag
 import arcscripttools as st
-import importlib as imp
-
-solution = r"memory\dissolved"
-PROCESSOR_VERSION = "OUG Merge Processor v1.1"
+import cleanup as cu
+import dissolve as dv
+import qa
+import schemacache as sc
+import scratch as sw
+
+PROCESSOR_VERSION = dv.PROCESSOR_VERSION
+# Default engine for dissolve_and_rectify(), "in_process" or "pairwise"
+ENGINE = "in_process"
+# Default geometry cleanup for dissolve_and_rectify(), a cleanup.Cleanup
+# or None for none
+CLEANUP = None
 #solu_remap = r"memory\srmp"
 
-def handle_bad_str_op(lyr, fld, op):
+def handle_bad_str_op(lyr, fld, op, bad_rows=None):
     """
-    Eventually should be able to remap a text field containing just integers
-    into an integer field so dissolve actually works.
+    Reports an operation that can't be performed on a text field,
+    then throws an error.
+
+    Text fields containing just numbers are parsed and combined as
+    numbers (see create_dissolve_stats()), so this only happens for
+    operations that need numbers on text that isn't all numbers, or
+    for operations that make no sense on text at all.
 
-    For now, just throws an error.
+    Parameter bad_rows: the values that stopped the field being parsed
+    Condition: a list of (OID, value) pairs, or None
     """
     arcpy.AddError(f"Cannot perform operation {op} " \
                    f"on field {fld} with type Text")
-    arcpy.AddWarning(f"If {fld} is a text field but contains "\
-                     "only numerical values, you can use the field " \
-                     "calculator to re-cast all values to integers " \
-                     "in a new field.")
+    if bad_rows:
+        arcpy.AddError(dv.bad_value_report(fld, [r[0] for r in bad_rows],
+                                           [r[1] for r in bad_rows]))
+        arcpy.AddWarning(f"Fix or clear the values listed above and {fld} "\
+                         "will be combined as numbers.")
+    else:
+        arcpy.AddWarning(f"Text fields can only take one of {ag.text_ops()}, "
+                         f"or one of {ag.numeric_ops()} if every value "
+                         "is a number.")
     raise arcpy.ExecuteError()
 
 def vt_to_dict(vt):
@@ -62,12 +80,7 @@ def list_field_names(layer):
     Parameter: layer
     Condition: a string describing a valid layer in the ArcPy environment
     """
-    layer_names = []
-    layer_fields = arcpy.ListFields(layer)
-
-    for field in layer_fields:
-        layer_names.append(field.name)
-    return layer_names
+    return sc.schema.names(layer)
 
 def list_field_types(layer):
     """
@@ -76,22 +89,67 @@ def list_field_types(layer):
     Parameter: layer
     Condition: a string describing a valid layer in the ArcPy environment
     """
-    layer_types = []
-    layer_fields = arcpy.ListFields(layer)
-
-    for field in layer_fields:
-        layer_types.append(field.type)
-    return layer_types
+    return sc.schema.types(layer)
 
 def dict_of_fields(layer):
     layer_dict = {}
-    layer_fields = arcpy.ListFields(layer)
-
-    for field in layer_fields:
+    for field in sc.schema.fields(layer):
         layer_dict[field.name] = field.type
     return layer_dict
 
-def create_dissolve_stats(lyr, field_ops):
+def scan_fields(lyr, fields, text_fields=()):
+    """
+    Reads lyr once to find varying fields and collect text columns
+
+    Returns (varying, oids, text). varying is the set of fields whose
+    values differ between features in lyr. text is a dictionary of
+    {field: list of values} for each of text_fields, and oids the OID
+    of each feature those values came from.
+
+    A field stops being compared as soon as it is found to vary, and
+    if there are no text fields to collect, the scan stops early once
+    every field varies.
+
+    Parameter lyr: the layer to scan
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter fields: the fields to check
+    Condition: a list of field names found in lyr
+
+    Parameter text_fields: the fields to collect
+    Condition: a list of field names found in lyr
+    """
+    text_fields = list(text_fields)
+    varying = set()
+    oids = []
+    text = {fld: [] for fld in text_fields}
+    if not fields and not text_fields:
+        return varying, oids, text
+
+    n = len(fields)
+    with arcpy.da.SearchCursor(lyr, field_names=fields + text_fields
+                               + ["OID@"]) as cursor:
+        first = None
+        # Indices of the fields that are still constant
+        constant = list(range(n))
+        for row in cursor:
+            if text_fields:
+                oids.append(row[-1])
+                for i, fld in enumerate(text_fields, n):
+                    text[fld].append(row[i])
+            if first is None:
+                first = row
+                continue
+            still = [i for i in constant if row[i] == first[i]]
+            if len(still) != len(constant):
+                varying.update(fields[i] for i in constant if i not in still)
+                constant = still
+                if not constant and not text_fields:
+                    break
+    return varying, oids, text
+
+
+def create_dissolve_stats(lyr, field_ops, source_oids=None):
     """
     Returns a ValueTable for use as a dissolve statistics_field
 
@@ -117,59 +175,59 @@ def create_dissolve_stats(lyr, field_ops):
             have different attributes in a given field
             must be present in field_ops and have
             an associated valid operation
+
+    Parameter source_oids: the OIDs to report bad values against
+    Condition: a list of integers, one per feature of lyr in OID order,
+               e.g. the original OIDs of a copied selection. If None,
+               lyr's own OIDs are reported
     """
     #st.loginfo(f"Creating the dissolution table from {field_ops}")
-    
-    # GET IT?? 😜
-    imp.reload(st)
 
     user_op_dict = vt_to_dict(field_ops)
-    lfn = list_field_names(lyr)
+    field_types = dict_of_fields(lyr)
     solvent = arcpy.ValueTable(2)
 
+    # Fields without a user operation must be the same for every feature,
+    # and text fields given a numeric operation must hold only numbers.
+    # Check all of them in one pass rather than one cursor per field.
+    text_fields = [attr_col for attr_col, op in user_op_dict.items()
+                   if field_types.get(attr_col) == "String"
+                   and ag.is_numeric(op)]
+    varying, oids, text = scan_fields(
+        lyr, [attr_col for attr_col in field_types
+              if attr_col not in user_op_dict
+              and attr_col not in st.INSOLUBLES],
+        text_fields
+    )
+    numeric, unparseable = dv.numeric_text(text)
+    if unparseable and source_oids is not None:
+        rank = {oid: r for r, oid in enumerate(sorted(oids))}
+        oids = [source_oids[rank[oid]] for oid in oids]
+    for attr_col, rows in unparseable.items():
+        handle_bad_str_op(lyr, attr_col, user_op_dict[attr_col],
+                          [(oids[i], text[attr_col][i]) for i in rows])
+
+    # The rules themselves live in dissolve.py so the parallel
+    # workers (see parallel.py) apply exactly the same ones
+    try:
+        stats = dv.plan_statistics(field_types, user_op_dict, varying,
+                                   st.INSOLUBLES, numeric)
+    except dv.SystemFieldError:
+        arcpy.AddError("Cannot combine system-managed values! "\
+                       "please make sure " + str(st.INSOLUBLES) + \
+                       " are not in the provided field map!")
+        raise arcpy.ExecuteError()
+    except dv.TextOperationError as err:
+        handle_bad_str_op(lyr, err.field, err.op)
+    except dv.StatisticsError as err:
+        # Varying fields and unknown operations
+        arcpy.AddError(str(err))
+        raise arcpy.ExecuteError()
+
     # Buld out the ValueTable to pass to the Dissolve tool
-    for attr_col in lfn:
-
-        # User operation preferences always take precedence
-        if attr_col in list(user_op_dict):
-            
-            if attr_col in st.INSOLUBLES:
-                arcpy.AddError("Cannot combine system-managed values! "\
-                               "please make sure " + str(st.INSOLUBLES) + \
-                               " are not in the provided field map!")
-                raise arcpy.ExecuteError()
-            # Because we're going to append the common parcel
-            # It should always be last
-            if user_op_dict[attr_col] == "Common Attribute":
-                solvent.addRow([attr_col, "LAST"])
-            
-            # Otherwise, the user specifies the same operation we want to use
-            else:
-                ft = arcpy.ListFields(lyr, attr_col)[0].type
-                # logstr = f"for {attr_col}, field type is {ft}"
-                # st.loginfo(logstr)
-                if ft == 'String':
-                    if user_op_dict[attr_col] != 'FIRST':
-                        handle_bad_str_op(lyr, attr_col, user_op_dict[attr_col])
-                solvent.addRow([attr_col, user_op_dict[attr_col]])
-        
-        # But if a user didn't specifiy an operation...
-        else:
-            attr_list = list(arcpy.da.SearchCursor(lyr, field_names=attr_col))
-            if attr_col in ["Shape_Length", "Shape_Area"]:
-                solvent.addRow([attr_col, "LAST"])
-            # Double check that the attributes are the same 
-            elif not (all(ele == attr_list[0] for ele in attr_list) 
-                    or attr_col in st.INSOLUBLES):
-                arcpy.AddError(f"Attributes in column {attr_col} "\
-                               "vary between features, but no "\
-                               "operation was provided to combine them!")
-                raise arcpy.ExecuteError()
-            elif not attr_col in st.INSOLUBLES:
-                solvent.addRow([attr_col, "FIRST"]) 
-                # Or second or third or fourth. 
-                # Point is, they should all be the same.
-    
+    for attr_col, op in stats.items():
+        solvent.addRow([attr_col, op])
+
     # st.loginfo("Created Dissolve list with the following rules")
     # st.loginfo(solvent.exportToString())
     return solvent
@@ -235,20 +293,7 @@ def field_dict_for_op(dis_layer):
     Conditions: a string describing a valid layer in the ArcPy environment
                 layer described must have been created by a dissolve operation
     """
-    ops = ["SUM",
-           "MEAN", 
-           "MIN", 
-           "MAX", 
-           "RANGE", 
-           "STD", 
-           "COUNT", 
-           "FIRST",
-           "LAST",
-           "MEDIAN",
-           "VARIANCE",
-           "UNIQUE"
-           "CONCATENATE"
-           ]
+    ops = dv.OPERATIONS
     fnl = list_field_names(dis_layer)
     fm_dict = {}
     for fn in fnl:
@@ -261,54 +306,215 @@ def field_dict_for_op(dis_layer):
     return fm_dict
 
 
-def dissolve_and_rectify(in_feature, solvent, out_feature):
+def solvent_to_dict(solvent):
     """
-    Dissolves a selection, then removes the affix from the resultant output
+    Returns a {field name: statistic} dictionary from a dissolve ValueTable
 
-    This function uses a ValueTable to create a dissolution, then produces
-    a field map linking dissolved field names back to the original field names.
-    
-    For details on limitations, see documentation for 
-        unionmerge.field_dict_for_op() and unionmerge.field_map_for_dicts()
+    Unlike vt_to_dict(), this reads both columns as text, which is what
+    create_dissolve_stats() produces.
 
-    Parameter in_feature: the input feature
-    Condition: a string describing a valid layer in the ArcPy environment
+    Parameter solvent: the ValueTable to convert
+    Condition: a ValueTable returned by create_dissolve_stats()
+    """
+    return {solvent.getValue(i, 0): solvent.getValue(i, 1)
+            for i in range(solvent.rowCount)}
 
-    Parameter solvent: the ValueTable used to dissolve
-    Condition: must be an ArcPy valuet table valid for use in arcmg.Dissolve
 
-    Parameter out_feature: the output feature
-    Condition: a string describing a layer to be created 
-               in the ArcPy environment
+def clean_in_place(in_feature, cleanup):
+    """
+    Cleans the shapes of in_feature ahead of PairwiseDissolve
+
+    See cleanup.clean_geometries(). A parcel that would be dropped
+    altogether keeps its shape, since a feature without one would take
+    its attributes out of the dissolve too.
+
+    Parameter in_feature: the features to clean, in place
+    Condition: a scratch dataset, never the unit parcel layer itself
+
+    Parameter cleanup: the settings
+    Condition: a cleanup.Cleanup
+    """
+    with arcpy.da.SearchCursor(in_feature, ["SHAPE@"]) as cursor:
+        geoms = [row[0] for row in cursor]
+    cleaned = cu.clean_geometries(geoms, cleanup)
+    with arcpy.da.UpdateCursor(in_feature, ["SHAPE@"]) as cursor:
+        for (geom,), new in zip(cursor, cleaned):
+            if new is not None:
+                cursor.updateRow([cu.like(new, geom)])
+
+
+def dissolve_pairwise(in_feature, solvent, out_feature, cleanup=None):
     """
+    Dissolves with PairwiseDissolve, then removes the statistic prefixes
+
+    For details on limitations, see documentation for 
+        unionmerge.field_dict_for_op() and unionmerge.field_map_for_dicts()
+
+    Parameters: see dissolve_and_rectify()
+    """
+    if cleanup is not None:
+        clean_in_place(in_feature, cleanup)
+    # PairwiseDissolve can't add up text, even when it's all numbers,
+    # and only knows its own statistics
+    field_types = dict_of_fields(in_feature)
+    statistics = arcpy.ValueTable(2)
+    for fld, op in solvent_to_dict(solvent).items():
+        if field_types.get(fld) == "String" and ag.is_numeric(op):
+            handle_bad_str_op(in_feature, fld, op)
+        if ag.native(op) is None:
+            arcpy.AddError(f"{op} (field {fld}) needs the in_process "
+                           "dissolve engine")
+            raise arcpy.ExecuteError()
+        statistics.addRow([fld, ag.native(op)])
+    solution = sw.pool.path("dissolved", 1)
     # st.loginfo(pf(list_field_types(in_feature)))
     arcpy.PairwiseDissolve_analysis(
         in_features= in_feature,
         out_feature_class=solution,
         dissolve_field=None,
-        statistics_fields= solvent,
+        statistics_fields= statistics,
         multi_part="MULTI_PART",
         concatenation_separator=""
     )
+    # Both outputs are overwritten on every run
+    sc.schema.invalidate(solution)
     # st.loginfo(pf(list_field_types(solution)))
     fdict = field_dict_for_op(solution)
     map = field_map_for_dicts(solution, fdict, dict_of_fields(in_feature))
     # ESRI 🤝 Hegel
     #       ⤷ arcane incomprehensible nonsense
     arcpy.conversion.ExportFeatures(solution, out_feature, field_mapping = map)
-    arcmg.CalculateField(
-        in_table=out_feature,
-        field="IS_OUG",
-        expression=1,
-        expression_type="PYTHON3",
-    )
-    arcmg.CalculateField(
-        in_table=out_feature,
-        field="PROCESSOR",
-        expression="'" + PROCESSOR_VERSION + "'",
-        # Hideous. I love it.
-        expression_type="PYTHON3",
+    sc.schema.invalidate(out_feature)
+    # Values are cast back to the unit layer's types when they're written
+    for fld, before, after in qa.type_changes(dict_of_fields(in_feature),
+                                              dict_of_fields(out_feature)):
+        arcpy.AddWarning(f"QA: {fld} came out of the dissolve as {after} "
+                         f"rather than {before}")
+
+
+def fit_to_fields(attrs, field_info):
+    """
+    Cuts text values down to the length of the field they go in
+
+    CONCATENATE can outgrow the original field. Returns attrs.
+
+    Parameter attrs: dissolved attributes
+    Condition: a dictionary of {field name: value}
+
+    Parameter field_info: the fields the values are written to
+    Condition: a dictionary of {field name: arcpy Field or FieldInfo}
+    """
+    for fld, value in attrs.items():
+        if fld not in field_info:
+            continue
+        length = field_info[fld].length
+        if isinstance(value, str) and len(value) > length:
+            arcpy.AddWarning(f"Value for {fld} is longer than the field "
+                             f"allows and was cut to {length} characters")
+            attrs[fld] = value[:length]
+    return attrs
+
+
+def dissolve_in_process(in_feature, solvent, out_feature, cleanup=None):
+    """
+    Dissolves with the in-process engine in dissolve.py
+
+    The input is read with a single cursor and the OUG is written
+    straight into a copy of the input's schema, so fields keep their
+    names and types without any remapping.
+
+    Parameters: see dissolve_and_rectify()
+    """
+    stats = {fld: op for fld, op in solvent_to_dict(solvent).items()
+             if fld not in st.INSOLUBLES}
+    fields = list(stats)
+    field_info = {f.name: f for f in sc.schema.fields(in_feature)}
+
+    features = []
+    with arcpy.da.SearchCursor(in_feature, ["SHAPE@"] + fields) as cursor:
+        for row in cursor:
+            features.append((row[0], dict(zip(fields, row[1:]))))
+
+    # create_dissolve_stats() only lets numeric operations through on
+    # text fields that hold nothing but numbers
+    parse = {fld for fld in fields if field_info[fld].type == "String"
+             and ag.is_numeric(stats[fld])}
+    # Stacked units are unioned once; STACK_COUNT is filled in if the
+    # layer has it
+    stack_field = dv.STACK_FIELD if dv.STACK_FIELD in field_info else None
+    geom, attrs = dv.dissolve_features(
+        features, stats, {fld: field_info[fld].type for fld in fields},
+        parse=parse, stack_field=stack_field, cleanup=cleanup
     )
+    attrs = fit_to_fields(attrs, field_info)
+    for fld, value in [("IS_OUG", 1), ("PROCESSOR", PROCESSOR_VERSION)]:
+        if fld in field_info:
+            attrs[fld] = value
+
+    # Emptied and reused if it's a scratch dataset from an earlier OUG
+    sw.pool.empty_like(out_feature, in_feature)
+
+    out_fields = list(attrs)
+    with arcpy.da.InsertCursor(out_feature,
+                               ["SHAPE@"] + out_fields) as cursor:
+        cursor.insertRow([geom] + [attrs[fld] for fld in out_fields])
+
+
+def dissolve_and_rectify(in_feature, solvent, out_feature, engine=ENGINE,
+                         cleanup=CLEANUP):
+    """
+    Dissolves a selection into a single feature with the original field names
+
+    Two engines are available. "in_process" (the default) dissolves with
+    dissolve.py and writes the result directly. "pairwise" uses the
+    PairwiseDissolve tool, then produces a field map linking dissolved
+    field names back to the original field names and exports through it.
+
+    Either way, the output is tagged as an OUG processed by this version.
+
+    Parameter in_feature: the input feature
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter solvent: the ValueTable used to dissolve
+    Condition: must be an ArcPy valuet table valid for use in arcmg.Dissolve
+
+    Parameter out_feature: the output feature
+    Condition: a string describing a layer to be created 
+               in the ArcPy environment
+
+    Parameter engine: the dissolve engine to use
+    Condition: "in_process" or "pairwise"
+
+    Parameter cleanup: how to clean the geometries first (see cleanup.py).
+                       With the pairwise engine, in_feature's shapes are
+                       replaced by the cleaned ones
+    Condition: a cleanup.Cleanup, or None to dissolve them as they are
+    """
+    if engine == "in_process":
+        dissolve_in_process(in_feature, solvent, out_feature, cleanup)
+        # Tags were written with the feature if the fields existed
+        tagged = set(list_field_names(in_feature))
+    elif engine == "pairwise":
+        dissolve_pairwise(in_feature, solvent, out_feature, cleanup)
+        tagged = set()
+    else:
+        raise ValueError(f"Unknown dissolve engine {engine}")
+
+    if "IS_OUG" not in tagged:
+        sc.schema.calculate_field(
+            layer=out_feature,
+            field="IS_OUG",
+            expression=1,
+            expression_type="PYTHON3",
+        )
+    if "PROCESSOR" not in tagged:
+        sc.schema.calculate_field(
+            layer=out_feature,
+            field="PROCESSOR",
+            expression="'" + PROCESSOR_VERSION + "'",
+            # Hideous. I love it.
+            expression_type="PYTHON3",
+        )
 
 
 def checkfields(lyr):
@@ -322,4 +528,4 @@ def checkfields(lyr):
             ft = ftype.pop()
             warntext = f"{relevant_field} does not exist, adding now with type {ft}"
             arcpy.AddWarning(warntext)
-            arcmg.AddField(lyr, relevant_field, ft)
+            sc.schema.add_field(lyr, relevant_field, ft)
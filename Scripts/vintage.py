@@ -0,0 +1,288 @@
+"""
+Change detection between two vintages of the parcel layer
+
+Updating the Housing Unit Inventory from a new LIR vintage only needs
+the OUGs whose parcels changed. This used to be worked out by
+preprocessing that dropped unmodified parcels, which also dropped the
+common parcels those units needed. This module does it in one pass:
+
+- parcels of the two vintages are matched by parcel id, and their
+  shapes and attributes compared by hash. A new id with exactly the
+  shape of an id that disappeared is the same parcel renumbered
+- every parcel is classified as NEW, CHANGED, REMOVED or UNCHANGED
+- the common parcels affected are found in the full new vintage:
+  those containing (holes filled in) a new or changed parcel, or the
+  old shape of a changed or removed one, and changed parcels that
+  contain other parcels themselves
+- the units of those common parcels, changed or not, are gathered
+  with one containment join, along with new and changed parcels that
+  aren't in any common parcel (townhomes, for cluster_units.py)
+
+Only those go on to the merge, so an annual update touches a few
+percent of the region instead of all of it.
+
+Features are (parcel id, WKB, attributes), as read from a layer by
+vintage_changes.py or from GeoParquet by geoparquet.read_features().
+Needs shapely; nothing in here imports arcpy.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import hashlib
+import pickle
+from collections import namedtuple
+
+import numpy as np
+
+import containment as cn
+import eliminate as el
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+NEW = "NEW"
+CHANGED = "CHANGED"
+REMOVED = "REMOVED"
+UNCHANGED = "UNCHANGED"
+
+# A common parcel must be at least this many times the area of a parcel
+# inside it, so stacked copies of a unit aren't each other's common
+# parcel
+COMMON_RATIO = 1.001
+
+# status: {key: NEW, CHANGED, REMOVED or UNCHANGED} for every parcel of
+#         either vintage, where key is (parcel id, occurrence) (see keys())
+# renamed: {new key: old key} for renumbered parcels
+Changes = namedtuple("Changes", ["status", "renamed"])
+
+# changes: the Changes
+# commons: positions in the new vintage of the common parcels to merge
+# units: positions in the new vintage of the parcels that go with them,
+#        and of new or changed parcels in no common parcel
+Affected = namedtuple("Affected", ["changes", "commons", "units"])
+
+
+def _require():
+    if shapely is None:
+        raise ImportError("Vintage change detection requires shapely")
+
+
+def keys(ids):
+    """
+    Returns a unique key for every parcel id
+
+    The key is (id, n) for the nth parcel with that id, so parcels with
+    duplicate or missing ids are still told apart.
+
+    Parameter ids: the parcel ids of one vintage
+    Condition: a list of hashable values, possibly repeated or None
+    """
+    seen = {}
+    out = []
+    for pid in ids:
+        n = seen.get(pid, 0)
+        seen[pid] = n + 1
+        out.append((pid, n))
+    return out
+
+
+def geometry_digests(wkbs):
+    """
+    Returns a digest of each shape that ignores vertex and ring order
+
+    Parameter wkbs: the shapes
+    Condition: a list of WKB bytes, possibly containing None
+    """
+    _require()
+    geoms = shapely.normalize(shapely.from_wkb(wkbs))
+    return [None if wkb is None else hashlib.sha1(wkb).digest()
+            for wkb in shapely.to_wkb(geoms).tolist()]
+
+
+def attribute_digest(values):
+    """
+    Returns a digest of a parcel's attribute values
+
+    Parameter values: the values
+    Condition: a list of picklable values, in the same field order for
+               every parcel compared
+    """
+    return hashlib.sha1(pickle.dumps(values, protocol=4)).digest()
+
+
+def fingerprints(features):
+    """
+    Returns {key: (shape digest, attribute digest)} for one vintage
+
+    Parameter features: the parcels
+    Condition: a list of (parcel id, WKB, attributes), every parcel
+               with the same attribute fields
+    """
+    shapes = geometry_digests([wkb for _, wkb, _ in features])
+    # Pickling the values in one field order is much faster than
+    # writing out each parcel's whole dictionary
+    fields = sorted(features[0][2]) if features else []
+    return {key: (shape, attribute_digest([attrs[f] for f in fields]))
+            for key, shape, (_, _, attrs)
+            in zip(keys([pid for pid, _, _ in features]), shapes, features)}
+
+
+def classify(old, new):
+    """
+    Classifies every parcel of two vintages. Returns a Changes.
+
+    A parcel in both is UNCHANGED if its shape and attributes are the
+    same, CHANGED otherwise. A new parcel with the shape of a removed
+    one (a parcel that was renumbered) is CHANGED rather than one NEW
+    and one REMOVED parcel.
+
+    Parameters old, new: the vintages
+    Condition: dictionaries from fingerprints()
+    """
+    status = {}
+    for key in old.keys() & new.keys():
+        status[key] = UNCHANGED if old[key] == new[key] else CHANGED
+
+    gone = old.keys() - new.keys()
+    by_shape = {}
+    for key in sorted(gone, key=repr):
+        if old[key][0] is not None:
+            by_shape.setdefault(old[key][0], []).append(key)
+    renamed = {}
+    for key in sorted(new.keys() - old.keys(), key=repr):
+        matches = by_shape.get(new[key][0])
+        if new[key][0] is not None and matches:
+            renamed[key] = matches.pop(0)
+            status[key] = CHANGED
+        else:
+            status[key] = NEW
+    taken = set(renamed.values())
+    for key in gone - taken:
+        status[key] = REMOVED
+    return Changes(status, renamed)
+
+
+def _containers(tree, geoms, targets, own, part_area_percent, ratio):
+    """
+    Returns (target positions, parcel positions) of every target within
+    another parcel of geoms, holes filled in, at least ratio times its
+    area
+
+    Only the parcels whose extent covers a target's are filled in and
+    tested, never the whole region. own is each target's position in
+    geoms, or -1, since a parcel with holes is within itself filled in.
+    """
+    t_idx, g_idx = tree.query(targets)
+    outer = shapely.bounds(geoms[g_idx])
+    inner = shapely.bounds(targets[t_idx])
+    keep = (outer[:, :2] <= inner[:, :2]).all(axis=1) \
+        & (outer[:, 2:] >= inner[:, 2:]).all(axis=1) \
+        & (g_idx != np.asarray(own, dtype=np.int64)[t_idx])
+    t_idx, g_idx = t_idx[keep], g_idx[keep]
+    if len(g_idx) == 0:
+        return t_idx, g_idx
+
+    near, pair = np.unique(g_idx, return_inverse=True)
+    filled = np.asarray(el.eliminate_polygon_parts(list(geoms[near]),
+                                                   part_area_percent),
+                        dtype=object)
+    # Stacked copies of a footprint cover each other's extents; the
+    # area test drops them before the far slower within test
+    bigger = shapely.area(filled)[pair] \
+        >= ratio * shapely.area(targets[t_idx])
+    t_idx, g_idx, pair = t_idx[bigger], g_idx[bigger], pair[bigger]
+    shapely.prepare(filled)
+    inside = shapely.within(targets[t_idx], filled[pair])
+    return t_idx[inside], g_idx[inside]
+
+
+def affected_parcels(old_features, new_features, part_area_percent=90,
+                     ratio=COMMON_RATIO):
+    """
+    Finds the common parcels and units an update has to merge again
+
+    A common parcel is a parcel that, with its holes filled in, contains
+    other parcels, and isn't inside another parcel itself. The second
+    rule keeps condo units with smaller units stacked on them from
+    counting as common parcels.
+
+    Returns an Affected.
+
+    Parameter old_features: the previous vintage
+    Condition: a list of (parcel id, WKB, attributes)
+
+    Parameter new_features: the new vintage, every parcel (not only the
+                            changed ones), so common parcels are found
+    Condition: a list of (parcel id, WKB, attributes) with the same
+               attribute fields as old_features
+
+    Parameter part_area_percent: how common parcels' holes are filled in
+                                 (see eliminate.eliminate_polygon_parts())
+
+    Parameter ratio: see COMMON_RATIO
+    Condition: a number above 1
+    """
+    _require()
+    changes = classify(fingerprints(old_features),
+                       fingerprints(new_features))
+    new_keys = keys([pid for pid, _, _ in new_features])
+    old_keys = keys([pid for pid, _, _ in old_features])
+    geoms = shapely.from_wkb([wkb for _, wkb, _ in new_features])
+    present = ~shapely.is_missing(geoms)
+    tree = shapely.STRtree(geoms)
+
+    touched = np.array([i for i, k in enumerate(new_keys)
+                        if present[i] and changes.status[k] != UNCHANGED],
+                       dtype=np.int64)
+    # Where parcels used to be: a common parcel that lost a unit, or
+    # whose unit moved, is merged again too
+    old_pos = {k: i for i, k in enumerate(old_keys)}
+    left = [old_pos[k] for k, s in changes.status.items()
+            if k in old_pos and s in (CHANGED, REMOVED)]
+    left += [old_pos[k] for k in changes.renamed.values()]
+    old_geoms = shapely.from_wkb([old_features[i][1] for i in left])
+    old_geoms = old_geoms[~shapely.is_missing(old_geoms)]
+    targets = np.concatenate([geoms[touched], old_geoms])
+    own = np.concatenate([touched, np.full(len(old_geoms), -1)])
+
+    # Parcels around the changes, and changed parcels around others
+    _, holders = _containers(tree, geoms, targets, own, part_area_percent,
+                             ratio)
+    candidates = set(holders.tolist())
+    if len(touched):
+        filled = np.asarray(el.eliminate_polygon_parts(
+            list(geoms[touched]), part_area_percent), dtype=object)
+        holder, inside = tree.query(filled, predicate="contains")
+        bigger = (shapely.area(filled[holder])
+                  >= ratio * shapely.area(geoms[inside])) \
+            & (touched[holder] != inside)
+        candidates.update(touched[np.unique(holder[bigger])].tolist())
+    candidates = np.array(sorted(candidates), dtype=np.int64)
+    nested, _ = _containers(tree, geoms, geoms[candidates], candidates,
+                            part_area_percent, ratio)
+    commons = np.setdiff1d(candidates, candidates[nested])
+
+    # Every unit of those common parcels, changed or not
+    common_geoms = el.eliminate_polygon_parts(list(geoms[commons]),
+                                              part_area_percent)
+    units = np.empty(0, dtype=np.int64)
+    if len(commons):
+        units = np.setdiff1d(np.unique(tree.query(common_geoms)[1]), commons)
+        join = cn.containment_join(common_geoms, list(geoms[units]),
+                                   unit_ids=units)
+        units = join.unit_ids
+    units = np.union1d(units, np.setdiff1d(touched, candidates))
+    return Affected(changes, commons.tolist(), units.tolist())
+
+
+def counts(changes):
+    """
+    Returns {status: number of parcels} for a Changes
+    """
+    tally = dict.fromkeys([NEW, CHANGED, REMOVED, UNCHANGED], 0)
+    for status in changes.status.values():
+        tally[status] += 1
+    return tally
@@ -0,0 +1,198 @@
+"""
+Script to find what a new LIR vintage changed
+    and copy out only the parcels the OUG merge needs again
+
+Updating the Housing Unit Inventory used to mean preprocessing the new
+vintage down to the parcels that changed, which also dropped the
+common parcels those units sit in. This tool compares the new vintage
+with the previous one by parcel id and by shape and attribute hashes
+(see vintage.py), and copies the affected common parcels, pulled from
+the whole new vintage, and their units to two feature classes. Those
+are the common and review parcel layers for Batch Common Parcel to OUG.
+
+Each copied parcel's change (NEW, CHANGED or UNCHANGED) is written to
+a field, so the unchanged units that came along with their common
+parcel can be told apart on the map.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+import arcbackend as ab
+from arcbackend import arcpy, arcmg
+import arcscripttools as st
+import batch_common_to_oug as bc
+import editbatch as eb
+import ouglog as ol
+import schemacache as sc
+import vintage as vt
+
+STATUS_FIELD = "VINTAGE_STATUS"
+
+
+def compared_fields(old_layer, new_layer, id_field):
+    """
+    Returns the editable fields the two vintages share, but id_field
+
+    Parameters old_layer, new_layer: the vintages
+    Condition: strings describing valid layers in the ArcPy environment
+    """
+    old_names = set(sc.schema.names(old_layer))
+    return [f.name for f in sc.schema.fields(new_layer)
+            if f.type not in eb.READ_ONLY_TYPES
+            and f.name not in st.INSOLUBLES
+            and f.name not in (id_field, STATUS_FIELD)
+            and f.name in old_names]
+
+
+def read_vintage(layer, id_field, fields):
+    """
+    Returns (OIDs, features) of a layer, as vintage.py takes them
+
+    Parameter layer: the vintage
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter id_field: the parcel id field
+    Condition: a field name
+
+    Parameter fields: the attributes to compare
+    Condition: a list of field names
+    """
+    oids = []
+    features = []
+    with arcpy.da.SearchCursor(layer, ["OID@", id_field, "SHAPE@WKB"]
+                               + fields) as cursor:
+        for row in cursor:
+            oids.append(row[0])
+            wkb = None if row[2] is None else bytes(row[2])
+            features.append((row[1], wkb, dict(zip(fields, row[3:]))))
+    return oids, features
+
+
+def copy_parcels(layer, oids, output, id_field, statuses):
+    """
+    Copies some parcels of a layer to a new feature class, with their
+    change in STATUS_FIELD
+
+    Parameter layer: the layer to copy from
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter oids: the parcels to copy
+    Condition: a list of OIDs of layer
+
+    Parameter output: the feature class to create
+    Condition: a path that doesn't exist yet, or may be overwritten
+
+    Parameter id_field: the parcel id field
+    Condition: a field name
+
+    Parameter statuses: each parcel's change
+    Condition: a dictionary of {parcel id: status}
+    """
+    if not oids:
+        arcpy.AddWarning(f"No parcels to copy to {output}")
+        return
+    arcmg.SelectLayerByAttribute(layer, "NEW_SELECTION",
+                                 bc.oid_where_clause(layer, oids))
+    arcmg.CopyFeatures(layer, output)
+    st.clear_selection(layer)
+
+    sc.schema.invalidate(output)
+    if STATUS_FIELD not in sc.schema.names(output):
+        sc.schema.add_field(output, STATUS_FIELD, "TEXT", field_length=9)
+    with arcpy.da.Editor(eb.workspace_of(output)):
+        with arcpy.da.UpdateCursor(output, [id_field, STATUS_FIELD]) \
+                as cursor:
+            for pid, _ in cursor:
+                cursor.updateRow([pid, statuses.get(pid)])
+
+
+def script_tool(old_layer, new_layer, id_field, common_output, unit_output,
+                fields=None, part_area_percent=90):
+    """
+    Copies the common parcels and units a new vintage affects
+
+    Parameter old_layer: the previous vintage
+    Condition: a string describing a valid layer in the ArcPy environment
+
+    Parameter new_layer: the new vintage, every parcel of it, so common
+                         parcels around changed units are found
+    Condition: a string describing a valid layer in the ArcPy environment
+               with no selection
+
+    Parameter id_field: the parcel id field, in both vintages
+    Condition: a field name
+
+    Parameters common_output, unit_output: where to copy the affected
+                                           common parcels and units
+    Condition: feature class paths
+
+    Parameter fields: the attributes whose change counts as a change
+    Condition: a list of field names in both vintages, or None for
+               every editable field they share
+
+    Parameter part_area_percent: how common parcels' holes are filled in
+                                 (see eliminate.eliminate_polygon_parts())
+    """
+    st.loginfo("Comparing parcel vintages")
+    # Layers may have been edited since the last run in this session
+    sc.schema.invalidate()
+    ol.log.reset_timings()
+
+    for layer in (old_layer, new_layer):
+        if id_field not in sc.schema.names(layer):
+            arcpy.AddError(f"{id_field} is not a field of {layer}")
+            raise arcpy.ExecuteError()
+    if fields is None:
+        fields = compared_fields(old_layer, new_layer, id_field)
+    st.clear_selection(new_layer)
+
+    with ol.log.span("read"):
+        _, old_features = read_vintage(old_layer, id_field, fields)
+        new_oids, new_features = read_vintage(new_layer, id_field, fields)
+    st.loginfo(f"Read {len(old_features)} old and {len(new_features)} "
+               f"new parcels, comparing {len(fields)} fields")
+
+    with ol.log.span("compare", parcels=len(new_features)):
+        affected = vt.affected_parcels(old_features, new_features,
+                                       part_area_percent)
+    tally = vt.counts(affected.changes)
+    st.loginfo(", ".join(f"{n} {status.lower()}"
+                         for status, n in tally.items())
+               + f" ({len(affected.changes.renamed)} renumbered)")
+
+    # The copies have new OIDs, so statuses go by parcel id. Of
+    # parcels sharing an id, any change shows
+    statuses = {}
+    for key, status in affected.changes.status.items():
+        if status != vt.REMOVED and statuses.get(key[0]) in (
+                None, vt.UNCHANGED):
+            statuses[key[0]] = status
+    with ol.log.span("write"):
+        copy_parcels(new_layer, [new_oids[i] for i in affected.commons],
+                     common_output, id_field, statuses)
+        copy_parcels(new_layer, [new_oids[i] for i in affected.units],
+                     unit_output, id_field, statuses)
+
+    share = len(affected.units) / len(new_features) if new_features else 0
+    st.loginfo(f"Copied {len(affected.commons)} common parcels and "
+               f"{len(affected.units)} units ({100 * share:.1f}% of the "
+               f"new vintage). Run Batch Common Parcel to OUG with "
+               f"{common_output} and {unit_output}.")
+    st.loginfo(ol.log.log_summary(), 0)
+    return
+
+
+if __name__ == "__main__":
+    # Only with OUG_DEV_RELOAD set, for working on the scripts
+    ab.dev_reload(vt)
+    param0 = arcpy.GetParameterAsText(0)
+    param1 = arcpy.GetParameterAsText(1)
+    param2 = arcpy.GetParameterAsText(2)
+    param3 = arcpy.GetParameterAsText(3)
+    param4 = arcpy.GetParameterAsText(4)
+    # Optional
+    param5 = arcpy.GetParameterAsText(5)
+    param5 = param5.split(";") if param5 else None
+    param6 = arcpy.GetParameter(6) or 90
+
+    script_tool(param0, param1, param2, param3, param4, param5, param6)
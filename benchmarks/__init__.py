@@ -0,0 +1,17 @@
+"""
+Benchmarks for the OUG pipeline that run without ArcGIS
+
+- synthetic.py generates condo layouts like Condo.png
+- fakearcpy.py is an in-memory stand-in for the arcpy calls the
+  scripts make
+- run.py times the pipeline on synthetic data
+
+Run from the repository root with:
+
+    python -m benchmarks.run --sizes 10 100 1000 10000 100000
+
+Requires numpy and shapely.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
@@ -0,0 +1,619 @@
+"""
+In-memory stand-in for the parts of arcpy the OUG scripts use
+
+install() puts fake arcpy, arcpy.management, arcpy.da and
+arcpy.conversion modules into sys.modules, so the scripts in Scripts/
+can be imported and run on plain Python. Datasets are dictionaries of
+rows, geometries are shapely geometries, and layers are names pointing
+at a dataset plus an optional selection.
+
+This is a benchmarking aid, not an emulator: it implements the calls
+and keyword arguments the scripts make, with the semantics they rely
+on, and where clauses only support the OID lists the scripts build.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import ast
+import functools
+import re
+import sys
+import time
+import types
+
+import shapely
+import shapely.wkt
+
+OID_FIELD = "OBJECTID"
+SHAPE_FIELD = "Shape"
+SYSTEM_FIELDS = [(OID_FIELD, "OID", 4), (SHAPE_FIELD, "Geometry", 0),
+                 ("Shape_Length", "Double", 8), ("Shape_Area", "Double", 8)]
+
+# Seconds added to every geoprocessing tool call, to model the fixed
+# overhead each call has in ArcGIS Pro. Cursors are not affected.
+tool_latency = 0.0
+
+_OID_WHERE = re.compile(r"^\s*(\w+)\s*(?:IN\s*\(([^)]*)\)|=\s*(\d+))\s*$",
+                        re.IGNORECASE)
+
+
+class ExecuteError(Exception):
+    pass
+
+
+class Field:
+    def __init__(self, name, type, length=0, isNullable=True):
+        self.name = name
+        self.type = type
+        self.length = length
+        self.isNullable = isNullable
+        self.aliasName = name
+
+
+class FieldValue:
+    """
+    What a Field column of a tool's ValueTable parameter holds
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ValueTable:
+    def __init__(self, columns=2):
+        self.columns = columns
+        self._rows = []
+
+    @property
+    def rowCount(self):
+        return len(self._rows)
+
+    def addRow(self, row):
+        if isinstance(row, str):
+            row = row.split(" ")
+        self._rows.append(list(row))
+
+    def getTrueRow(self, i):
+        return self._rows[i]
+
+    def getValue(self, i, j):
+        value = self._rows[i][j]
+        return getattr(value, "value", value)
+
+    def exportToString(self):
+        return ";".join(" ".join(str(self.getValue(i, j))
+                                 for j in range(len(r)))
+                        for i, r in enumerate(self._rows))
+
+
+class Result:
+    """
+    The bits of an arcpy Result the scripts use
+    """
+
+    def __init__(self, *outputs):
+        self._outputs = [str(o) for o in outputs]
+
+    def __getitem__(self, i):
+        return self._outputs[i]
+
+    def __str__(self):
+        return self._outputs[0]
+
+
+class Dataset:
+    def __init__(self, path, fields=()):
+        self.path = path
+        self.fields = [Field(n, t, l) for n, t, l in SYSTEM_FIELDS]
+        system = {n for n, _, _ in SYSTEM_FIELDS}
+        self.fields.extend(Field(f.name, f.type, f.length, f.isNullable)
+                           for f in fields if f.name not in system)
+        self.rows = {}
+        self.next_oid = 1
+
+    def field_names(self):
+        return [f.name for f in self.fields]
+
+    def insert(self, attrs):
+        oid = self.next_oid
+        self.next_oid += 1
+        row = {f.name: None for f in self.fields
+               if f.name not in (OID_FIELD, "Shape_Length", "Shape_Area")}
+        row.update({k: v for k, v in attrs.items() if k in row})
+        self.rows[oid] = row
+        return oid
+
+
+class Layer:
+    def __init__(self, name, dataset, oids=None):
+        self.name = name
+        self.dataset = dataset
+        self.definition = oids
+        self.selection = None
+
+    def oids(self):
+        if self.selection is not None:
+            return [o for o in self.selection if o in self.dataset.rows]
+        if self.definition is not None:
+            return [o for o in self.definition if o in self.dataset.rows]
+        return list(self.dataset.rows)
+
+
+class Workspace:
+    """
+    Every dataset and layer the fake arcpy knows about
+    """
+
+    def __init__(self):
+        self.datasets = {}
+        self.layers = {}
+
+    def resolve(self, name):
+        """
+        Returns a Layer for a layer name, dataset path or Result
+        """
+        name = str(name)
+        if name in self.layers:
+            return self.layers[name]
+        path = _norm(name)
+        if path in self.datasets:
+            return Layer(path, self.datasets[path])
+        raise ExecuteError(f"ERROR 000732: Dataset {name} does not exist")
+
+    def create(self, path, fields=()):
+        path = _norm(path)
+        self.datasets[path] = Dataset(path, fields)
+        return self.datasets[path]
+
+    def load(self, path, features, fields):
+        """
+        Creates a dataset from (geometry, attributes) features
+
+        Parameter fields: the schema
+        Condition: a list of (name, type, length) tuples
+        """
+        ds = self.create(path, [Field(n, t, l) for n, t, l in fields])
+        for geom, attrs in features:
+            row = dict(attrs)
+            row[SHAPE_FIELD] = geom
+            ds.insert(row)
+        return ds
+
+
+def _norm(path):
+    return str(path).replace("/", "\\")
+
+
+ws = Workspace()
+
+
+# ---- arcpy ---------------------------------------------------------------
+
+class _Describe:
+    def __init__(self, layer):
+        self.catalogPath = layer.dataset.path
+        self.OIDFieldName = OID_FIELD
+        self.shapeFieldName = SHAPE_FIELD
+        self.shapeType = "Polygon"
+        self.spatialReference = None
+        self.name = layer.name
+        self.FIDSet = "; ".join(str(o) for o in layer.selection or [])
+
+
+def Describe(name):
+    try:
+        return _Describe(ws.resolve(name))
+    except ExecuteError as e:
+        # Like arcpy, Describe raises OSError for missing data
+        raise OSError(str(e))
+
+
+def ListFields(name, wild_card=None):
+    fields = ws.resolve(name).dataset.fields
+    if wild_card:
+        pattern = re.compile(
+            "^" + re.escape(wild_card).replace(r"\*", ".*") + "$", re.I)
+        fields = [f for f in fields if pattern.match(f.name)]
+    return list(fields)
+
+
+def Exists(name):
+    name = str(name)
+    return name in ws.layers or _norm(name) in ws.datasets
+
+
+def AddFieldDelimiters(datasource, field):
+    return field
+
+
+def FromWKT(wkt, spatial_reference=None):
+    return shapely.wkt.loads(wkt)
+
+
+def FromWKB(wkb, spatial_reference=None):
+    return shapely.from_wkb(bytes(wkb))
+
+
+def AddMessage(msg):
+    pass
+
+
+def AddWarning(msg):
+    pass
+
+
+def AddError(msg):
+    pass
+
+
+def GetInstallInfo():
+    return {"LicenseLevel": "Standard"}
+
+
+class _Env:
+    overwriteOutput = True
+    scratchGDB = "scratch.gdb"
+    workspace = "memory"
+
+
+env = _Env()
+
+
+# ---- arcpy.da ------------------------------------------------------------
+
+def _where_oids(layer, where_clause):
+    """
+    Returns the OIDs selected by an OID where clause, or all OIDs
+    """
+    if not where_clause:
+        return layer.oids()
+    match = _OID_WHERE.match(where_clause)
+    if not match or match.group(1).upper() != OID_FIELD:
+        raise NotImplementedError(f"Unsupported where clause {where_clause}")
+    wanted = match.group(2) if match.group(2) is not None else match.group(3)
+    wanted = {int(o) for o in wanted.split(",") if o.strip()}
+    if layer.selection is None and layer.definition is None:
+        # Don't scan the whole dataset for a handful of OIDs
+        return sorted(o for o in wanted if o in layer.dataset.rows)
+    return [o for o in layer.oids() if o in wanted]
+
+
+def _get(row, oid, field):
+    if field in ("OID@", OID_FIELD):
+        return oid
+    if field in ("SHAPE@", SHAPE_FIELD):
+        return row[SHAPE_FIELD]
+    if field == "SHAPE@WKB":
+        shape = row[SHAPE_FIELD]
+        return None if shape is None else bytearray(shapely.to_wkb(shape))
+    if field == "SHAPE@XY":
+        shape = row[SHAPE_FIELD]
+        if shape is None:
+            return None
+        centroid = shape.centroid
+        return (centroid.x, centroid.y)
+    if field in ("Shape_Area", "SHAPE@AREA"):
+        shape = row[SHAPE_FIELD]
+        return None if shape is None else shape.area
+    if field in ("Shape_Length", "SHAPE@LENGTH"):
+        shape = row[SHAPE_FIELD]
+        return None if shape is None else shape.length
+    return row[field]
+
+
+def _set(row, field, value):
+    if field in ("SHAPE@", SHAPE_FIELD):
+        row[SHAPE_FIELD] = value
+    elif field in ("OID@", OID_FIELD, "Shape_Area", "Shape_Length"):
+        return
+    else:
+        row[field] = value
+
+
+class _Cursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class SearchCursor(_Cursor):
+    def __init__(self, in_table, field_names, where_clause=None, **kwargs):
+        if isinstance(field_names, str):
+            field_names = [field_names]
+        self._layer = ws.resolve(in_table)
+        self._fields = list(field_names)
+        self._oids = iter(_where_oids(self._layer, where_clause))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        oid = next(self._oids)
+        row = self._layer.dataset.rows[oid]
+        return tuple(_get(row, oid, f) for f in self._fields)
+
+
+class UpdateCursor(SearchCursor):
+    def __next__(self):
+        self._current = next(self._oids)
+        row = self._layer.dataset.rows[self._current]
+        return [_get(row, self._current, f) for f in self._fields]
+
+    def updateRow(self, values):
+        row = self._layer.dataset.rows[self._current]
+        for field, value in zip(self._fields, values):
+            _set(row, field, value)
+
+    def deleteRow(self):
+        del self._layer.dataset.rows[self._current]
+
+
+class InsertCursor(_Cursor):
+    def __init__(self, in_table, field_names, **kwargs):
+        self._dataset = ws.resolve(in_table).dataset
+        self._fields = list(field_names)
+
+    def insertRow(self, values):
+        row = {}
+        for field, value in zip(self._fields, values):
+            _set(row, field, value)
+        return self._dataset.insert(row)
+
+
+class Editor:
+    def __init__(self, workspace):
+        self.workspace = workspace
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def startEditing(self, with_undo=True, multiuser_mode=True):
+        pass
+
+    def stopEditing(self, save_changes=True):
+        pass
+
+    def startOperation(self):
+        pass
+
+    def stopOperation(self):
+        pass
+
+    def abortOperation(self):
+        pass
+
+
+# ---- arcpy.management ----------------------------------------------------
+
+def _tool(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if tool_latency:
+            time.sleep(tool_latency)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@_tool
+def GetCount(in_rows):
+    return Result(len(ws.resolve(in_rows).oids()))
+
+
+def _copy_rows(source, target, oids):
+    names = set(target.field_names())
+    for oid in oids:
+        target.insert({k: v for k, v in source.dataset.rows[oid].items()
+                       if k in names})
+
+
+@_tool
+def CopyFeatures(in_features, out_feature_class, **kwargs):
+    source = ws.resolve(in_features)
+    target = ws.create(out_feature_class, source.dataset.fields)
+    _copy_rows(source, target, source.oids())
+    return Result(out_feature_class)
+
+
+@_tool
+def CreateFeatureclass(out_path, out_name, geometry_type=None, template=None,
+                       spatial_reference=None, **kwargs):
+    path = f"{out_path}\\{out_name}" if out_path else out_name
+    fields = ws.resolve(template).dataset.fields if template else ()
+    ws.create(path, fields)
+    return Result(path)
+
+
+@_tool
+def MakeFeatureLayer(in_features, out_layer, where_clause=None, **kwargs):
+    source = ws.resolve(in_features)
+    oids = _where_oids(source, where_clause) if where_clause else None
+    ws.layers[str(out_layer)] = Layer(str(out_layer), source.dataset, oids)
+    return Result(out_layer)
+
+
+@_tool
+def Delete(in_data, **kwargs):
+    name = str(in_data)
+    if name in ws.layers:
+        del ws.layers[name]
+    else:
+        ws.datasets.pop(_norm(name), None)
+    return Result(True)
+
+
+@_tool
+def Append(inputs, target, schema_type="TEST", **kwargs):
+    if isinstance(inputs, (list, tuple)):
+        sources = [ws.resolve(i) for i in inputs]
+    else:
+        sources = [ws.resolve(i) for i in str(inputs).split(";")]
+    target_ds = ws.resolve(target).dataset
+    for source in sources:
+        _copy_rows(source, target_ds, source.oids())
+    return Result(target)
+
+
+@_tool
+def DeleteRows(in_rows):
+    layer = ws.resolve(in_rows)
+    for oid in layer.oids():
+        del layer.dataset.rows[oid]
+    layer.selection = None
+    return Result(in_rows)
+
+
+@_tool
+def TruncateTable(in_table):
+    ws.resolve(in_table).dataset.rows.clear()
+    return Result(in_table)
+
+
+def _field_type(field_type):
+    return {"TEXT": "String", "SHORT": "SmallInteger", "LONG": "Integer",
+            "DOUBLE": "Double", "FLOAT": "Single", "DATE": "Date",
+            "BIGINTEGER": "BigInteger"}.get(str(field_type).upper(),
+                                            field_type)
+
+
+def _add_field(dataset, field_name, field_type, field_length=None):
+    if field_name not in dataset.field_names():
+        dataset.fields.append(Field(field_name, _field_type(field_type),
+                                    field_length or 255))
+        for row in dataset.rows.values():
+            row[field_name] = None
+
+
+@_tool
+def AddField(in_table, field_name, field_type, field_precision=None,
+             field_scale=None, field_length=None, **kwargs):
+    _add_field(ws.resolve(in_table).dataset, field_name, field_type,
+               field_length)
+    return Result(in_table)
+
+
+@_tool
+def AddFields(in_table, field_description, **kwargs):
+    dataset = ws.resolve(in_table).dataset
+    for desc in field_description:
+        name, ftype = desc[0], desc[1]
+        length = desc[3] if len(desc) > 3 and desc[3] else None
+        _add_field(dataset, name, ftype, length)
+    return Result(in_table)
+
+
+@_tool
+def DeleteField(in_table, drop_field, **kwargs):
+    dataset = ws.resolve(in_table).dataset
+    if isinstance(drop_field, str):
+        drop_field = drop_field.split(";")
+    drop = set(drop_field)
+    dataset.fields = [f for f in dataset.fields if f.name not in drop]
+    for row in dataset.rows.values():
+        for name in drop:
+            row.pop(name, None)
+    return Result(in_table)
+
+
+@_tool
+def CalculateField(in_table, field, expression, expression_type="PYTHON3",
+                   **kwargs):
+    layer = ws.resolve(in_table)
+    value = ast.literal_eval(str(expression))
+    if field not in layer.dataset.field_names():
+        AddField(in_table, field,
+                 "TEXT" if isinstance(value, str) else "LONG")
+    for oid in layer.oids():
+        layer.dataset.rows[oid][field] = value
+    return Result(in_table)
+
+
+@_tool
+def SelectLayerByAttribute(in_layer_or_view, selection_type="NEW_SELECTION",
+                           where_clause=None, **kwargs):
+    layer = ws.resolve(in_layer_or_view)
+    name = str(in_layer_or_view)
+    if name not in ws.layers:
+        ws.layers[name] = layer
+    if selection_type == "CLEAR_SELECTION":
+        layer.selection = None
+    else:
+        layer.selection = None
+        layer.selection = _where_oids(layer, where_clause)
+    return Result(name, len(layer.oids()))
+
+
+@_tool
+def SelectLayerByLocation(in_layer, overlap_type="INTERSECT",
+                          select_features=None, search_distance=None,
+                          selection_type="NEW_SELECTION", **kwargs):
+    if overlap_type != "WITHIN":
+        raise NotImplementedError(f"Unsupported overlap type {overlap_type}")
+    layer = ws.resolve(in_layer)
+    name = str(in_layer)
+    if name not in ws.layers:
+        ws.layers[name] = layer
+    selectors = ws.resolve(select_features)
+    shapes = [selectors.dataset.rows[o][SHAPE_FIELD]
+              for o in selectors.oids()]
+    target = shapely.union_all(shapes)
+    shapely.prepare(target)
+    layer.selection = None
+    rows = layer.dataset.rows
+    layer.selection = [o for o in layer.oids()
+                       if target.contains(rows[o][SHAPE_FIELD])]
+    return Result(name, len(layer.selection))
+
+
+# ---- arcpy.conversion ----------------------------------------------------
+
+@_tool
+def ExportFeatures(in_features, out_features, **kwargs):
+    return CopyFeatures(in_features, out_features)
+
+
+def install():
+    """
+    Registers the fake modules as arcpy in sys.modules and returns them
+
+    Call this before importing anything from Scripts/.
+    """
+    arcpy = types.ModuleType("arcpy")
+    management = types.ModuleType("arcpy.management")
+    da = types.ModuleType("arcpy.da")
+    conversion = types.ModuleType("arcpy.conversion")
+
+    module = sys.modules[__name__]
+    for name in ["ExecuteError", "ValueTable", "Describe", "ListFields",
+                 "Exists", "AddFieldDelimiters", "FromWKT", "FromWKB", "AddMessage",
+                 "AddWarning", "AddError", "GetInstallInfo", "env"]:
+        setattr(arcpy, name, getattr(module, name))
+    for name in ["GetCount", "CopyFeatures", "CreateFeatureclass",
+                 "MakeFeatureLayer", "Delete", "Append", "DeleteRows",
+                 "TruncateTable", "AddField", "AddFields", "DeleteField",
+                 "CalculateField", "SelectLayerByAttribute",
+                 "SelectLayerByLocation"]:
+        setattr(management, name, getattr(module, name))
+    for name in ["SearchCursor", "UpdateCursor", "InsertCursor", "Editor"]:
+        setattr(da, name, getattr(module, name))
+    conversion.ExportFeatures = ExportFeatures
+
+    arcpy.management = management
+    arcpy.da = da
+    arcpy.conversion = conversion
+    sys.modules.update({"arcpy": arcpy, "arcpy.management": management,
+                        "arcpy.da": da, "arcpy.conversion": conversion})
+    return arcpy
+
+
+def reset():
+    """
+    Forgets every dataset and layer
+    """
+    ws.datasets.clear()
+    ws.layers.clear()
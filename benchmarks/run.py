@@ -0,0 +1,191 @@
+"""
+Benchmarks for the OUG pipeline on synthetic condo layouts
+
+For each size, generates a layout with that many unit parcels, loads it
+into the fake arcpy workspace and runs Batch Common Parcel to OUG over
+it once per --workers count, reporting wall time, peak Python memory,
+OUGs per second and the per-stage timings recorded by ouglog. With --single-limit, sizes up to
+that limit are also run through Common Parcel to OUG one common parcel
+at a time, the way the tool was used by hand, for comparison.
+
+    python -m benchmarks.run --sizes 10 100 1000 --json results.json
+    python -m benchmarks.run --sizes 10000 --workers 1 2 4 8
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import fakearcpy, synthetic
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "Scripts")
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+COMMON_LAYER = "Common Parcels"
+UNIT_LAYER = "Unit Parcels"
+
+
+def _import_scripts():
+    """
+    Installs the fake arcpy and imports the tools on top of it
+
+    The log goes to a temporary file so benchmarks don't fill up
+    the real one, and the geometry cache is off so every run does the
+    geometry work it is timing. So is the spatial index, since every
+    run starts from a freshly loaded layer; point OUG_SPATIAL_INDEX at
+    a directory to time it too.
+    """
+    fakearcpy.install()
+    os.environ.setdefault("OUG_LOGFILE", os.path.join(
+        tempfile.gettempdir(), "oug_benchmark_log.jsonl"))
+    os.environ.setdefault("OUG_GEOMCACHE", "")
+    os.environ.setdefault("OUG_SPATIAL_INDEX", "")
+    if SCRIPTS not in sys.path:
+        sys.path.insert(0, SCRIPTS)
+    import batch_common_to_oug
+    import common_to_oug
+    import ouglog
+    return batch_common_to_oug, common_to_oug, ouglog
+
+
+def field_ops_table(ops):
+    """
+    Returns a ValueTable like the tool's field map parameter
+    """
+    vt = fakearcpy.ValueTable(2)
+    for field, op in ops.items():
+        vt.addRow([fakearcpy.FieldValue(field), op])
+    return vt
+
+
+def load_layout(layout):
+    """
+    Loads a layout into a fresh fake workspace as two layers
+    """
+    fakearcpy.reset()
+    fakearcpy.ws.load(r"lir.gdb\commons", layout.commons, layout.fields)
+    fakearcpy.ws.load(r"lir.gdb\units", layout.units, layout.fields)
+    fakearcpy.MakeFeatureLayer(r"lir.gdb\commons", COMMON_LAYER)
+    fakearcpy.MakeFeatureLayer(r"lir.gdb\units", UNIT_LAYER)
+
+
+def count_ougs():
+    rows = fakearcpy.ws.datasets[r"lir.gdb\units"].rows.values()
+    return sum(1 for row in rows if row.get("IS_OUG") == 1)
+
+
+def _measure(func, ouglog):
+    """
+    Runs func, returning wall time, peak memory and stage timings
+    """
+    ouglog.log.reset_timings()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ouglog.log.flush()
+    return elapsed, peak, ouglog.log.summary()
+
+
+def bench_batch(layout, modules, workers=1):
+    batch, _, ouglog = modules
+    load_layout(layout)
+    ops = field_ops_table(layout.field_ops)
+    elapsed, peak, stages = _measure(
+        lambda: batch.script_tool(COMMON_LAYER, UNIT_LAYER, ops,
+                                  workers=workers, journal_path=None),
+        ouglog)
+    return elapsed, peak, stages, count_ougs()
+
+
+def bench_single(layout, modules):
+    _, single, ouglog = modules
+    load_layout(layout)
+    ops = field_ops_table(layout.field_ops)
+    common_oids = list(fakearcpy.ws.resolve(COMMON_LAYER).oids())
+
+    stages = {}
+
+    def run():
+        for oid in common_oids:
+            fakearcpy.SelectLayerByAttribute(COMMON_LAYER, "NEW_SELECTION",
+                                             f"OBJECTID = {oid}")
+            single.script_tool(COMMON_LAYER, UNIT_LAYER, ops)
+            # Each tool run resets the timings, so add them up here
+            for name, s in ouglog.log.summary().items():
+                total = stages.setdefault(name, {"count": 0, "total": 0.0,
+                                                 "max": 0.0})
+                total["count"] += s["count"]
+                total["total"] += s["total"]
+                total["max"] = max(total["max"], s["max"])
+
+    elapsed, peak, _ = _measure(run, ouglog)
+    for s in stages.values():
+        s["mean"] = s["total"] / s["count"]
+    return elapsed, peak, stages, count_ougs()
+
+
+def report(tool, size, layout, result):
+    elapsed, peak, stages, ougs = result
+    rate = ougs / elapsed if elapsed else float("inf")
+    print(f"{tool:>6} {size:>8} units {len(layout.commons):>6} commons  "
+          f"{elapsed:9.2f}s  {peak / 2**20:9.1f} MiB peak  "
+          f"{rate:9.1f} OUGs/s")
+    for name, s in sorted(stages.items(), key=lambda i: -i[1]["total"]):
+        print(f"{'':>16}{name:<20} {s['total']:9.3f}s total  "
+              f"{s['mean'] * 1000:9.2f}ms mean  x{s['count']}")
+    return {"tool": tool, "units": size, "commons": len(layout.commons),
+            "ougs": ougs, "seconds": elapsed, "peak_bytes": peak,
+            "ougs_per_second": rate, "stages": stages}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="unit parcel counts to benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extra-fields", type=int, default=50,
+                        help="constant filler fields per feature")
+    parser.add_argument("--single-limit", type=int, default=0,
+                        help="also run Common Parcel to OUG per common "
+                             "parcel for sizes up to this many units")
+    parser.add_argument("--tool-latency", type=float, default=0.0,
+                        help="seconds of overhead to add to every "
+                             "geoprocessing tool call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="worker process counts to run the batch "
+                             "tool with")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+    fakearcpy.tool_latency = args.tool_latency
+
+    modules = _import_scripts()
+    results = []
+    for size in args.sizes:
+        layout = synthetic.generate(size, seed=args.seed,
+                                    extra_fields=args.extra_fields)
+        for workers in args.workers:
+            tool = "batch" if workers == 1 else f"x{workers}"
+            results.append(report(tool, size, layout,
+                                  bench_batch(layout, modules, workers)))
+        if size <= args.single_limit:
+            results.append(report("single", size, layout,
+                                  bench_single(layout, modules)))
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Synthetic condo parcel generator
+
+Builds layouts like the one in Condo.png: each common parcel is a lot
+with holes where its unit parcels sit, and the unit parcels inside are
+stacks of identical rectangles (one per floor) plus small circular
+units nested in some of the rectangles, a few of which poke outside
+the common parcel. Single-family parcels outside any common parcel fill
+out the unit parcel layer.
+
+Features are (shapely geometry, attribute dictionary) pairs, and every
+layout comes with its field schema and a field map that makes the
+varying fields valid for create_dissolve_stats().
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import random
+from collections import namedtuple
+
+from shapely.geometry import Point, Polygon, box
+from shapely.ops import unary_union
+
+Layout = namedtuple("Layout", ["commons", "units", "fields", "field_ops"])
+
+# (name, type, length) for the fields every layout has
+BASE_FIELDS = [
+    ("PARCEL_ID", "String", 20),
+    ("UNIT_COUNT", "Integer", 4),
+    ("TOTAL_MKT_VALUE", "Double", 8),
+    ("BLDG_SQFT", "Integer", 4),
+    ("COUNTY_NAME", "String", 20),
+    ("PROP_CLASS", "String", 30),
+    ("SUBDIV_NAME", "String", 60),
+    ("BUILT_YR", "SmallInteger", 2),
+    ("IS_OUG", "SmallInteger", 2),
+    ("PROCESSOR", "String", 255),
+    ("SUBPROCESSOR", "String", 255),
+    ("SUBTYPE", "String", 50),
+    ("COMPLETE", "SmallInteger", 2),
+]
+
+# Operations for the fields that vary between units
+BASE_OPS = {
+    "PARCEL_ID": "FIRST",
+    "UNIT_COUNT": "SUM",
+    "TOTAL_MKT_VALUE": "SUM",
+    "BLDG_SQFT": "SUM",
+}
+
+EXTRA_TYPES = ["String", "Integer", "Double", "SmallInteger"]
+
+LOT_SIZE = 100.0
+SPACING = 120.0
+
+
+def _extra_fields(count, rng):
+    """
+    Returns count extra (name, type, length) fields of mixed types,
+    to stand in for the 60+ fields of an LIR layer
+    """
+    return [(f"EXTRA_{i:02d}", rng.choice(EXTRA_TYPES), 50)
+            for i in range(count)]
+
+
+def _value(field_type, rng):
+    if field_type == "String":
+        return f"V{rng.randrange(1000)}"
+    if field_type == "Double":
+        return round(rng.uniform(0, 1e6), 2)
+    return rng.randrange(100)
+
+
+def _constant_attrs(fields, rng, subdiv):
+    """
+    Returns attributes shared by every feature in one common parcel
+    """
+    attrs = {name: _value(ftype, rng) for name, ftype, _ in fields
+             if name.startswith("EXTRA_")}
+    attrs.update({
+        "COUNTY_NAME": "Synthetic",
+        "PROP_CLASS": "Residential",
+        "SUBDIV_NAME": subdiv,
+        "BUILT_YR": rng.randrange(1950, 2024),
+        "IS_OUG": 0,
+        "PROCESSOR": None,
+        "SUBPROCESSOR": None,
+        "SUBTYPE": None,
+        "COMPLETE": 0,
+    })
+    return attrs
+
+
+def _condo(origin, units_wanted, rng, counters, fields, poke_ratio):
+    """
+    Returns (common, units) for one condo lot at origin
+    """
+    x0, y0 = origin
+    base = _constant_attrs(fields, rng, f"CONDO {counters['common']}")
+
+    # One to three building footprints side by side
+    footprints = []
+    building_count = rng.randint(1, 3)
+    width = (LOT_SIZE - 20) / building_count
+    for b in range(building_count):
+        bx = x0 + 10 + b * width
+        footprints.append(box(bx + 2, y0 + 10, bx + width - 2,
+                              y0 + LOT_SIZE - 10))
+
+    units = []
+    while len(units) < units_wanted:
+        fp = footprints[len(units) % len(footprints)]
+        attrs = dict(base)
+        attrs.update({
+            "PARCEL_ID": f"U{counters['unit']:08d}",
+            "UNIT_COUNT": 1,
+            "TOTAL_MKT_VALUE": round(rng.uniform(1.5e5, 6e5), 2),
+            "BLDG_SQFT": rng.randrange(500, 2500),
+        })
+        counters["unit"] += 1
+
+        if rng.random() < 0.2:
+            # A circular unit nested in its stack's footprint
+            cx = rng.uniform(fp.bounds[0] + 4, fp.bounds[2] - 4)
+            cy = rng.uniform(fp.bounds[1] + 4, fp.bounds[3] - 4)
+            geom = Point(cx, cy).buffer(3, quad_segs=8)
+            if rng.random() < poke_ratio:
+                # Mostly, but not entirely, inside the common parcel
+                geom = Point(x0 + 1, cy).buffer(3, quad_segs=8)
+        else:
+            geom = fp
+        units.append((geom, attrs))
+
+    # The common parcel has a hole wherever a footprint is,
+    # and sometimes a small island part in the middle of one
+    lot = box(x0, y0, x0 + LOT_SIZE, y0 + LOT_SIZE)
+    common_geom = Polygon(lot.exterior.coords,
+                          [fp.exterior.coords for fp in footprints])
+    if rng.random() < 0.3:
+        c = footprints[0].centroid
+        common_geom = unary_union([common_geom,
+                                   box(c.x - 1, c.y - 1, c.x + 1, c.y + 1)])
+
+    common_attrs = dict(base)
+    common_attrs.update({
+        "PARCEL_ID": f"C{counters['common']:08d}",
+        "UNIT_COUNT": 0,
+        "TOTAL_MKT_VALUE": 0.0,
+        "BLDG_SQFT": 0,
+    })
+    counters["common"] += 1
+    return (common_geom, common_attrs), units
+
+
+def generate(unit_count, seed=0, units_per_common=(4, 300),
+             single_family_ratio=0.2, extra_fields=50, poke_ratio=0.05):
+    """
+    Returns a Layout with about unit_count unit parcels
+
+    Parameter unit_count: the number of unit parcels to generate
+    Condition: a positive integer
+
+    Parameter seed: the random seed, so runs are repeatable
+    Condition: an integer
+
+    Parameter units_per_common: the smallest and largest condo
+    Condition: a (min, max) tuple of positive integers
+
+    Parameter single_family_ratio: the share of the unit parcel layer
+                                   that isn't in any common parcel
+    Condition: a number between 0 and 1
+
+    Parameter extra_fields: the number of constant filler fields
+    Condition: a non-negative integer
+
+    Parameter poke_ratio: the share of circular units that stick out
+                          of their common parcel
+    Condition: a number between 0 and 1
+    """
+    rng = random.Random(seed)
+    fields = BASE_FIELDS + _extra_fields(extra_fields, rng)
+    counters = {"common": 0, "unit": 0}
+
+    commons = []
+    units = []
+    condo_units = int(unit_count * (1 - single_family_ratio))
+    single_family = unit_count - condo_units
+    lots = []
+
+    while condo_units > 0:
+        wanted = min(condo_units, rng.randint(*units_per_common))
+        lots.append(("condo", wanted))
+        condo_units -= wanted
+    lots.extend(("single", 1) for _ in range(single_family))
+    rng.shuffle(lots)
+
+    columns = max(1, int(len(lots) ** 0.5))
+    for i, (kind, wanted) in enumerate(lots):
+        origin = ((i % columns) * SPACING, (i // columns) * SPACING)
+        if kind == "condo":
+            common, condo = _condo(origin, wanted, rng, counters, fields,
+                                   poke_ratio)
+            commons.append(common)
+            units.extend(condo)
+        else:
+            attrs = _constant_attrs(fields, rng, "SINGLE FAMILY")
+            attrs.update({
+                "PARCEL_ID": f"U{counters['unit']:08d}",
+                "UNIT_COUNT": 1,
+                "TOTAL_MKT_VALUE": round(rng.uniform(3e5, 9e5), 2),
+                "BLDG_SQFT": rng.randrange(1000, 4000),
+            })
+            counters["unit"] += 1
+            x0, y0 = origin
+            units.append((box(x0 + 5, y0 + 5, x0 + 60, y0 + 90), attrs))
+
+    return Layout(commons, units, fields, dict(BASE_OPS))
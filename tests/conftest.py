@@ -0,0 +1,30 @@
+"""
+Runs the tests on the fake arcpy in benchmarks/fakearcpy.py
+
+The scripts import each other by module name, so Scripts goes on
+sys.path, and the log, geometry cache and spatial index are kept out
+of the real ones next to the scripts.
+
+Organization: Wasatch Front Regional Council
+Version: October 18, 2026
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "Scripts")
+
+for path in (ROOT, SCRIPTS):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault("OUG_LOGFILE", os.path.join(
+    tempfile.gettempdir(), "oug_test_log.jsonl"))
+os.environ.setdefault("OUG_GEOMCACHE", "")
+os.environ.setdefault("OUG_SPATIAL_INDEX", "")
+
+from benchmarks import fakearcpy  # noqa: E402
+
+fakearcpy.install()
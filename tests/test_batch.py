@@ -0,0 +1,125 @@
+"""
+Batch Common Parcel to OUG end to end on the fake arcpy
+"""
+
+import pytest
+import shapely
+
+from benchmarks import fakearcpy, run, synthetic
+
+import batch_common_to_oug as bc
+import checkpoint as ck
+
+UNITS = r"lir.gdb\units"
+
+
+def _ougs():
+    """
+    Returns the OUGs in the unit dataset, comparable across runs
+    """
+    out = []
+    for row in fakearcpy.ws.datasets[UNITS].rows.values():
+        if row.get("IS_OUG") != 1:
+            continue
+        attrs = tuple(sorted((k, str(v)) for k, v in row.items()
+                             if k not in (fakearcpy.SHAPE_FIELD,
+                                          fakearcpy.OID_FIELD)))
+        out.append((round(row[fakearcpy.SHAPE_FIELD].area, 3), attrs))
+    return sorted(out)
+
+
+def _oug_oids():
+    return {oid for oid, row in fakearcpy.ws.datasets[UNITS].rows.items()
+            if row.get("IS_OUG") == 1}
+
+
+def _run(layout, **kwargs):
+    run.load_layout(layout)
+    kwargs.setdefault("journal_path", None)
+    bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER,
+                   run.field_ops_table(layout.field_ops), **kwargs)
+    return _ougs(), len(fakearcpy.ws.datasets[UNITS].rows)
+
+
+@pytest.fixture(scope="module")
+def layout():
+    return synthetic.generate(1500, seed=1)
+
+
+def test_every_common_parcel_becomes_an_oug(layout):
+    ougs, rows = _run(layout)
+    assert len(ougs) == len(layout.commons)
+    merged = sum(1 for row in fakearcpy.ws.datasets[UNITS].rows.values()
+                 if row.get("IS_OUG") != 1)
+    assert rows == merged + len(ougs)
+
+
+def test_serial_and_parallel_agree(layout):
+    assert _run(layout, workers=1) == _run(layout, workers=2)
+
+
+def test_resume_after_crash_between_edit_and_journal(layout, tmp_path,
+                                                     monkeypatch):
+    expected = _run(layout, workers=1, batch_size=3)
+    journal = str(tmp_path / "journal.sqlite")
+    record = ck.Journal.record
+    calls = []
+
+    def crash(self, entries, outputs):
+        calls.append(entries)
+        if len(calls) == 2:
+            raise RuntimeError("crash")
+        record(self, entries, outputs)
+
+    monkeypatch.setattr(ck.Journal, "record", crash)
+    run.load_layout(layout)
+    ops = run.field_ops_table(layout.field_ops)
+    with pytest.raises(RuntimeError):
+        bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER, ops, batch_size=3,
+                       journal_path=journal)
+    monkeypatch.setattr(ck.Journal, "record", record)
+    saved = _oug_oids()
+    assert len(saved) == 6
+
+    # The second batch was saved but never recorded; it mustn't be
+    # merged again, so its OUGs are still there after resuming
+    fakearcpy.SelectLayerByAttribute(run.COMMON_LAYER, "CLEAR_SELECTION")
+    bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER, ops, batch_size=3,
+                   journal_path=journal)
+    assert saved <= _oug_oids()
+    assert (_ougs(), len(fakearcpy.ws.datasets[UNITS].rows)) == expected
+
+
+def test_rerun_merges_units_added_under_merged_commons(layout, tmp_path):
+    journal = str(tmp_path / "journal.sqlite")
+    run.load_layout(layout)
+    ops = run.field_ops_table(layout.field_ops)
+    bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER, ops,
+                   journal_path=journal)
+    before = _oug_oids()
+
+    # A new vintage adds a unit inside one merged common parcel, whose
+    # own shape doesn't change
+    units = fakearcpy.ws.datasets[UNITS]
+    target = min(before)
+    attrs = dict(units.rows[target], IS_OUG=None, PROCESSOR=None,
+                 SUBPROCESSOR=None)
+    x, y = shapely.point_on_surface(attrs[fakearcpy.SHAPE_FIELD]).coords[0]
+    attrs[fakearcpy.SHAPE_FIELD] = shapely.box(x - 0.1, y - 0.1,
+                                               x + 0.1, y + 0.1)
+    added = units.insert(attrs)
+
+    fakearcpy.SelectLayerByAttribute(run.COMMON_LAYER, "CLEAR_SELECTION")
+    bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER, ops,
+                   journal_path=journal)
+    after = _oug_oids()
+    # Only that common parcel was merged again, taking the new unit
+    assert added not in units.rows and target not in units.rows
+    assert after - before and len(after) == len(before)
+    assert before - {target} <= after
+
+    # And with nothing new, a third run does nothing
+    fakearcpy.SelectLayerByAttribute(run.COMMON_LAYER, "CLEAR_SELECTION")
+    bc.script_tool(run.COMMON_LAYER, run.UNIT_LAYER, ops,
+                   journal_path=journal)
+    assert _oug_oids() == after
@@ -0,0 +1,91 @@
+"""
+Checkpoint journal: what is skipped, redone and settled after a crash
+"""
+
+import sqlite3
+
+import shapely
+
+import checkpoint as ck
+
+
+def test_geometry_hash_follows_the_shape():
+    box = shapely.box(0, 0, 1, 1)
+    assert ck.geometry_hash(box) == ck.geometry_hash(box.wkb)
+    assert ck.geometry_hash(box) != ck.geometry_hash(shapely.box(0, 0, 1, 2))
+
+
+def test_pending_skips_recorded_commons(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    # Merged, each common parcel holds only its OUG
+    contents = {1: [500], 2: [501]}
+    with ck.Journal("commons", "v1", path) as journal:
+        journal.record([(1, "a", [10, 11]), (2, "b", [12])], [[500], [501]])
+        hashes = [(1, "a"), (2, "changed"), (3, "c")]
+        assert journal.known(hashes) == [1]
+        assert journal.pending(hashes, contents) == [2, 3]
+
+    # Another processor version, or another layer, starts over
+    with ck.Journal("commons", "v2", path) as journal:
+        assert journal.pending([(1, "a")], contents) == [1]
+    with ck.Journal("other", "v1", path) as journal:
+        assert journal.pending([(1, "a")], contents) == [1]
+
+
+def test_new_unit_under_a_merged_common(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    with ck.Journal("commons", "v1", path) as journal:
+        journal.record([(1, "a", [10, 11]), (2, "b", [12])], [[500], [501]])
+        # A new vintage adds a unit inside common parcel 1, and replaces
+        # common parcel 2's OUG, without changing either shape
+        contents = {1: [500, 900], 2: [902]}
+        assert journal.pending([(1, "a"), (2, "b")], contents) == [1, 2]
+        assert journal.pending([(1, "a"), (2, "b")],
+                               {1: [500], 2: [501]}) == []
+
+
+def test_forget(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    with ck.Journal("commons", "v1", path) as journal:
+        journal.record([(1, "a", [10])], [[500]])
+        journal.forget()
+        assert journal.pending([(1, "a")], {1: [500]}) == [1]
+
+
+def test_in_flight_until_committed(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    hashes = [(1, "a"), (2, "b")]
+    contents = {1: [500], 2: [501]}
+    with ck.Journal("commons", "v1", path) as journal:
+        journal.begin([(1, "a", [10, 11]), (2, "b", [12])])
+        assert journal.in_flight() == {1: [10, 11], 2: [12]}
+        assert journal.known(hashes) == [1, 2]
+        assert journal.pending(hashes, contents) == [1, 2]
+
+        journal.record([(1, "a", [10, 11])], [[500]])
+        assert journal.in_flight() == {2: [12]}
+
+        # Found saved after a crash between the edit and record()
+        journal.settle({2: [501]})
+        assert journal.in_flight() == {}
+        assert journal.pending(hashes, contents) == []
+
+
+def test_journal_without_new_columns(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE commons (source TEXT NOT NULL, "
+               "oid INTEGER NOT NULL, geometry_hash TEXT NOT NULL, "
+               "unit_oids TEXT NOT NULL, processor TEXT NOT NULL, "
+               "completed_at TEXT NOT NULL, PRIMARY KEY (source, oid))")
+    db.execute("INSERT INTO commons VALUES "
+               "('commons', 1, 'a', '[10]', 'v1', 'then')")
+    db.commit()
+    db.close()
+
+    with ck.Journal("commons", "v1", path) as journal:
+        # Rows without a contents digest only compare the shape
+        assert journal.pending([(1, "a"), (2, "b")], {1: [500]}) == [2]
+        journal.record([(2, "b", [12])], [[501]])
+        assert journal.pending([(1, "a"), (2, "b")],
+                               {1: [500], 2: [501]}) == []
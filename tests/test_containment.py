@@ -0,0 +1,73 @@
+"""
+Containment join and packed R-tree against brute force
+"""
+
+import numpy as np
+import pytest
+import shapely
+
+import containment as cn
+import spatialindex as si
+
+
+def _random_boxes(rng, n, size=1000.0, largest=20.0):
+    corners = rng.random((n, 2)) * size
+    return np.hstack([corners, corners + rng.random((n, 2)) * largest])
+
+
+@pytest.mark.parametrize("node_size", [2, 4, 16])
+def test_rtree_query_matches_brute_force(node_size):
+    rng = np.random.default_rng(0)
+    boxes = _random_boxes(rng, 2000)
+    tree = si.PackedRTree(boxes, node_size)
+    for xmin, ymin in rng.random((50, 2)) * 1000:
+        query = (xmin, ymin, xmin + 60, ymin + 60)
+        expected = np.flatnonzero(
+            (boxes[:, 0] <= query[2]) & (boxes[:, 2] >= query[0])
+            & (boxes[:, 1] <= query[3]) & (boxes[:, 3] >= query[1]))
+        assert tree.query(query).tolist() == expected.tolist()
+
+
+def test_rtree_empty():
+    tree = si.PackedRTree([])
+    assert len(tree) == 0
+    assert tree.query((0, 0, 1, 1)).tolist() == []
+
+
+def _layout(rng):
+    # Apart, since a unit inside two common parcels goes to one of them
+    commons = [shapely.box(x, y, x + 50, y + 50)
+               for x in range(0, 1000, 100) for y in range(0, 400, 100)]
+    units = [shapely.box(x, y, x + 4, y + 4)
+             for x, y in rng.random((3000, 2)) * 1000]
+    return commons, units
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 1.5])
+def test_containment_join_matches_brute_force(tolerance):
+    rng = np.random.default_rng(1)
+    commons, units = _layout(rng)
+    commons[3] = None
+    units[7] = None
+    unit_ids = [100 + i for i in range(len(units))]
+    join = cn.containment_join(commons, units, unit_ids=unit_ids,
+                               tolerance=tolerance)
+
+    for i, common in enumerate(commons):
+        if common is None:
+            assert len(join.units_of(i)) == 0
+            continue
+        container = common.buffer(tolerance) if tolerance else common
+        expected = [unit_ids[u] for u, unit in enumerate(units)
+                    if unit is not None and container.contains(unit)]
+        assert sorted(join.units_of(i).tolist()) == expected
+
+
+def test_overlapping_commons_give_units_to_the_smallest():
+    big = shapely.box(0, 0, 100, 100)
+    small = shapely.box(0, 0, 20, 20)
+    units = [shapely.box(1, 1, 2, 2), shapely.box(50, 50, 51, 51)]
+    join = cn.containment_join([big, small], units,
+                               common_ids=["big", "small"])
+    assert join.owners() == {0: "small", 1: "big"}
+    assert join.counts.tolist() == [1, 1]
@@ -0,0 +1,50 @@
+"""
+Hole filling against what Eliminate Polygon Part (CONTAINED_ONLY) does
+"""
+
+import shapely
+
+import eliminate as el
+
+OUTER = [(0, 0), (100, 0), (100, 100), (0, 100)]
+# 25% of the outer area: kept at 20%, removed at 30%
+LARGE_HOLE = [(10, 10), (60, 10), (60, 60), (10, 60)]
+SMALL_HOLE = [(70, 70), (80, 70), (80, 80), (70, 80)]
+
+
+def _holes(geom):
+    return sorted(shapely.get_num_interior_rings(
+        shapely.get_parts(geom)).tolist())
+
+
+def test_small_holes_are_filled():
+    poly = shapely.Polygon(OUTER, [LARGE_HOLE, SMALL_HOLE])
+    kept, = el.eliminate_polygon_parts([poly], 20)
+    filled, = el.eliminate_polygon_parts([poly], 30)
+    assert _holes(kept) == [1]
+    assert kept.area == 10000 - 2500
+    assert _holes(filled) == [0]
+    assert filled.area == 10000
+
+
+def test_islands_go_only_with_their_hole():
+    poly = shapely.Polygon(OUTER, [LARGE_HOLE, SMALL_HOLE])
+    in_large = shapely.box(20, 20, 30, 30)
+    in_small = shapely.box(72, 72, 78, 78)
+    geom = shapely.MultiPolygon([poly, in_large, in_small])
+
+    cleaned, = el.eliminate_polygon_parts([geom], 20)
+    parts = shapely.get_parts(cleaned)
+    assert len(parts) == 2
+    assert any(part.equals(in_large) for part in parts)
+
+
+def test_separate_parts_are_kept():
+    geom = shapely.MultiPolygon([shapely.box(0, 0, 10, 10),
+                                 shapely.box(20, 0, 21, 1)])
+    cleaned, = el.eliminate_polygon_parts([geom], 90)
+    assert len(shapely.get_parts(cleaned)) == 2
+
+
+def test_none_stays_none():
+    assert el.eliminate_polygon_parts([None], 90) == [None]
@@ -0,0 +1,42 @@
+"""
+Geometry cache: storing, and where it goes when it can't be opened
+"""
+
+import os
+
+import shapely
+
+import geomcache as gm
+
+
+def test_store_and_lookup(tmp_path):
+    cache = gm.GeometryCache().open(str(tmp_path / "cache.sqlite"), "v1")
+    box = shapely.box(0, 0, 1, 1)
+    key = cache.key("union", [gm.digest(gm.to_wkb(box))])
+    cache.store([(key, gm.to_wkb(box))])
+    assert gm.from_wkb(cache.lookup([key])[key], box).equals(box)
+
+    # Other versions never see it
+    cache.open(cache.path, "v2")
+    assert cache.lookup([cache.key("union",
+                                   [gm.digest(gm.to_wkb(box))])]) == {}
+    cache.close()
+
+
+def test_unwritable_default_falls_back(tmp_path, monkeypatch):
+    missing = str(tmp_path / "missing" / "geomcache.sqlite")
+    fallback = str(tmp_path / "geomcache.sqlite")
+    monkeypatch.setattr(gm, "CACHE", missing)
+    monkeypatch.setattr(gm, "FALLBACK", fallback)
+    cache = gm.GeometryCache().open(gm.CACHE, "v1")
+    assert cache.enabled and cache.path == fallback
+    assert os.path.exists(fallback)
+    cache.close()
+
+
+def test_unusable_cache_is_turned_off(tmp_path, capsys):
+    cache = gm.GeometryCache().open(str(tmp_path / "missing" / "c.sqlite"))
+    assert not cache.enabled
+    assert "caching is off" in capsys.readouterr().err
+    assert cache.lookup([b"key"]) == {}
+    cache.store([(b"key", b"wkb")])
@@ -0,0 +1,106 @@
+"""
+Merging common parcels from GeoParquet files, without arcpy
+"""
+
+import json
+
+import pytest
+import shapely
+
+from benchmarks import synthetic
+
+import geoparquet as gp
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+ARROW_TYPES = {"String": pa.string(), "Integer": pa.int32(),
+               "Double": pa.float64(), "SmallInteger": pa.int16()}
+
+
+def _write(path, features, fields, flags=None):
+    """
+    Writes (geometry, attributes) features as a GeoParquet file, with
+    flags as a boolean HAS_GARAGE column if given
+    """
+    columns = {gp.ID_FIELD: pa.array(range(1, len(features) + 1),
+                                     pa.int32())}
+    for name, field_type, _ in fields:
+        columns[name] = pa.array([attrs.get(name) for _, attrs in features],
+                                 ARROW_TYPES[field_type])
+    if flags is not None:
+        columns["HAS_GARAGE"] = pa.array(flags, pa.bool_())
+    columns[gp.GEOMETRY] = pa.array(
+        [shapely.to_wkb(geom) for geom, _ in features], pa.binary())
+    geo = {"version": "1.0.0", "primary_column": gp.GEOMETRY,
+           "columns": {gp.GEOMETRY: {"encoding": "WKB",
+                                     "geometry_types": []}}}
+    table = pa.table(columns).replace_schema_metadata({"geo": json.dumps(geo)})
+    pq.write_table(table, path, row_group_size=100)
+
+
+@pytest.fixture(scope="module")
+def layout():
+    return synthetic.generate(600, seed=3)
+
+
+@pytest.fixture
+def files(layout, tmp_path):
+    commons = str(tmp_path / "commons.parquet")
+    units = str(tmp_path / "units.parquet")
+    _write(commons, layout.commons, layout.fields)
+    # Only some units of each common parcel have a garage
+    _write(units, layout.units, layout.fields,
+           [i % 3 == 0 if i % 7 else None for i in range(len(layout.units))])
+    return commons, units, str(tmp_path / "out.parquet")
+
+
+def test_boolean_columns_are_small_integers(files):
+    _, units, _ = files
+    assert gp.field_type(pa.bool_()) == "SmallInteger"
+    assert gp.field_types(units)["HAS_GARAGE"] == "SmallInteger"
+
+
+def test_merge_commons_round_trip(layout, files):
+    commons, units, out = files
+    field_ops = dict(layout.field_ops, HAS_GARAGE="MAX")
+    oug_count, unit_count = gp.merge_commons(commons, units, out, field_ops,
+                                             batch_rows=250)
+    assert oug_count == len(layout.commons)
+
+    source = pq.read_table(units).to_pylist()
+    table = pq.read_table(out)
+    assert table.schema.field("HAS_GARAGE").type == pa.bool_()
+    assert b"geo" in table.schema.metadata
+    rows = table.to_pylist()
+    ougs = [row for row in rows if row["IS_OUG"] == 1]
+    kept = [row for row in rows if row["IS_OUG"] != 1]
+    assert len(ougs) == oug_count
+    assert len(kept) == len(source) - unit_count
+
+    # Each OUG holds the units that went, and the flag of any of them
+    merged = {row[gp.ID_FIELD] for row in kept} ^ \
+        {row[gp.ID_FIELD] for row in source}
+    gone = [row for row in source if row[gp.ID_FIELD] in merged]
+    points = shapely.point_on_surface(
+        shapely.from_wkb([row[gp.GEOMETRY] for row in gone]))
+    for oug in ougs:
+        geom = shapely.from_wkb(oug[gp.GEOMETRY])
+        inside = [row for row, point in zip(gone, points)
+                  if geom.contains(point)]
+        assert oug["UNIT_COUNT"] == sum(row["UNIT_COUNT"] for row in inside)
+        assert oug["HAS_GARAGE"] is any(row["HAS_GARAGE"] for row in inside)
+        assert oug["PROCESSOR"] == gp.dv.PROCESSOR_VERSION
+    assert sum(len([p for p in points if shapely.from_wkb(
+        oug[gp.GEOMETRY]).contains(p)]) for oug in ougs) == unit_count
+
+    # And the new ids follow the largest unit id
+    assert sorted(oug[gp.ID_FIELD] for oug in ougs) == list(
+        range(len(source) + 1, len(source) + 1 + oug_count))
+
+
+def test_text_operations_on_booleans_are_refused(layout, files):
+    commons, units, out = files
+    field_ops = dict(layout.field_ops, HAS_GARAGE="CONCATENATE")
+    with pytest.raises(ValueError, match="HAS_GARAGE"):
+        gp.merge_commons(commons, units, out, field_ops)
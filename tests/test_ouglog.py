@@ -0,0 +1,37 @@
+"""
+Log file sink: records written in the background, and write failures
+"""
+
+import json
+
+import ouglog as ol
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as log:
+        return [json.loads(line) for line in log]
+
+
+def test_sink_writes_in_order(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    sink = ol.FileSink(path)
+    for i in range(100):
+        sink.write({"i": i})
+    sink.flush()
+    assert [r["i"] for r in _lines(path)] == list(range(100))
+    sink.close()
+
+
+def test_failed_batch_does_not_stop_the_sink(tmp_path, capsys):
+    path = str(tmp_path / "log.jsonl")
+    sink = ol.FileSink(path)
+    # Tuple keys can't be written as JSON, twice
+    sink.write({(1, 2): "bad"})
+    sink.flush()
+    sink.write({(3, 4): "bad"})
+    sink.flush()
+
+    sink.write({"i": 1})
+    sink.close()
+    assert _lines(path) == [{"i": 1}]
+    assert capsys.readouterr().err.count("can't write") == 1
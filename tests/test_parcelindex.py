@@ -0,0 +1,140 @@
+"""
+Saved spatial index: edits through the delta file and compaction
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks import fakearcpy, run, synthetic
+
+import parcelindex as pi
+
+
+def _hashes(oids, boxes):
+    boxes = np.asarray(boxes, dtype="f8").reshape(-1, 4)
+    return pi.row_hashes(oids, boxes[:, 0], boxes[:, 1],
+                         boxes[:, 2], boxes[:, 3])
+
+
+def _boxes(rng, n):
+    corners = rng.random((n, 2)) * 1000
+    return np.hstack([corners, corners + rng.random((n, 2)) * 5])
+
+
+def _expected(live, bbox):
+    return sorted(oid for oid, b in live.items()
+                  if b[0] <= bbox[2] and b[2] >= bbox[0]
+                  and b[1] <= bbox[3] and b[3] >= bbox[1])
+
+
+def test_round_trip_through_delta_and_compaction(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "units.oidx")
+    oids = np.arange(1, 2001)
+    boxes = _boxes(rng, len(oids))
+    hashes = _hashes(oids, boxes)
+    index = pi.ParcelIndex.build(path, "units", oids, boxes, hashes)
+    index.save()
+
+    live = dict(zip(oids.tolist(), boxes))
+    live_hashes = dict(zip(oids.tolist(), hashes))
+    next_oid = len(oids) + 1
+    for step in range(25):
+        deleted = rng.choice(sorted(live), 30, replace=False).tolist()
+        added = np.arange(next_oid, next_oid + 5)
+        next_oid += 5
+        added_boxes = _boxes(rng, 5)
+        added_hashes = _hashes(added, added_boxes)
+        index.update(added, added_boxes, added_hashes, deleted)
+        index.save()
+        for oid in deleted:
+            del live[oid], live_hashes[oid]
+        live.update(zip(added.tolist(), added_boxes))
+        live_hashes.update(zip(added.tolist(), added_hashes))
+
+        index = pi.ParcelIndex.load(path, "units")
+        assert index.fingerprint == pi.fingerprint(
+            np.array(list(live_hashes.values()), dtype=np.uint64))
+        for xmin, ymin in rng.random((10, 2)) * 1000:
+            bbox = (xmin, ymin, xmin + 40, ymin + 40)
+            assert index.query(bbox).tolist() == _expected(live, bbox)
+
+    # The edits have been packed into the tree more than once by now
+    assert len(index.added_ids) + len(index.deleted) \
+        <= pi.COMPACT_FRACTION * len(index.tree)
+    assert isinstance(index.tree.levels[0], np.memmap)
+
+
+def test_load_for_another_dataset(tmp_path):
+    path = str(tmp_path / "units.oidx")
+    pi.ParcelIndex.build(path, "units", [1], [[0, 0, 1, 1]],
+                         _hashes([1], [[0, 0, 1, 1]])).save()
+    assert pi.ParcelIndex.load(path, "units") is not None
+    assert pi.ParcelIndex.load(path, "other") is None
+
+
+@pytest.mark.parametrize("damage", ["truncate", "junk", "missing"])
+def test_unusable_files_load_as_none(tmp_path, damage):
+    rng = np.random.default_rng(1)
+    path = str(tmp_path / "units.oidx")
+    oids = np.arange(1, 501)
+    boxes = _boxes(rng, len(oids))
+    pi.ParcelIndex.build(path, "units", oids, boxes,
+                         _hashes(oids, boxes)).save()
+    if damage == "truncate":
+        with open(path, "r+b") as f:
+            f.truncate(1000)
+    elif damage == "junk":
+        with open(path, "wb") as f:
+            f.write(b"junk")
+    else:
+        path += "x"
+    assert pi.ParcelIndex.load(path, "units") is None
+
+
+def test_empty_index(tmp_path):
+    path = str(tmp_path / "units.oidx")
+    pi.ParcelIndex.build(path, "units", [], np.empty((0, 4)), []).save()
+    index = pi.ParcelIndex.load(path, "units")
+    assert len(index) == 0
+    assert index.query((0, 0, 1, 1)).tolist() == []
+
+    index.update([5], [[0, 0, 1, 1]], _hashes([5], [[0, 0, 1, 1]]), [9])
+    index.save()
+    assert pi.ParcelIndex.load(path, "units").query((0, 0, 2, 2)).tolist() \
+        == [5]
+
+
+def test_open_index_reads_the_layer_only_to_rebuild(tmp_path, monkeypatch):
+    run.load_layout(synthetic.generate(300, seed=2))
+    monkeypatch.setattr(pi, "INDEX_DIR", str(tmp_path))
+    stamp = [1, 100]
+    monkeypatch.setattr(pi, "workspace_stamp", lambda dataset: list(stamp))
+    reads = []
+    read_rows = pi.read_rows
+
+    def counted(dataset, oids=None, shapes=False):
+        reads.append(shapes)
+        return read_rows(dataset, oids, shapes)
+
+    monkeypatch.setattr(pi, "read_rows", counted)
+
+    built = pi.open_index(run.UNIT_LAYER)
+    assert reads == [True]
+
+    # The workspace changes between runs, which alone reads nothing
+    stamp[:] = [2, 200]
+    index = pi.open_index(run.UNIT_LAYER)
+    assert reads == [True]
+    assert index.verified and index.fingerprint == built.fingerprint
+    assert pi.ParcelIndex.load(index.path, index.dataset).stamp == stamp
+
+    # An edit made outside the tools needs a rebuild
+    units = fakearcpy.ws.datasets[r"lir.gdb\units"]
+    deleted = min(units.rows)
+    del units.rows[deleted]
+    assert pi.open_index(run.UNIT_LAYER).fingerprint == built.fingerprint
+    rebuilt = pi.open_index(run.UNIT_LAYER, rebuild=True)
+    assert reads == [True, False, True]
+    assert len(rebuilt) == len(built) - 1
+    assert deleted not in rebuilt.query((-1e9, -1e9, 1e9, 1e9))
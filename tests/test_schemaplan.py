@@ -0,0 +1,78 @@
+"""
+Schema plans: field matching, retyping and applying to the fake arcpy
+"""
+
+import pytest
+import shapely
+
+from benchmarks import fakearcpy
+
+import schemacache as sc
+import schemaplan as sp
+
+TEMPLATE = r"lir.gdb\template"
+TARGET = r"lir.gdb\target"
+
+
+@pytest.fixture
+def layers():
+    fakearcpy.reset()
+    sc.schema.invalidate()
+    fakearcpy.ws.load(TEMPLATE, [], [("PARCEL_ID", "String", 20),
+                                     ("UNITS", "Integer", 4),
+                                     ("VALUE", "Double", 8)])
+    fakearcpy.ws.load(TARGET, [(shapely.box(0, 0, 1, 1),
+                                {"parcel_id": "A1", "Units": 2.5,
+                                 "EXTRA": "x"})],
+                      [("parcel_id", "String", 20), ("Units", "Double", 8),
+                       ("EXTRA", "String", 10)])
+    yield
+    sc.schema.invalidate()
+
+
+def _types(path):
+    # Leaving out the fields the geodatabase maintains, which stay put
+    system = {name for name, _, _ in fakearcpy.SYSTEM_FIELDS}
+    return {f.name: f.type for f in fakearcpy.ws.datasets[path].fields
+            if f.name not in system}
+
+
+def test_diff_matches_names_case_insensitively(layers):
+    plan = sp.SchemaPlan.from_template(TEMPLATE)
+    assert [f["name"] for f in plan.fields] == ["PARCEL_ID", "UNITS", "VALUE"]
+
+    diff = plan.diff(sc.schema.fields(TARGET))
+    assert [spec["name"] for spec in diff.add] == ["VALUE"]
+    assert diff.drop == ["EXTRA"]
+    assert diff.retype == [("Units", "Double", "Integer")]
+    assert diff.kept == ["parcel_id"]
+
+
+def test_apply_keeps_mistyped_fields_unless_asked(layers):
+    plan = sp.SchemaPlan.from_template(TEMPLATE)
+    plan.apply(TARGET)
+    row, = fakearcpy.ws.datasets[TARGET].rows.values()
+    assert _types(TARGET) == {"parcel_id": "String", "Units": "Double",
+                              "VALUE": "Double"}
+    assert row["parcel_id"] == "A1" and row["Units"] == 2.5
+
+    # Once conformed, only the retype is left
+    diff = plan.apply(TARGET, retype=True)
+    assert (diff.add, diff.drop) == ([], [])
+    row, = fakearcpy.ws.datasets[TARGET].rows.values()
+    assert _types(TARGET)["UNITS"] == "Integer"
+    assert "Units" not in row and row["UNITS"] is None
+    assert row["parcel_id"] == "A1"
+    assert plan.diff(sc.schema.fields(TARGET)).retype == []
+
+
+def test_saved_plan_applies_the_same(layers, tmp_path):
+    path = str(tmp_path / "plan.json")
+    sp.SchemaPlan.from_template(TEMPLATE).save(path)
+    plan = sp.SchemaPlan.load(path)
+    assert plan.template == TEMPLATE
+
+    diffs = sp.apply_many(plan, [TARGET], retype=True)
+    assert diffs[TARGET].retype == [("Units", "Double", "Integer")]
+    assert _types(TARGET) == {"parcel_id": "String", "UNITS": "Integer",
+                              "VALUE": "Double"}
@@ -0,0 +1,73 @@
+"""
+Selection to OUG by group on the fake arcpy
+"""
+
+import shapely
+
+from benchmarks import fakearcpy, run, synthetic
+
+import selection_to_oug as so
+
+PARCELS = r"lir.gdb\parcels"
+LAYER = "Parcels"
+
+
+def _parcel(x, subdiv, units, built=2000):
+    return (shapely.box(x, 0, x + 10, 10),
+            {"SUBDIV_NAME": subdiv, "UNIT_COUNT": units, "BUILT_YR": built,
+             "PROP_CLASS": "Residential"})
+
+
+def _load(parcels):
+    fakearcpy.reset()
+    fakearcpy.ws.load(PARCELS, parcels, synthetic.BASE_FIELDS)
+    fakearcpy.MakeFeatureLayer(PARCELS, LAYER)
+    oids = ", ".join(str(oid) for oid in range(1, len(parcels) + 1))
+    fakearcpy.SelectLayerByAttribute(LAYER, "NEW_SELECTION",
+                                     f"OBJECTID IN ({oids})")
+
+
+def test_merge_groups(monkeypatch):
+    _load([
+        # Two spellings of one group
+        _parcel(0, "Oak Court", 1), _parcel(10, "oak  court ", 2),
+        _parcel(20, "OAK COURT", 3),
+        _parcel(100, "Pine", 4), _parcel(110, "Pine", 5),
+        # BUILT_YR varies and has no operation, so Elm is skipped
+        _parcel(200, "Elm", 1, 1990), _parcel(210, "Elm", 1, 2005),
+        # A group of one, and parcels in no group, are left alone
+        _parcel(300, "Ash", 1),
+        _parcel(400, None, 1), _parcel(410, "  ", 1),
+    ])
+    warnings = []
+    monkeypatch.setattr(so.arcpy, "AddWarning", warnings.append)
+    calls = []
+    dissolve_groups = so.dv.dissolve_groups
+
+    def counted(groups, *args, **kwargs):
+        calls.append(len(groups))
+        return dissolve_groups(groups, *args, **kwargs)
+
+    monkeypatch.setattr(so.dv, "dissolve_groups", counted)
+
+    so.script_tool(LAYER, run.field_ops_table({"UNIT_COUNT": "SUM"}),
+                   "condo", ["SUBDIV_NAME"])
+
+    rows = fakearcpy.ws.datasets[PARCELS].rows
+    ougs = {row["SUBDIV_NAME"]: row for row in rows.values()
+            if row.get("IS_OUG") == 1}
+    assert sorted(ougs) == ["Oak Court", "Pine"]
+    assert ougs["Oak Court"]["UNIT_COUNT"] == 6
+    assert ougs["Pine"]["UNIT_COUNT"] == 9
+    assert ougs["Pine"]["SUBTYPE"] == "condo"
+    assert ougs["Pine"]["SUBPROCESSOR"] == so.SUBPROCESSOR
+    assert round(ougs["Oak Court"][fakearcpy.SHAPE_FIELD].area) == 300
+    # Both were planned the same way, so were dissolved together
+    assert calls == [2]
+
+    # The merged parcels are gone, and everything else is still there
+    assert sorted(oid for oid in rows if rows[oid].get("IS_OUG") != 1) \
+        == [6, 7, 8, 9, 10]
+    skipped = [w for w in warnings if "skipped" in w]
+    assert len(skipped) == 1 and skipped[0].startswith("Group elm skipped")
+    assert any(w.startswith("2 parcels have no value") for w in warnings)
@@ -0,0 +1,80 @@
+"""
+Vintage change detection on a hand-made pair of vintages
+"""
+
+import shapely
+
+import vintage as vt
+
+
+def _parcel(pid, geom, **attrs):
+    return (pid, shapely.to_wkb(geom), dict({"UNITS": 1}, **attrs))
+
+
+def _condo(pid, x, units=3):
+    """
+    A common parcel with its units sitting in holes, side by side
+    """
+    holes = [shapely.box(x + 1 + 3 * i, 1, x + 3 + 3 * i, 3)
+             for i in range(units)]
+    common = shapely.box(x, 0, x + 3 * units + 1, 4)
+    common = common.difference(shapely.union_all(holes))
+    return [_parcel(pid, common)] + [
+        _parcel(f"{pid}-{i}", hole) for i, hole in enumerate(holes)
+    ]
+
+
+def test_classify():
+    old = vt.fingerprints([
+        _parcel("same", shapely.box(0, 0, 1, 1)),
+        _parcel("moved", shapely.box(2, 0, 3, 1)),
+        _parcel("edited", shapely.box(4, 0, 5, 1)),
+        _parcel("old id", shapely.box(6, 0, 7, 1)),
+        _parcel("gone", shapely.box(8, 0, 9, 1)),
+    ])
+    new = vt.fingerprints([
+        _parcel("same", shapely.box(0, 0, 1, 1)),
+        _parcel("moved", shapely.box(2, 0, 3, 2)),
+        _parcel("edited", shapely.box(4, 0, 5, 1), UNITS=2),
+        _parcel("new id", shapely.box(6, 0, 7, 1)),
+        _parcel("added", shapely.box(10, 0, 11, 1)),
+    ])
+    changes = vt.classify(old, new)
+    assert changes.status == {
+        ("same", 0): vt.UNCHANGED,
+        ("moved", 0): vt.CHANGED,
+        ("edited", 0): vt.CHANGED,
+        ("new id", 0): vt.CHANGED,
+        ("added", 0): vt.NEW,
+        ("gone", 0): vt.REMOVED,
+    }
+    assert changes.renamed == {("new id", 0): ("old id", 0)}
+    assert vt.counts(changes) == {vt.NEW: 1, vt.CHANGED: 3,
+                                  vt.REMOVED: 1, vt.UNCHANGED: 1}
+
+
+def test_vertex_order_is_not_a_change():
+    ring = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    old = vt.fingerprints([_parcel("a", shapely.Polygon(ring))])
+    new = vt.fingerprints([_parcel("a", shapely.Polygon(ring[2:] + ring[:2]))])
+    assert vt.classify(old, new).status == {("a", 0): vt.UNCHANGED}
+
+
+def test_affected_parcels_takes_whole_condos():
+    old = _condo("A", 0) + _condo("B", 100) + _condo("C", 200)
+    new = list(old)
+    # A unit of A changes; B loses a unit; C is untouched
+    new[1] = _parcel("A-0", shapely.from_wkb(old[1][1]), UNITS=2)
+    new = [f for f in new if f[0] != "B-2"]
+
+    affected = vt.affected_parcels(old, new)
+    ids = [pid for pid, _, _ in new]
+    assert sorted(ids[i] for i in affected.commons) == ["A", "B"]
+    assert sorted(ids[i] for i in affected.units) \
+        == ["A-0", "A-1", "A-2", "B-0", "B-1"]
+
+
+def test_nothing_changed():
+    old = _condo("A", 0)
+    affected = vt.affected_parcels(old, list(old))
+    assert affected.commons == [] and affected.units == []